@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        """Connect the change stream, permission cache and field choice receivers and load model schemas"""
+        import authentication.change_stream
+        import authentication.permission_cache
+        from authentication.field_choices import connect_domain_tracking
+        from authentication.model_schema import load_schemas
+
+        connect_domain_tracking()
+        load_schemas()
@@ -0,0 +1,329 @@
+"""
+Change stream for Lead, Property and Project rows.
+
+Every create, update and delete of a model using ChangeStreamMixin appends a
+ChangeEvent (model, pk, changed fields, per-object version) in the same transaction
+as the change itself, so an event exists exactly when the change committed.
+Queryset updates that bypass save() call record_changes() inside their transaction.
+
+Downstream work (cache invalidation, counters, search indexes, history) subscribes by
+subclassing ChangeConsumer and listing it in settings.CHANGE_STREAM_CONSUMERS. The
+`consume_changes` command feeds each consumer its events in id order and in batches,
+checkpointing its offset after every batch, so consumers run out of the request path.
+Event ids are allocated before commit, so a consumer stops at a missing id until that
+transaction commits; an id still missing after settings.CHANGE_STREAM_GAP_TIMEOUT
+seconds belonged to a rolled back transaction and is skipped. The same command prunes
+events older than settings.CHANGE_STREAM_RETENTION_DAYS, with or without consumers.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import F, Min
+from django.db.models.signals import class_prepared, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ChangeEvent, ChangeStreamOffset, ChangeStreamVersion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# A missing event id is waited for this long (from when a consumer first hits it)
+# before it is taken for a rolled back transaction; raise it above the longest
+# transaction that saves tracked models
+DEFAULT_GAP_TIMEOUT = 600
+
+DEFAULT_RETENTION_DAYS = 7
+
+
+class ChangeStreamMixin:
+    """
+    Model mixin that records a ChangeEvent with every save and delete
+
+    List it before models.Model in the bases. Changed fields are found by comparing
+    against the values the instance was loaded with.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_change_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.snapshot_change_values(fields)
+
+    def save(self, *args, **kwargs):
+        # post_save fires inside this block, so the event commits or rolls back with the row
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+        self.snapshot_change_values(kwargs.get('update_fields'))
+
+    def snapshot_change_values(self, fields=None):
+        """Make the current values (of `fields`, or all loaded ones) the baseline for change detection"""
+        values = self._change_values()
+        if fields is not None and hasattr(self, '_change_snapshot'):
+            wanted = set(fields)
+            values = {
+                name: value for name, value in values.items()
+                if name in wanted or self._meta.get_field(name).attname in wanted
+            }
+            self._change_snapshot.update(values)
+        else:
+            self._change_snapshot = values
+
+    def _change_values(self):
+        """Loaded concrete field values (FK ids for relations), normalized to the column type"""
+        values = {}
+        for field in self._meta.concrete_fields:
+            # Only fields already in __dict__: reading a deferred one would hit the database
+            if field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            try:
+                value = (field.target_field if field.is_relation else field).to_python(value)
+            except ValidationError:
+                pass
+            values[field.name] = value
+        return values
+
+    def get_loaded_values(self):
+        """{field name: value} as of the last load or save, or None when never loaded"""
+        return getattr(self, '_change_snapshot', None)
+
+    def get_changes(self, update_fields=None):
+        """
+        {field name: (old value, new value)} for loaded fields changed since load, limited
+        to update_fields when given. Relations are compared by id, so nothing is fetched.
+        """
+        snapshot = self.get_loaded_values() or {}
+        changes = {
+            name: (snapshot[name], value) for name, value in self._change_values().items()
+            if name in snapshot and snapshot[name] != value
+        }
+        if update_fields is not None:
+            wanted = set(update_fields)
+            changes = {
+                name: change for name, change in changes.items()
+                if name in wanted or self._meta.get_field(name).attname in wanted
+            }
+        return changes
+
+    def get_changed_fields(self, update_fields=None):
+        """Names of fields changed since load, limited to update_fields when given"""
+        if self.get_loaded_values() is None:
+            # Not loaded from the database (e.g. built with a known pk): assume every field
+            names = list(self._change_values())
+            if update_fields is not None:
+                wanted = set(update_fields)
+                names = [
+                    name for name in names
+                    if name in wanted or self._meta.get_field(name).attname in wanted
+                ]
+            return names
+        return list(self.get_changes(update_fields))
+
+
+def _next_versions(label, pks):
+    """
+    {pk: next version} for the given objects. Incrementing the counters row-locks
+    them until commit, so concurrent changes of one object get consecutive versions.
+    """
+    counters = ChangeStreamVersion.objects.filter(model=label, object_pk__in=pks)
+    if counters.update(version=F('version') + 1) < len(pks):
+        # First change of some of the objects: add their counters, then count them too
+        counted = set(counters.values_list('object_pk', flat=True))
+        missing = [pk for pk in pks if pk not in counted]
+        ChangeStreamVersion.objects.bulk_create(
+            [ChangeStreamVersion(model=label, object_pk=pk) for pk in missing],
+            ignore_conflicts=True,
+        )
+        ChangeStreamVersion.objects.filter(model=label, object_pk__in=missing).update(version=F('version') + 1)
+    return dict(counters.values_list('object_pk', 'version'))
+
+
+def record_change(instance, operation, changed_fields=()):
+    """Append the event for one saved or deleted instance; call inside the change's transaction"""
+    label = instance._meta.label_lower
+    pk = str(instance.pk)
+    return ChangeEvent.objects.create(
+        model=label,
+        object_pk=pk,
+        operation=operation,
+        changed_fields=list(changed_fields),
+        version=_next_versions(label, [pk])[pk],
+    )
+
+
+def record_changes(model, pks, changed_fields, operation='update'):
+    """Append events for a queryset update/delete; call inside the same transaction"""
+    label = model._meta.label_lower
+    pks = [str(pk) for pk in pks]
+    if not pks:
+        return []
+    versions = _next_versions(label, pks)
+    return ChangeEvent.objects.bulk_create([
+        ChangeEvent(
+            model=label,
+            object_pk=pk,
+            operation=operation,
+            changed_fields=list(changed_fields),
+            version=versions[pk],
+        )
+        for pk in pks
+    ], batch_size=DEFAULT_BATCH_SIZE)
+
+
+def record_saved_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_change(instance, 'create')
+        return
+    changed = instance.get_changed_fields(update_fields)
+    if changed:
+        record_change(instance, 'update', changed)
+
+
+def record_deleted_change(sender, instance, **kwargs):
+    # Deletes, including queryset deletes, send post_delete inside the deletion transaction
+    record_change(instance, 'delete')
+
+
+@receiver(class_prepared)
+def connect_change_stream(sender, **kwargs):
+    """
+    Connect the recorders to each model using ChangeStreamMixin. Receivers without a
+    sender would count as listeners of every model and stop Django from fast-deleting
+    any of them (audit purges, event pruning) without loading the rows.
+    """
+    if issubclass(sender, ChangeStreamMixin) and not sender._meta.abstract:
+        post_save.connect(record_saved_change, sender=sender, dispatch_uid=f'change_stream_save:{sender._meta.label}')
+        post_delete.connect(
+            record_deleted_change, sender=sender, dispatch_uid=f'change_stream_delete:{sender._meta.label}'
+        )
+
+
+class ChangeConsumer:
+    """
+    Base class for change stream consumers
+
+    Set `name` (the checkpoint key), optionally `models` (labels such as 'leads.lead';
+    None receives every model) and implement handle(events). handle() runs inside the
+    transaction that advances the offset, so a failing batch is retried on the next run.
+    """
+    name = None
+    models = None
+    batch_size = DEFAULT_BATCH_SIZE
+
+    def handle(self, events):
+        raise NotImplementedError
+
+
+def get_consumers():
+    """Instances of the consumers listed in settings.CHANGE_STREAM_CONSUMERS"""
+    return [import_string(path)() for path in getattr(settings, 'CHANGE_STREAM_CONSUMERS', [])]
+
+
+def get_gap_timeout():
+    return getattr(settings, 'CHANGE_STREAM_GAP_TIMEOUT', DEFAULT_GAP_TIMEOUT)
+
+
+def get_retention_days():
+    return getattr(settings, 'CHANGE_STREAM_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+
+
+def _committed_run(offset, rows):
+    """
+    The leading rows that directly follow the offset. A missing id is waited for until
+    it has been missing for the gap timeout; then the rows after it are taken.
+    """
+    expected = offset.last_event_id + 1
+    if rows[0].id != expected:
+        if offset.last_event_id == 0:
+            pass  # first run: the stream starts at the oldest event still stored
+        elif offset.gap_since is None or timezone.now() - offset.gap_since < timedelta(seconds=get_gap_timeout()):
+            return []
+        else:
+            logger.warning(
+                "Change stream consumer %s skipped missing event ids %s-%s",
+                offset.consumer, expected, rows[0].id - 1,
+            )
+        expected = rows[0].id
+
+    run = []
+    for row in rows:
+        if row.id != expected:
+            break
+        run.append(row)
+        expected += 1
+    return run
+
+
+def consume(consumer, max_batches=None):
+    """Feed a consumer its pending events batch by batch; returns the number of events handled"""
+    handled = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            # The locked offset keeps two workers from handling the same batch
+            offset, _ = ChangeStreamOffset.objects.select_for_update().get_or_create(consumer=consumer.name)
+            # Read every model so gaps are judged on the whole id sequence
+            rows = list(ChangeEvent.objects.filter(id__gt=offset.last_event_id).order_by('id')[:consumer.batch_size])
+            if not rows:
+                return handled
+            run = _committed_run(offset, rows)
+            if not run:
+                if offset.gap_since is None:
+                    offset.gap_since = timezone.now()
+                    offset.save(update_fields=['gap_since', 'updated_at'])
+                return handled
+
+            events = run
+            if consumer.models is not None:
+                wanted = set(consumer.models)
+                events = [event for event in run if event.model in wanted]
+            if events:
+                consumer.handle(events)
+            offset.last_event_id = run[-1].id
+            offset.gap_since = None
+            offset.save(update_fields=['last_event_id', 'gap_since', 'updated_at'])
+
+        handled += len(events)
+        batches += 1
+        if len(run) < consumer.batch_size:
+            break
+    return handled
+
+
+def prune_events(older_than_days=None, chunk_size=5000):
+    """
+    Delete events older than the given age (default CHANGE_STREAM_RETENTION_DAYS) that
+    every configured consumer has processed; with no consumers, every old event goes.
+    Returns the number deleted.
+    """
+    if older_than_days is None:
+        older_than_days = get_retention_days()
+    names = [consumer.name for consumer in get_consumers()]
+    offsets = ChangeStreamOffset.objects.filter(consumer__in=names)
+    if len(offsets) < len(names):
+        return 0  # a consumer that never ran still needs everything
+    floor = offsets.aggregate(floor=Min('last_event_id'))['floor'] if names else None
+
+    events = ChangeEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=older_than_days))
+    if floor is not None:
+        events = events.filter(id__lte=floor)
+
+    deleted = 0
+    while True:
+        ids = list(events.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += ChangeEvent.objects.filter(id__in=ids).delete()[0]
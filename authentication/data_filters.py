@@ -0,0 +1,68 @@
+"""
+Compiled profile data filters.
+
+A profile's active DataFilters for one (module, model) are compiled into a single Q:
+'include' and 'conditional' filters are OR-ed (a record matching any of them is
+visible) and 'exclude' filters are AND-ed in negated. Each filter is validated against
+the model when compiled; one with unknown fields or bad values is logged and skipped
+instead of breaking the view. Compiled Qs live in the shared permission cache under
+the RBAC version, so they are rebuilt only after a DataFilter changes.
+
+Models opt in with `objects = DataFilterQuerySet.as_manager()` (or a subclass) and
+set `data_filter_module`; views then call `Model.objects.for_user(request.user)`.
+"""
+import logging
+
+from django.db import models
+from django.db.models import Q
+
+from .permission_cache import get_cached, get_data_filters
+from .permissions import get_permission_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def compile_data_filters(profile_id, module_name, model):
+    """The combined Q of a profile's active filters for `model`; an empty Q when unrestricted"""
+    include, exclude = Q(), Q()
+    for filter_id, filter_type, filter_conditions in get_data_filters(profile_id).get((module_name, model.__name__), []):
+        if not filter_conditions:
+            continue
+        try:
+            condition = Q(**filter_conditions)
+            # Resolving the lookups surfaces unknown fields and invalid values now
+            model._default_manager.filter(condition).query
+        except Exception as e:
+            logger.warning(f"DataFilter {filter_id} skipped: {e}")
+            continue
+        if filter_type == 'exclude':
+            exclude |= condition
+        else:
+            include |= condition
+
+    compiled = include
+    if exclude:
+        compiled &= ~exclude
+    return compiled
+
+
+def get_data_filter_q(profile_id, module_name, model):
+    """Cached compile_data_filters(); None when the profile has nothing to apply"""
+    if profile_id is None:
+        return None
+    compiled = get_cached(
+        'dataq',
+        f'{profile_id}:{module_name}:{model._meta.label_lower}',
+        lambda key: compile_data_filters(profile_id, module_name, model),
+    )
+    return compiled or None
+
+
+class DataFilterQuerySet(models.QuerySet):
+    """QuerySet restricted per user by their profile's data filters"""
+    data_filter_module = None
+
+    def for_user(self, user):
+        """Only the records the user's profile data filters allow"""
+        compiled = get_data_filter_q(get_permission_snapshot(user).profile_id, self.data_filter_module, self.model)
+        return self.filter(compiled) if compiled is not None else self
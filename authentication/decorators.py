@@ -4,7 +4,7 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.http import JsonResponse
-from .models import UserProfile, Module, Permission
+from .permissions import get_permission_snapshot
 
 
 def permission_required(module_name, permission_code):
@@ -19,31 +19,22 @@ def permission_required(module_name, permission_code):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
+            permissions = get_permission_snapshot(request.user)
+            
             # Superuser has all permissions
-            if request.user.is_superuser:
+            if permissions.is_superuser:
                 return view_func(request, *args, **kwargs)
             
-            try:
-                user_profile = request.user.user_profile
-                if not user_profile or not user_profile.profile:
-                    messages.error(request, 'Access denied. No profile assigned.')
-                    return redirect('authentication:dashboard')
-                
-                # Check if user has the required permission
-                has_permission = user_profile.has_permission(module_name, permission_code)
-                
-                if not has_permission:
-                    messages.error(request, f'Access denied. You do not have permission to {permission_code} {module_name}.')
-                    return redirect('authentication:dashboard')
-                
-                return view_func(request, *args, **kwargs)
-                
-            except UserProfile.DoesNotExist:
+            if not permissions.has_profile:
                 messages.error(request, 'Access denied. No profile assigned.')
                 return redirect('authentication:dashboard')
-            except Exception as e:
-                messages.error(request, 'Access denied. Permission check failed.')
+            
+            # Check if user has the required permission
+            if not permissions.has_permission(module_name, permission_code):
+                messages.error(request, f'Access denied. You do not have permission to {permission_code} {module_name}.')
                 return redirect('authentication:dashboard')
+            
+            return view_func(request, *args, **kwargs)
         
         return _wrapped_view
     return decorator
@@ -58,29 +49,22 @@ def permission_required_ajax(module_name, permission_code):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
+            permissions = get_permission_snapshot(request.user)
+            
             # Superuser has all permissions
-            if request.user.is_superuser:
+            if permissions.is_superuser:
                 return view_func(request, *args, **kwargs)
             
-            try:
-                user_profile = request.user.user_profile
-                if not user_profile or not user_profile.profile:
-                    return JsonResponse({'error': 'Access denied. No profile assigned.'}, status=403)
-                
-                # Check if user has the required permission
-                has_permission = user_profile.has_permission(module_name, permission_code)
-                
-                if not has_permission:
-                    return JsonResponse({
-                        'error': f'Access denied. You do not have permission to {permission_code} {module_name}.'
-                    }, status=403)
-                
-                return view_func(request, *args, **kwargs)
-                
-            except UserProfile.DoesNotExist:
+            if not permissions.has_profile:
                 return JsonResponse({'error': 'Access denied. No profile assigned.'}, status=403)
-            except Exception as e:
-                return JsonResponse({'error': 'Access denied. Permission check failed.'}, status=403)
+            
+            # Check if user has the required permission
+            if not permissions.has_permission(module_name, permission_code):
+                return JsonResponse({
+                    'error': f'Access denied. You do not have permission to {permission_code} {module_name}.'
+                }, status=403)
+            
+            return view_func(request, *args, **kwargs)
         
         return _wrapped_view
     return decorator
@@ -94,32 +78,22 @@ def module_access_required(module_name):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
+            permissions = get_permission_snapshot(request.user)
+            
             # Superuser has all access
-            if request.user.is_superuser:
+            if permissions.is_superuser:
                 return view_func(request, *args, **kwargs)
             
-            try:
-                user_profile = request.user.user_profile
-                if not user_profile or not user_profile.profile:
-                    messages.error(request, 'Access denied. No profile assigned.')
-                    return redirect('authentication:dashboard')
-                
-                # Check if user has any permission for this module
-                accessible_modules = user_profile.get_accessible_modules()
-                has_access = accessible_modules.filter(name=module_name).exists()
-                
-                if not has_access:
-                    messages.error(request, f'Access denied. You do not have access to {module_name} module.')
-                    return redirect('authentication:dashboard')
-                
-                return view_func(request, *args, **kwargs)
-                
-            except UserProfile.DoesNotExist:
+            if not permissions.has_profile:
                 messages.error(request, 'Access denied. No profile assigned.')
                 return redirect('authentication:dashboard')
-            except Exception as e:
-                messages.error(request, 'Access denied. Module access check failed.')
+            
+            # Check if user has any permission for this module
+            if not permissions.can_access(module_name):
+                messages.error(request, f'Access denied. You do not have access to {module_name} module.')
                 return redirect('authentication:dashboard')
+            
+            return view_func(request, *args, **kwargs)
         
         return _wrapped_view
     return decorator
@@ -153,19 +127,7 @@ def check_permission_level(user, module_name, required_level):
     Returns:
         bool: True if user has required permission level or higher
     """
-    if user.is_superuser:
-        return True
-    
-    try:
-        user_profile = user.user_profile
-        if not user_profile or not user_profile.profile:
-            return False
-        
-        max_level = user_profile.get_max_permission_level(module_name)
-        return max_level >= required_level
-        
-    except (UserProfile.DoesNotExist, AttributeError):
-        return False
+    return get_permission_snapshot(user).has_level(module_name, required_level)
 
 
 def has_permission(user, module_name, permission_code):
@@ -180,15 +142,4 @@ def has_permission(user, module_name, permission_code):
     Returns:
         bool: True if user has the permission
     """
-    if user.is_superuser:
-        return True
-    
-    try:
-        user_profile = user.user_profile
-        if not user_profile or not user_profile.profile:
-            return False
-        
-        return user_profile.has_permission(module_name, permission_code)
-        
-    except (UserProfile.DoesNotExist, AttributeError):
-        return False
\ No newline at end of file
+    return get_permission_snapshot(user).has_permission(module_name, permission_code)
\ No newline at end of file
@@ -4,6 +4,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from authentication.models import FieldPermission, DataFilter, DynamicDropdown
+from authentication.permission_cache import bump_version_on_commit
 
 class ModuleFilter(SimpleListFilter):
     title = 'Module'
@@ -126,24 +127,30 @@ class EnhancedFieldPermissionAdmin(admin.ModelAdmin):
     # Custom actions for bulk operations
     actions = ['enable_view_permissions', 'disable_view_permissions', 'enable_edit_permissions', 'disable_edit_permissions']
     
+    def _update_permissions(self, queryset, **values):
+        updated = queryset.update(**values)
+        # update() sends no post_save, so the compiled permissions are invalidated here
+        bump_version_on_commit()
+        return updated
+    
     def enable_view_permissions(self, request, queryset):
-        queryset.update(can_view=True, is_visible_in_list=True, is_visible_in_detail=True)
-        self.message_user(request, f'Enabled view permissions for {queryset.count()} field permissions.')
+        updated = self._update_permissions(queryset, can_view=True, is_visible_in_list=True, is_visible_in_detail=True)
+        self.message_user(request, f'Enabled view permissions for {updated} field permissions.')
     enable_view_permissions.short_description = 'Enable view permissions for selected fields'
     
     def disable_view_permissions(self, request, queryset):
-        queryset.update(can_view=False, is_visible_in_list=False, is_visible_in_detail=False, is_visible_in_forms=False)
-        self.message_user(request, f'Disabled view permissions for {queryset.count()} field permissions.')
+        updated = self._update_permissions(queryset, can_view=False, is_visible_in_list=False, is_visible_in_detail=False, is_visible_in_forms=False)
+        self.message_user(request, f'Disabled view permissions for {updated} field permissions.')
     disable_view_permissions.short_description = 'Disable view permissions for selected fields'
     
     def enable_edit_permissions(self, request, queryset):
-        queryset.update(can_edit=True, is_visible_in_forms=True)
-        self.message_user(request, f'Enabled edit permissions for {queryset.count()} field permissions.')
+        updated = self._update_permissions(queryset, can_edit=True, is_visible_in_forms=True)
+        self.message_user(request, f'Enabled edit permissions for {updated} field permissions.')
     enable_edit_permissions.short_description = 'Enable edit permissions for selected fields'
     
     def disable_edit_permissions(self, request, queryset):
-        queryset.update(can_edit=False)
-        self.message_user(request, f'Disabled edit permissions for {queryset.count()} field permissions.')
+        updated = self._update_permissions(queryset, can_edit=False)
+        self.message_user(request, f'Disabled edit permissions for {updated} field permissions.')
     disable_edit_permissions.short_description = 'Disable edit permissions for selected fields'
 
 @admin.register(DataFilter)
@@ -1,303 +1,143 @@
-from authentication.models import Module
+"""
+Permission values for every template.
+
+Nothing is computed when the processor runs: flags come from the cached permission
+snapshot, and counts, field lists and querysets are wrapped in SimpleLazyObject, so a
+template that never reads them (AJAX fragments, error pages, login) costs nothing.
+The sidebar badge counts are cached per user for a short time.
+"""
+import logging
+
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from authentication.models import DataFilter, Module
+from authentication.permission_cache import get_version
+from authentication.permissions import get_permission_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Badge counts may lag this many seconds behind new or reassigned records
+COUNT_CACHE_TIMEOUT = 60
+
+# (context prefix, module name, model name)
+CONTEXT_MODULES = (
+    ('leads', 'leads', 'Lead'),
+    ('properties', 'property', 'Property'),
+    ('projects', 'projects', 'Project'),
+)
+
+LEVELS = (('view', 1), ('edit', 2), ('create', 3), ('delete', 4))
+
+
+def _base_queryset(model_name):
+    if model_name == 'Lead':
+        from leads.models import Lead
+        return Lead.objects.all()
+    if model_name == 'Property':
+        from properties.models import Property
+        return Property.objects.all()
+    from projects.models import Project
+    return Project.objects.filter(is_active=True)
+
+
+def _get_profile(user):
+    """The user's Profile, or None when no profile is assigned"""
+    try:
+        return user.user_profile.profile
+    except Exception:
+        return None
+
+
+def _record_count(user, profile, module_name, model_name):
+    """Records the user can see in a module (scope and data filters applied), cached briefly"""
+    if user.is_superuser:
+        key = f'sidebar_count:all:{model_name}'
+    else:
+        # The RBAC version makes scope and filter changes show up immediately
+        key = f'sidebar_count:{user.pk}:{model_name}:v{get_version()}'
+    count = cache.get(key)
+    if count is None:
+        queryset = _base_queryset(model_name)
+        if not user.is_superuser:
+            queryset = profile.apply_data_scope(queryset, module_name, user)
+            queryset = profile.apply_data_filters(queryset, module_name, model_name)
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def _lazy(func, *args):
+    return SimpleLazyObject(lambda: func(*args))
+
+
+def _denied_context():
+    context = {}
+    for prefix, _, _ in CONTEXT_MODULES:
+        for code, _ in LEVELS:
+            context[f'has_{prefix}_{code}'] = False
+        context[f'user_{prefix}_count'] = 0
+        context[f'{prefix}_visible_fields'] = []
+        context[f'{prefix}_form_fields'] = []
+    context.update({
+        'properties_data_filters': [],
+        'user_accessible_modules': Module.objects.none(),
+        'user_profile_permissions': None,
+    })
+    return context
+
 
 def enhanced_permissions_context(request):
     """Enhanced permission context processor with granular field-level permissions"""
-    context = {}
-    
-    if request.user.is_authenticated:
-        try:
-            if request.user.is_superuser:
-                # Superuser has access to everything
-                from leads.models import Lead
-                from properties.models import Property
-                from projects.models import Project
-                
-                user_leads_count = Lead.objects.count()
-                user_properties_count = Property.objects.count()
-                user_projects_count = Project.objects.filter(is_active=True).count()
-                
-                # Owner databases for superuser
-                
-                context.update({
-                    'has_leads_view': True,
-                    'has_leads_create': True,
-                    'has_leads_edit': True,
-                    'has_leads_delete': True,
-                    'user_leads_count': user_leads_count,
-                    'has_properties_view': True,
-                    'has_properties_create': True,
-                    'has_properties_edit': True,
-                    'has_properties_delete': True,
-                    'user_properties_count': user_properties_count,
-                    'has_projects_view': True,
-                    'has_projects_create': True,
-                    'has_projects_edit': True,
-                    'has_projects_delete': True,
-                    'user_projects_count': user_projects_count,
-                    'user_accessible_modules': Module.objects.all(),
-                    'user_profile_permissions': None,  # Superuser doesn't need field restrictions
-                })
-            else:
-                # Check user profile permissions
-                try:
-                    user_profile = request.user.user_profile
-                    if user_profile and user_profile.profile:
-                        profile = user_profile.profile
-                        
-                        # Store profile for template access
-                        context['user_profile_permissions'] = profile
-                        
-                        # Get all accessible modules for this user
-                        accessible_modules = profile.get_accessible_modules()
-                        
-                        # Check leads permissions specifically
-                        leads_module = Module.objects.filter(name='leads').first()
-                        if leads_module:
-                            leads_permissions = profile.permissions.filter(
-                                module=leads_module,
-                                is_active=True
-                            )
-                            
-                            has_leads_view = leads_permissions.filter(level__gte=1).exists()
-                            
-                            # Count user's leads (with data scope applied)
-                            user_leads_count = 0
-                            if has_leads_view:
-                                from leads.models import Lead
-                                leads_queryset = Lead.objects.all()
-                                # Apply data scope
-                                leads_queryset = profile.apply_data_scope(leads_queryset, 'leads', request.user)
-                                # Apply data filters
-                                leads_queryset = profile.apply_data_filters(leads_queryset, 'leads', 'Lead')
-                                user_leads_count = leads_queryset.count()
-                            
-                            context.update({
-                                'has_leads_view': has_leads_view,
-                                'has_leads_create': leads_permissions.filter(level__gte=3).exists(),
-                                'has_leads_edit': leads_permissions.filter(level__gte=2).exists(),
-                                'has_leads_delete': leads_permissions.filter(level__gte=4).exists(),
-                                'user_leads_count': user_leads_count,
-                                'leads_visible_fields': profile.get_visible_fields('leads', 'Lead') or [],
-                                'leads_form_fields': profile.get_visible_fields('leads', 'Lead') or [],
-                            })
-                        else:
-                            context.update({
-                                'has_leads_view': False,
-                                'has_leads_create': False,
-                                'has_leads_edit': False,
-                                'has_leads_delete': False,
-                                'user_leads_count': 0,
-                                'leads_visible_fields': [],
-                                'leads_form_fields': [],
-                            })
-                        
-                        # Check properties permissions
-                        properties_module = Module.objects.filter(name='property').first()
-                        if properties_module:
-                            properties_permissions = profile.permissions.filter(
-                                module=properties_module,
-                                is_active=True
-                            )
-                            
-                            has_properties_view = properties_permissions.filter(level__gte=1).exists()
-                            
-                            # Count user's properties (with data scope and filters applied)
-                            user_properties_count = 0
-                            if has_properties_view:
-                                from properties.models import Property
-                                properties_queryset = Property.objects.all()
-                                # Apply data scope
-                                properties_queryset = profile.apply_data_scope(properties_queryset, 'property', request.user)
-                                # Apply data filters
-                                properties_queryset = profile.apply_data_filters(properties_queryset, 'property', 'Property')
-                                user_properties_count = properties_queryset.count()
-                            
-                            context.update({
-                                'has_properties_view': has_properties_view,
-                                'has_properties_create': properties_permissions.filter(level__gte=3).exists(),
-                                'has_properties_edit': properties_permissions.filter(level__gte=2).exists(),
-                                'has_properties_delete': properties_permissions.filter(level__gte=4).exists(),
-                                'user_properties_count': user_properties_count,
-                                'properties_visible_fields': profile.get_visible_fields('property', 'Property') or [],
-                                'properties_form_fields': profile.get_visible_fields('property', 'Property') or [],
-                                'properties_data_filters': profile.data_filters.filter(
-                                    module=properties_module, 
-                                    model_name='Property', 
-                                    is_active=True
-                                ),
-                            })
-                        else:
-                            context.update({
-                                'has_properties_view': False,
-                                'has_properties_create': False,
-                                'has_properties_edit': False,
-                                'has_properties_delete': False,
-                                'user_properties_count': 0,
-                                'properties_visible_fields': [],
-                                'properties_form_fields': [],
-                                'properties_data_filters': [],
-                            })
-                        
-                        # Check projects permissions
-                        projects_module = Module.objects.filter(name='projects').first()
-                        if projects_module:
-                            projects_permissions = profile.permissions.filter(
-                                module=projects_module,
-                                is_active=True
-                            )
-                            
-                            has_projects_view = projects_permissions.filter(level__gte=1).exists()
-                            
-                            # Count user's projects (with data scope and filters applied)
-                            user_projects_count = 0
-                            if has_projects_view:
-                                from projects.models import Project
-                                projects_queryset = Project.objects.filter(is_active=True)
-                                # Apply data scope
-                                projects_queryset = profile.apply_data_scope(projects_queryset, 'projects', request.user)
-                                # Apply data filters
-                                projects_queryset = profile.apply_data_filters(projects_queryset, 'projects', 'Project')
-                                user_projects_count = projects_queryset.count()
-                            
-                            context.update({
-                                'has_projects_view': has_projects_view,
-                                'has_projects_create': projects_permissions.filter(level__gte=3).exists(),
-                                'has_projects_edit': projects_permissions.filter(level__gte=2).exists(),
-                                'has_projects_delete': projects_permissions.filter(level__gte=4).exists(),
-                                'user_projects_count': user_projects_count,
-                                'projects_visible_fields': profile.get_visible_fields('projects', 'Project') or [],
-                                'projects_form_fields': profile.get_visible_fields('projects', 'Project') or [],
-                            })
-                        else:
-                            context.update({
-                                'has_projects_view': False,
-                                'has_projects_create': False,
-                                'has_projects_edit': False,
-                                'has_projects_delete': False,
-                                'user_projects_count': 0,
-                                'projects_visible_fields': [],
-                                'projects_form_fields': [],
-                            })
-                        
-                        context['user_accessible_modules'] = accessible_modules
-                        
-                        # Owner databases functionality has been removed
-                        
-                    else:
-                        # No profile assigned - set everything to False
-                        context.update({
-                            'has_leads_view': False,
-                            'has_leads_create': False,
-                            'has_leads_edit': False,
-                            'has_leads_delete': False,
-                            'user_leads_count': 0,
-                            'leads_visible_fields': [],
-                            'leads_form_fields': [],
-                            'has_properties_view': False,
-                            'has_properties_create': False,
-                            'has_properties_edit': False,
-                            'has_properties_delete': False,
-                            'user_properties_count': 0,
-                            'properties_visible_fields': [],
-                            'properties_form_fields': [],
-                            'properties_data_filters': [],
-                            'has_projects_view': False,
-                            'has_projects_create': False,
-                            'has_projects_edit': False,
-                            'has_projects_delete': False,
-                            'user_projects_count': 0,
-                            'projects_visible_fields': [],
-                            'projects_form_fields': [],
-                            'user_accessible_modules': Module.objects.none(),
-                            'user_profile_permissions': None,
-                        })
-                except Exception as e:
-                    # Handle any user profile errors gracefully
-                    import logging
-                    logging.error(f"Enhanced permissions context error: {e}")
-                    context.update({
-                        'has_leads_view': False,
-                        'has_leads_create': False,
-                        'has_leads_edit': False,
-                        'has_leads_delete': False,
-                        'user_leads_count': 0,
-                        'leads_visible_fields': [],
-                        'leads_form_fields': [],
-                        'has_properties_view': False,
-                        'has_properties_create': False,
-                        'has_properties_edit': False,
-                        'has_properties_delete': False,
-                        'user_properties_count': 0,
-                        'properties_visible_fields': [],
-                        'properties_form_fields': [],
-                        'properties_data_filters': [],
-                        'has_projects_view': False,
-                        'has_projects_create': False,
-                        'has_projects_edit': False,
-                        'has_projects_delete': False,
-                        'user_projects_count': 0,
-                        'projects_visible_fields': [],
-                        'projects_form_fields': [],
-                        'user_accessible_modules': Module.objects.none(),
-                        'user_profile_permissions': None,
-                    })
-        except Exception as e:
-            # Fallback for any other errors
-            import logging
-            logging.error(f"Enhanced permissions context critical error: {e}")
-            context.update({
-                'has_leads_view': False,
-                'has_leads_create': False,
-                'has_leads_edit': False,
-                'has_leads_delete': False,
-                'user_leads_count': 0,
-                'leads_visible_fields': [],
-                'leads_form_fields': [],
-                'has_properties_view': False,
-                'has_properties_create': False,
-                'has_properties_edit': False,
-                'has_properties_delete': False,
-                'user_properties_count': 0,
-                'properties_visible_fields': [],
-                'properties_form_fields': [],
-                'properties_data_filters': [],
-                'has_projects_view': False,
-                'has_projects_create': False,
-                'has_projects_edit': False,
-                'has_projects_delete': False,
-                'user_projects_count': 0,
-                'projects_visible_fields': [],
-                'projects_form_fields': [],
-                'user_accessible_modules': Module.objects.none(),
-                'user_profile_permissions': None,
-            })
-    else:
-        # User not authenticated
-        context.update({
-            'has_leads_view': False,
-            'has_leads_create': False,
-            'has_leads_edit': False,
-            'has_leads_delete': False,
-            'user_leads_count': 0,
-            'leads_visible_fields': [],
-            'leads_form_fields': [],
-            'has_properties_view': False,
-            'has_properties_create': False,
-            'has_properties_edit': False,
-            'has_properties_delete': False,
-            'user_properties_count': 0,
-            'properties_visible_fields': [],
-            'properties_form_fields': [],
-            'properties_data_filters': [],
-            'has_projects_view': False,
-            'has_projects_create': False,
-            'has_projects_edit': False,
-            'has_projects_delete': False,
-            'user_projects_count': 0,
-            'projects_visible_fields': [],
-            'projects_form_fields': [],
-            'user_accessible_modules': Module.objects.none(),
-            'user_profile_permissions': None,
-        })
-    
-    return context
\ No newline at end of file
+    user = request.user
+    if not user.is_authenticated:
+        return _denied_context()
+
+    try:
+        permissions = get_permission_snapshot(user)
+    except Exception as e:
+        logger.error(f"Enhanced permissions context error: {e}")
+        return _denied_context()
+
+    if user.is_superuser:
+        context = {
+            'user_accessible_modules': Module.objects.all(),
+            'user_profile_permissions': None,  # Superuser doesn't need field restrictions
+        }
+        for prefix, module_name, model_name in CONTEXT_MODULES:
+            for code, _ in LEVELS:
+                context[f'has_{prefix}_{code}'] = True
+            context[f'user_{prefix}_count'] = _lazy(_record_count, user, None, module_name, model_name)
+        return context
+
+    if not permissions.has_profile:
+        return _denied_context()
+
+    # Only resolved (two queries) by templates that use the profile itself
+    profile = SimpleLazyObject(lambda: _get_profile(user))
+    context = {
+        'user_profile_permissions': profile,
+        'user_accessible_modules': Module.objects.filter(
+            permissions__profiles__id=permissions.profile_id,
+            is_active=True
+        ).distinct().order_by('order', 'name'),
+        'properties_data_filters': DataFilter.objects.filter(
+            profile_id=permissions.profile_id,
+            module__name='property',
+            model_name='Property',
+            is_active=True
+        ),
+    }
+    for prefix, module_name, model_name in CONTEXT_MODULES:
+        for code, level in LEVELS:
+            context[f'has_{prefix}_{code}'] = permissions.has_level(module_name, level)
+        if permissions.has_level(module_name, 1):
+            context[f'user_{prefix}_count'] = _lazy(_record_count, user, profile, module_name, model_name)
+        else:
+            context[f'user_{prefix}_count'] = 0
+        visible_fields = SimpleLazyObject(
+            lambda m=module_name, n=model_name: permissions.field_matrix.visible_fields(m, n)
+        )
+        context[f'{prefix}_visible_fields'] = visible_fields
+        context[f'{prefix}_form_fields'] = visible_fields
+    return context
@@ -0,0 +1,179 @@
+"""
+Typeahead lookups for the data filter builder.
+
+Related records are searched by prefix on their display column and paged with a
+keyset cursor on (display value, pk), projecting only those two columns. Prefix
+matches (LIKE 'abc%') are range scans on the display column's index: usernames and
+compound names are unique, and project and property names have their own index.
+Small domains are read once, cached and searched in memory. Their cache keys carry
+a per-model version that a save or delete of any record of the model moves on, so
+new and renamed records show up right away; queryset updates wait for the timeout.
+"""
+import base64
+import json
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+# Domains up to this size are cached whole and never paged
+SMALL_DOMAIN_SIZE = 200
+SMALL_DOMAIN_TIMEOUT = 300
+
+# Preferred display columns of a related model when the lookup does not name one
+DISPLAY_FIELDS = ('name', 'display_name', 'title', 'username')
+
+# Filter builder module -> (app label, model name) whose fields are looked up
+LOOKUP_MODELS = {
+    'leads': ('leads', 'Lead'),
+    'properties': ('properties', 'Property'),
+    'projects': ('projects', 'Project'),
+    'authentication': ('authentication', 'User'),
+}
+
+# Labels of the models whose small domains may be cached (their changes are tracked)
+_tracked_models = set()
+
+
+def get_choices_cache():
+    return caches[getattr(settings, 'FIELD_CHOICES_CACHE_ALIAS', 'default')]
+
+
+def _version_key(label):
+    return f'field_choices:version:{label}'
+
+
+def get_domain_version(label):
+    """Current version of a model's cached domains; never goes back to one used before"""
+    cache = get_choices_cache()
+    version = cache.get(_version_key(label))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(label), version, None)
+        version = cache.get(_version_key(label), version)
+    return version
+
+
+def _domain_changed(sender, **kwargs):
+    label = sender._meta.label_lower
+    transaction.on_commit(lambda: get_choices_cache().set(_version_key(label), time.time_ns(), None))
+
+
+def connect_domain_tracking():
+    """
+    Track the models the lookup fields point at. Only forward relations are followed:
+    receivers on the reverse side (e.g. audit rows) would stop Django from
+    fast-deleting those tables.
+    """
+    for app_label, model_name in LOOKUP_MODELS.values():
+        try:
+            model = apps.get_model(app_label, model_name)
+        except LookupError:
+            continue
+        for field in model._meta.get_fields():
+            if not field.is_relation or field.auto_created or field.related_model is None:
+                continue
+            target = field.related_model
+            label = target._meta.label_lower
+            if label in _tracked_models:
+                continue
+            post_save.connect(_domain_changed, sender=target, dispatch_uid=f'field_choices:save:{label}')
+            post_delete.connect(_domain_changed, sender=target, dispatch_uid=f'field_choices:delete:{label}')
+            _tracked_models.add(label)
+
+
+def get_display_field(model, requested=None):
+    """Name of the column shown for `model` records; raises LookupError for an unusable one"""
+    if requested is None:
+        concrete = {field.name for field in model._meta.concrete_fields}
+        return next((name for name in DISPLAY_FIELDS if name in concrete), model._meta.pk.name)
+
+    try:
+        field = model._meta.get_field(requested)
+    except FieldDoesNotExist:
+        raise LookupError(f'{model.__name__} has no field {requested}')
+    if not field.concrete or field.is_relation:
+        raise LookupError(f'{requested} is not a column of {model.__name__}')
+    return field.name
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value, pk], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Parse a cursor into (display value, pk); raises ValueError when it is malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return value, pk
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('Invalid choices cursor')
+
+
+def _choice(pk, value):
+    return {'id': pk, 'value': str(value), 'display': str(value)}
+
+
+def _matches(value, query):
+    return str(value).lower().startswith(query.lower())
+
+
+def _small_domain(model, display_field):
+    """Every (pk, display value) of a small domain, or None when the domain is large or untracked"""
+    label = model._meta.label_lower
+    if label not in _tracked_models:
+        return None
+    cache = get_choices_cache()
+    key = f'field_choices:{label}:{display_field}:{get_domain_version(label)}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            model._default_manager.filter(**{f'{display_field}__isnull': False}).order_by(
+                display_field, 'pk'
+            ).values_list('pk', display_field)[:SMALL_DOMAIN_SIZE + 1]
+        )
+        if len(rows) > SMALL_DOMAIN_SIZE:
+            rows = False  # remembered so large domains are not probed on every call
+        cache.set(key, rows, SMALL_DOMAIN_TIMEOUT)
+    return rows if rows is not False else None
+
+
+def related_choices(model, display_field, query='', cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Return (choices, next_cursor) for records of `model` whose display value starts
+    with `query`, ordered by display value. Raises ValueError for a malformed cursor.
+    """
+    if not cursor:
+        rows = _small_domain(model, display_field)
+        if rows is not None:
+            return [_choice(pk, value) for pk, value in rows if not query or _matches(value, query)], None
+
+    records = model._default_manager.filter(**{f'{display_field}__isnull': False})
+    if query:
+        records = records.filter(**{f'{display_field}__istartswith': query})
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        records = records.filter(Q(**{f'{display_field}__gt': value}) | Q(**{display_field: value, 'pk__gt': pk}))
+
+    rows = list(records.order_by(display_field, 'pk').values_list('pk', display_field)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return [_choice(pk, value) for pk, value in rows[:limit]], next_cursor
+
+
+def field_choices(field, query=''):
+    """Choices declared on a model field, narrowed to those whose label starts with `query`"""
+    return [
+        {'value': value, 'display': display}
+        for value, display in field.flatchoices
+        if not query or _matches(display, query)
+    ]
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.change_stream import consume, get_consumers, get_retention_days, prune_events
+
+# Seconds between prunes with --loop
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = ('Feed pending Lead/Property/Project change events to the configured change stream consumers '
+            'and prune old events')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', dest='consumers',
+                            help='Only run this consumer (repeatable); default is every configured one')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop each consumer after this many batches per pass')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when caught up')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+        parser.add_argument('--prune-days', type=int, default=None,
+                            help='Afterwards delete events older than this that every consumer has processed '
+                                 '(default settings.CHANGE_STREAM_RETENTION_DAYS)')
+        parser.add_argument('--no-prune', action='store_true', help='Do not delete old events')
+
+    def handle(self, *args, **options):
+        consumers = get_consumers()
+        if options['consumers']:
+            consumers = [consumer for consumer in consumers if consumer.name in options['consumers']]
+            missing = set(options['consumers']) - {consumer.name for consumer in consumers}
+            if missing:
+                raise CommandError(f"Unknown consumer(s): {', '.join(sorted(missing))}")
+        if not consumers:
+            self.stdout.write('No change stream consumers configured (settings.CHANGE_STREAM_CONSUMERS)')
+
+        last_prune = None
+        while True:
+            for consumer in consumers:
+                handled = consume(consumer, max_batches=options['max_batches'])
+                if handled or not options['loop']:
+                    self.stdout.write(f"  {consumer.name}: {handled} events")
+            if not options['no_prune'] and (last_prune is None or time.monotonic() - last_prune >= PRUNE_INTERVAL):
+                self.prune(options['prune_days'])
+                last_prune = time.monotonic()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Change stream is up to date'))
+
+    def prune(self, days):
+        if days is None:
+            days = get_retention_days()
+        pruned = prune_events(days)
+        self.stdout.write(f"Pruned {pruned} change events older than {days} days")
@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from .permissions import get_permission_snapshot
+
+
+class PermissionSnapshotMiddleware:
+    """
+    Attach the user's permission snapshot to the request as `request.permissions`
+
+    It is lazy: requests that never check a permission do not load it.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.permissions = SimpleLazyObject(lambda: get_permission_snapshot(request.user))
+        return self.get_response(request)
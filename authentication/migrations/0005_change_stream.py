@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_add_enhanced_rbac_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStreamOffset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='Model label, e.g. leads.lead', max_length=100)),
+                ('object_pk', models.CharField(max_length=191)),
+                ('operation', models.CharField(choices=[('create', 'Created'), ('update', 'Updated'), ('delete', 'Deleted')], max_length=10)),
+                ('changed_fields', models.JSONField(blank=True, default=list, help_text='Field names; empty for creates and deletes')),
+                ('version', models.PositiveIntegerField(help_text='Per-object sequence number, starting at 1')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model', 'object_pk', 'version')},
+            },
+        ),
+    ]
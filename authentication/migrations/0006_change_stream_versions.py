@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_versions(apps, schema_editor):
+    """Start every object's counter at the latest version already in the stream"""
+    ChangeEvent = apps.get_model('authentication', 'ChangeEvent')
+    ChangeStreamVersion = apps.get_model('authentication', 'ChangeStreamVersion')
+    rows = ChangeEvent.objects.values('model', 'object_pk').annotate(latest=Max('version')).order_by()
+    ChangeStreamVersion.objects.bulk_create(
+        (ChangeStreamVersion(model=row['model'], object_pk=row['object_pk'], version=row['latest']) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_change_stream'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changestreamoffset',
+            name='gap_since',
+            field=models.DateTimeField(blank=True, help_text='When the consumer first waited on a missing event id', null=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeStreamVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_pk', models.CharField(max_length=191)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('model', 'object_pk')},
+            },
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
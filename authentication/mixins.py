@@ -3,6 +3,7 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.contrib import messages
 from authentication.models import Module, Profile
+from authentication.permissions import get_permission_snapshot
 
 class EnhancedRBACMixin(LoginRequiredMixin):
     """Mixin to handle enhanced RBAC permissions"""
@@ -29,24 +30,7 @@ class EnhancedRBACMixin(LoginRequiredMixin):
         if not self.required_module:
             return True
         
-        try:
-            user_profile = request.user.user_profile
-            if not user_profile or not user_profile.profile:
-                return False
-            
-            module = Module.objects.filter(name=self.required_module).first()
-            if not module:
-                return False
-            
-            permissions = user_profile.profile.permissions.filter(
-                module=module,
-                level__gte=self.required_permission_level,
-                is_active=True
-            )
-            
-            return permissions.exists()
-        except:
-            return False
+        return get_permission_snapshot(request.user).has_level(self.required_module, self.required_permission_level)
     
     def get_user_profile(self):
         """Get current user's profile"""
@@ -71,9 +55,9 @@ class EnhancedRBACMixin(LoginRequiredMixin):
     
     def get_visible_fields(self, model_name, context_type='list'):
         """Get visible fields for current user"""
-        profile = self.get_user_profile()
-        if profile and self.required_module:
-            return profile.get_visible_fields(self.required_module, model_name, context_type)
+        permissions = get_permission_snapshot(self.request.user)
+        if permissions.has_profile and self.required_module:
+            return permissions.field_matrix.visible_fields(self.required_module, model_name, context_type)
         return None
 
 class LeadsRBACMixin(EnhancedRBACMixin):
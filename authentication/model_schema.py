@@ -0,0 +1,81 @@
+"""
+Model schema registry for the field permission editor.
+
+The editable models and fields of every installed app are introspected once, when the
+app registry is ready, and kept in memory. RBAC module names are resolved to apps once
+as well: by settings.RBAC_MODULE_APPS, then by the app label itself or its plural /
+singular form ('property' -> 'properties').
+"""
+from django.apps import apps
+from django.conf import settings
+
+# Models whose names contain these are internal and never get field permissions
+SKIPPED_MODEL_PARTS = ('through', 'history', 'preferences', 'audit')
+
+_schemas = {}
+_module_apps = {}
+
+
+def _field_schema(field):
+    return {
+        'name': field.name,
+        'verbose_name': getattr(field, 'verbose_name', field.name).title(),
+        'field_type': field.get_internal_type() if hasattr(field, 'get_internal_type') else 'Unknown',
+        'is_required': not getattr(field, 'blank', True) if hasattr(field, 'blank') else False,
+    }
+
+
+def _app_schema(app_config):
+    models_data = []
+    for model in app_config.get_models():
+        model_name = model._meta.model_name
+        if any(part in model_name for part in SKIPPED_MODEL_PARTS):
+            continue
+
+        # All fields except many-to-many and reverse relations
+        fields_data = [
+            _field_schema(field) for field in model._meta.get_fields()
+            if not (field.many_to_many or field.one_to_many)
+        ]
+        if fields_data:
+            verbose_name = model._meta.verbose_name
+            models_data.append({
+                'model_name': model.__name__,
+                'model_verbose_name': verbose_name.title() if verbose_name else model.__name__,
+                'fields': fields_data,
+            })
+    return models_data
+
+
+def load_schemas():
+    """Introspect every installed app; called from AppConfig.ready()"""
+    _schemas.clear()
+    _module_apps.clear()
+    for app_config in apps.get_app_configs():
+        _schemas[app_config.label] = _app_schema(app_config)
+
+
+def _candidate_labels(module_name):
+    candidates = [module_name, module_name + 's']
+    if module_name.endswith('s'):
+        candidates.append(module_name[:-1])
+    if module_name.endswith('y'):
+        candidates.append(module_name[:-1] + 'ies')
+    return candidates
+
+
+def get_module_app_label(module_name):
+    """App label holding a module's models, or None when the module has no app"""
+    if module_name not in _module_apps:
+        configured = getattr(settings, 'RBAC_MODULE_APPS', {}).get(module_name)
+        candidates = [configured] if configured else _candidate_labels(module_name)
+        _module_apps[module_name] = next((label for label in candidates if label in _schemas), None)
+    return _module_apps[module_name]
+
+
+def get_module_schema(module_name):
+    """[{'model_name', 'model_verbose_name', 'fields': [...]}] for a module, or None"""
+    if not _schemas:
+        load_schemas()
+    label = get_module_app_label(module_name)
+    return _schemas[label] if label else None
@@ -108,72 +108,43 @@ class Profile(models.Model):
             is_active=True
         )
     
+    def get_field_matrix(self):
+        """This profile's FieldPermissionMatrix from the shared permission cache"""
+        from .permissions import FieldPermissionMatrix
+
+        return FieldPermissionMatrix.for_profile(self.pk)
+    
     def can_view_field(self, module_name, model_name, field_name):
         """Check if profile can view a specific field"""
-        try:
-            field_perm = self.field_permissions.get(
-                module__name=module_name,
-                model_name=model_name,
-                field_name=field_name,
-                is_active=True
-            )
-            return field_perm.can_view
-        except FieldPermission.DoesNotExist:
-            return True  # Default to visible if no specific permission
+        # Default to visible if no specific permission
+        return self.get_field_matrix().can_view(module_name, model_name, field_name)
     
     def can_edit_field(self, module_name, model_name, field_name):
         """Check if profile can edit a specific field"""
-        try:
-            field_perm = self.field_permissions.get(
-                module__name=module_name,
-                model_name=model_name,
-                field_name=field_name,
-                is_active=True
-            )
-            return field_perm.can_edit
-        except FieldPermission.DoesNotExist:
-            return True  # Default to editable if no specific permission
+        # Default to editable if no specific permission
+        return self.get_field_matrix().can_edit(module_name, model_name, field_name)
     
     def get_visible_fields(self, module_name, model_name, view_type='list'):
         """Get list of visible fields for a view type"""
-        field_attr = f'is_visible_in_{view_type}'
-        
-        field_permissions = self.field_permissions.filter(
-            module__name=module_name,
-            model_name=model_name,
-            is_active=True
-        )
-        
-        visible_fields = []
-        for field_perm in field_permissions:
-            if getattr(field_perm, field_attr, True):
-                visible_fields.append(field_perm.field_name)
-        
-        return visible_fields
+        return self.get_field_matrix().visible_fields(module_name, model_name, view_type)
     
     def apply_data_filters(self, queryset, module_name, model_name):
         """Apply all active data filters for this profile"""
-        filters = self.data_filters.filter(
-            module__name=module_name,
-            model_name=model_name,
-            is_active=True
-        ).order_by('order')
-        
-        for data_filter in filters:
-            queryset = data_filter.apply_filter(queryset)
-        
-        return queryset
+        from .data_filters import get_data_filter_q
+
+        compiled = get_data_filter_q(self.pk, module_name, queryset.model)
+        return queryset.filter(compiled) if compiled is not None else queryset
     
     def apply_data_scope(self, queryset, module_name, user):
         """Apply data scope restrictions for this profile"""
-        try:
-            scope = self.data_scopes.get(
-                module__name=module_name,
-                is_active=True
-            )
-            return scope.apply_scope(queryset, user)
-        except ProfileDataScope.DoesNotExist:
+        from .permission_cache import get_data_scopes
+
+        compiled = get_data_scopes(self.pk).get(module_name)
+        if compiled is None:
             return queryset  # No scope restrictions
+        scope_id, scope_type, scope_config = compiled
+        scope = ProfileDataScope(id=scope_id, scope_type=scope_type, scope_config=scope_config)
+        return scope.apply_scope(queryset, user)
 
 
 class UserProfile(models.Model):
@@ -442,3 +413,49 @@ class UserActivity(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()} - {self.timestamp}"
+
+
+class ChangeEvent(models.Model):
+    """Append-only outbox of Lead, Property and Project changes (see authentication.change_stream)"""
+    OPERATIONS = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+    
+    model = models.CharField(max_length=100, help_text="Model label, e.g. leads.lead")
+    object_pk = models.CharField(max_length=191)
+    operation = models.CharField(max_length=10, choices=OPERATIONS)
+    changed_fields = models.JSONField(default=list, blank=True, help_text="Field names; empty for creates and deletes")
+    version = models.PositiveIntegerField(help_text="Per-object sequence number, starting at 1")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['model', 'object_pk', 'version']
+    
+    def __str__(self):
+        return f"{self.model}:{self.object_pk} v{self.version} {self.operation}"
+
+
+class ChangeStreamVersion(models.Model):
+    """Latest ChangeEvent version of one object; its row lock orders concurrent writers"""
+    model = models.CharField(max_length=100)
+    object_pk = models.CharField(max_length=191)
+    version = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['model', 'object_pk']
+    
+    def __str__(self):
+        return f"{self.model}:{self.object_pk} v{self.version}"
+
+
+class ChangeStreamOffset(models.Model):
+    """Last ChangeEvent id a consumer has processed"""
+    consumer = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    gap_since = models.DateTimeField(null=True, blank=True, help_text="When the consumer first waited on a missing event id")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.consumer} at #{self.last_event_id}"
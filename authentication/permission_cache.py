@@ -0,0 +1,194 @@
+"""
+Cross-worker cache of compiled RBAC data.
+
+Compiled profile data (module permissions, field permissions, data filters, data
+scopes) is stored in the cache named by settings.PERMISSION_CACHE_ALIAS under keys
+carrying the profile id and a global RBAC version number. Any change to a profile's
+permissions, a Permission, Module, FieldPermission, DataFilter or ProfileDataScope
+(including bulk updates from the admin actions) bumps the version once its
+transaction commits, so every worker moves to fresh keys at the same time and stale
+entries simply expire. Versions are nanosecond timestamps, so a version key lost to
+eviction or culling is replaced by a newer number and never brings back entries
+compiled under an older one. The user ->
+profile assignment is cached per user and dropped when the UserProfile changes.
+
+The alias must point at a backend shared by all workers (the file-based cache in the
+default settings, or Redis/Memcached); a per-process local-memory cache would keep
+serving old entries in the workers that did not see the change.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DataFilter, FieldPermission, Module, Permission, Profile, ProfileDataScope, UserProfile
+
+VERSION_KEY = 'rbac:version'
+
+# Entries are never stale under their own version; the timeout only bounds storage
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_permission_cache():
+    return caches[getattr(settings, 'PERMISSION_CACHE_ALIAS', 'default')]
+
+
+def _new_version():
+    # Later than every version handed out before, even when the key itself was lost
+    return time.time_ns()
+
+
+def get_version():
+    """Current RBAC version; never goes back to a number used before"""
+    cache = get_permission_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """Invalidate every compiled entry in all workers"""
+    cache = get_permission_cache()
+    # A fresh timestamp rather than incr(): incr is a read and rewrite on the file cache,
+    # so concurrent bumps could land on one number, and it would reset the key's timeout
+    version = max(_new_version(), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, None)
+
+
+def bump_version_on_commit():
+    transaction.on_commit(bump_version)
+
+
+def get_cached(name, key, build, version=None):
+    """
+    The compiled `name` entry for `key` (usually a profile id) at the current version,
+    built with build(key) and stored on a miss
+    """
+    cache = get_permission_cache()
+    cache_key = f'rbac:{name}:{key}:v{version or get_version()}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = build(key)
+        cache.set(cache_key, value, CACHE_TIMEOUT)
+    return value
+
+
+def _user_key(user_id):
+    return f'rbac:user:{user_id}'
+
+
+def get_user_profile_state(user_id):
+    """(profile_id, is_active) of the user's UserProfile, or (None, False) without one"""
+    cache = get_permission_cache()
+    state = cache.get(_user_key(user_id))
+    if state is None:
+        row = UserProfile.objects.filter(user_id=user_id).values_list('profile_id', 'is_active').first()
+        state = tuple(row) if row else (None, False)
+        cache.set(_user_key(user_id), state, CACHE_TIMEOUT)
+    return state
+
+
+def load_module_permissions(profile_id):
+    """{'levels': {module: max level}, 'codes': {(module, code)}, 'active_modules': {module}}"""
+    compiled = {'levels': {}, 'codes': set(), 'active_modules': set()}
+    rows = Permission.objects.filter(profiles__id=profile_id, is_active=True).values_list(
+        'module__name', 'module__is_active', 'code', 'level'
+    )
+    for module_name, module_active, code, level in rows:
+        compiled['codes'].add((module_name, code))
+        compiled['levels'][module_name] = max(level, compiled['levels'].get(module_name, 0))
+        if module_active:
+            compiled['active_modules'].add(module_name)
+    return compiled
+
+
+# Field permission flags, stored as one bit each (in this order) per field
+FIELD_PERMISSION_FLAGS = (
+    'can_view', 'can_edit', 'can_filter', 'is_visible_in_list', 'is_visible_in_detail', 'is_visible_in_forms',
+)
+
+
+def load_field_permissions(profile_id):
+    """{(module, model): {field: flag bits}} of the profile's active field permissions, from one query"""
+    compiled = {}
+    rows = FieldPermission.objects.filter(profile_id=profile_id, is_active=True).order_by(
+        'module', 'model_name', 'field_name'
+    ).values_list('module__name', 'model_name', 'field_name', *FIELD_PERMISSION_FLAGS)
+    for module_name, model_name, field_name, *flags in rows:
+        bits = sum(1 << index for index, value in enumerate(flags) if value)
+        compiled.setdefault((module_name, model_name), {})[field_name] = bits
+    return compiled
+
+
+def load_data_filters(profile_id):
+    """{(module, model): [(id, filter_type, filter_conditions)]} in application order"""
+    compiled = {}
+    rows = DataFilter.objects.filter(profile_id=profile_id, is_active=True).order_by('order', 'id').values_list(
+        'module__name', 'model_name', 'id', 'filter_type', 'filter_conditions'
+    )
+    for module_name, model_name, *data_filter in rows:
+        compiled.setdefault((module_name, model_name), []).append(tuple(data_filter))
+    return compiled
+
+
+def load_data_scopes(profile_id):
+    """{module: (id, scope_type, scope_config)} of the first active scope per module"""
+    compiled = {}
+    rows = ProfileDataScope.objects.filter(profile_id=profile_id, is_active=True).order_by('order', 'id').values_list(
+        'module__name', 'id', 'scope_type', 'scope_config'
+    )
+    for module_name, *scope in rows:
+        compiled.setdefault(module_name, tuple(scope))
+    return compiled
+
+
+def get_module_permissions(profile_id):
+    return get_cached('modules', profile_id, load_module_permissions)
+
+
+def get_field_permissions(profile_id):
+    return get_cached('field_bits', profile_id, load_field_permissions)
+
+
+def get_data_filters(profile_id):
+    return get_cached('filters', profile_id, load_data_filters)
+
+
+def get_data_scopes(profile_id):
+    return get_cached('scopes', profile_id, load_data_scopes)
+
+
+@receiver(m2m_changed, sender=Profile.permissions.through)
+def profile_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version_on_commit()
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=Permission)
+@receiver(post_save, sender=FieldPermission)
+@receiver(post_save, sender=DataFilter)
+@receiver(post_save, sender=ProfileDataScope)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=FieldPermission)
+@receiver(post_delete, sender=DataFilter)
+@receiver(post_delete, sender=ProfileDataScope)
+def rbac_definition_changed(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version_on_commit()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: get_permission_cache().delete(_user_key(instance.user_id)))
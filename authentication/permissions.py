@@ -0,0 +1,119 @@
+"""
+Per-request permission snapshots.
+
+Everything the RBAC checks need to know about a user (superuser status, whether a
+profile is assigned, the highest level per module and the granted (module, code)
+pairs) is read from the shared permission cache (two queries on a miss) the first
+time it is asked for, then kept on the user object, which lives exactly as long as
+the request. Decorators, helpers and template tags read from the snapshot instead
+of querying per check.
+"""
+from .permission_cache import (
+    FIELD_PERMISSION_FLAGS, get_field_permissions, get_module_permissions, get_user_profile_state,
+)
+
+
+class PermissionSnapshot:
+    """Compiled module permissions of one user"""
+
+    def __init__(self, is_superuser=False, has_profile=False, profile_id=None, levels=None, codes=None,
+                 active_modules=None):
+        self.is_superuser = is_superuser
+        self.has_profile = has_profile
+        self.profile_id = profile_id
+        # {module name: highest granted level}
+        self.levels = levels or {}
+        # {(module name, permission code)}
+        self.codes = codes or set()
+        # Modules with at least one permission that are themselves active
+        self.active_modules = active_modules or set()
+        self._field_matrix = None
+
+    @classmethod
+    def build(cls, user):
+        if not user.is_authenticated:
+            return cls()
+
+        profile_id, profile_active = get_user_profile_state(user.pk)
+        snapshot = cls(is_superuser=user.is_superuser, has_profile=profile_id is not None, profile_id=profile_id)
+        if profile_id is None or not profile_active:
+            return snapshot
+
+        compiled = get_module_permissions(profile_id)
+        snapshot.levels = compiled['levels']
+        snapshot.codes = compiled['codes']
+        snapshot.active_modules = compiled['active_modules']
+        return snapshot
+
+    def has_permission(self, module_name, code):
+        return self.is_superuser or (module_name, code) in self.codes
+
+    def max_level(self, module_name):
+        return 4 if self.is_superuser else self.levels.get(module_name, 0)
+
+    def has_level(self, module_name, level):
+        return self.max_level(module_name) >= level
+
+    def can_access(self, module_name):
+        return self.is_superuser or module_name in self.active_modules
+
+    @property
+    def field_matrix(self):
+        """The profile's FieldPermissionMatrix, loaded on first use"""
+        if self._field_matrix is None:
+            self._field_matrix = FieldPermissionMatrix.for_profile(self.profile_id)
+        return self._field_matrix
+
+
+FIELD_FLAG_BITS = {flag: 1 << index for index, flag in enumerate(FIELD_PERMISSION_FLAGS)}
+
+
+class FieldPermissionMatrix:
+    """
+    A profile's field permissions as {(module, model): {field: flag bits}}
+
+    Fields without an active FieldPermission row are unrestricted, matching the
+    Profile.can_view_field/can_edit_field defaults.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = fields or {}
+
+    @classmethod
+    def for_profile(cls, profile_id):
+        return cls(get_field_permissions(profile_id) if profile_id is not None else {})
+
+    def has_flag(self, module_name, model_name, field_name, flag):
+        bits = self.fields.get((module_name, model_name), {}).get(field_name)
+        return True if bits is None else bool(bits & FIELD_FLAG_BITS[flag])
+
+    def can_view(self, module_name, model_name, field_name):
+        return self.has_flag(module_name, model_name, field_name, 'can_view')
+
+    def can_edit(self, module_name, model_name, field_name):
+        return self.has_flag(module_name, model_name, field_name, 'can_edit')
+
+    def visible_fields(self, module_name, model_name, view_type='list'):
+        """Restricted fields shown in a view type; an empty list means no restrictions"""
+        bit = FIELD_FLAG_BITS.get(f'is_visible_in_{view_type}')
+        fields = self.fields.get((module_name, model_name), {})
+        return [name for name, bits in fields.items() if bit is None or bits & bit]
+
+    def is_visible(self, module_name, model_name, field_name, view_type='list'):
+        visible_fields = self.visible_fields(module_name, model_name, view_type)
+        return not visible_fields or field_name in visible_fields
+
+
+def get_permission_snapshot(user):
+    """The user's snapshot, built on first use and reused for the rest of the request"""
+    snapshot = getattr(user, '_permission_snapshot', None)
+    if snapshot is None:
+        snapshot = PermissionSnapshot.build(user)
+        user._permission_snapshot = snapshot
+    return snapshot
+
+
+def clear_permission_snapshot(user):
+    """Forget a user's snapshot, e.g. after changing their profile within the same request"""
+    if getattr(user, '_permission_snapshot', None) is not None:
+        del user._permission_snapshot
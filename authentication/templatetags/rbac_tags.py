@@ -1,6 +1,6 @@
 from django import template
 from django.utils.safestring import mark_safe
-from authentication.models import Profile
+from authentication.permissions import get_permission_snapshot
 
 register = template.Library()
 
@@ -77,13 +77,9 @@ def user_can_see_field(context, module_name, model_name, field_name, context_typ
     if request.user.is_superuser:
         return True
     
-    try:
-        user_profile = request.user.user_profile
-        if user_profile and user_profile.profile:
-            visible_fields = user_profile.profile.get_visible_fields(module_name, model_name, context_type)
-            return not visible_fields or field_name in visible_fields
-    except:
-        pass
+    permissions = get_permission_snapshot(request.user)
+    if permissions.has_profile:
+        return permissions.field_matrix.is_visible(module_name, model_name, field_name, context_type)
     
     return False
 
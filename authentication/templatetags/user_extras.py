@@ -1,5 +1,7 @@
 from django import template
 
+from authentication.permissions import get_permission_snapshot
+
 register = template.Library()
 
 @register.filter
@@ -18,3 +20,10 @@ def get_initials(user):
         # Use username
         username = user.username
         return username[:2].upper() if len(username) >= 2 else username.upper()
+
+
+@register.filter
+def has_module_permission(user, permission):
+    """Check a 'module.code' permission (e.g. 'audit.view') against the user's snapshot."""
+    module_name, _, code = permission.partition('.')
+    return (module_name, code) in get_permission_snapshot(user).codes
@@ -171,4 +171,49 @@ def get_user_activity_stats(user, days=30):
             'activity_types': [],
             'module_usage': [],
             'days_covered': days
-        }
\ No newline at end of file
+        }
+
+class InvalidSortError(ValueError):
+    """Raised when a list view is asked for a sort key it does not support"""
+
+
+class SortRegistry:
+    """
+    Whitelist of user-facing sort keys for a list view
+    
+    Each key maps to model fields that an index can serve in that order. The primary
+    key is appended as a tiebreaker so pagination is stable; InnoDB secondary indexes
+    already end in the primary key, so the tiebreaker does not add a filesort.
+    A leading '-' on the key reverses every field.
+    """
+    
+    def __init__(self, sorts, default):
+        self.sorts = dict(sorts)
+        self.default = default
+        self.resolve(default)
+    
+    def keys(self):
+        return list(self.sorts)
+    
+    def resolve(self, sort):
+        """
+        Return the order_by() arguments for a sort key
+        
+        Args:
+            sort (str): Sort key, optionally prefixed with '-' for descending; empty means default
+        
+        Raises:
+            InvalidSortError: If the key is not registered
+        """
+        sort = sort or self.default
+        descending = sort.startswith('-')
+        fields = self.sorts.get(sort.lstrip('-'))
+        if fields is None:
+            raise InvalidSortError(
+                f"Unsupported sort '{sort}'. Choose one of: {', '.join(self.sorts)}"
+            )
+        prefix = '-' if descending else ''
+        return [f'{prefix}{field}' for field in fields] + [f'{prefix}pk']
+    
+    def apply(self, queryset, sort):
+        return queryset.order_by(*self.resolve(sort))
@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
@@ -13,6 +13,9 @@ from django import forms
 import json
 
 from .models import Module, Permission, Rule, Profile, UserProfile, UserActivity, FieldPermission, DataFilter, DynamicDropdown
+from .field_choices import DEFAULT_LIMIT, LOOKUP_MODELS, MAX_LIMIT, field_choices, get_display_field, related_choices
+from .model_schema import get_module_schema
+from .permission_cache import get_cached
 
 
 def login_view(request):
@@ -429,130 +432,74 @@ def update_profile_permissions(request, profile_id):
 @login_required
 def get_module_fields(request, profile_id, module_name):
     """Get all model fields for a specific module to display field permissions"""
-    print(f"🔍 get_module_fields called: profile_id={profile_id}, module_name={module_name}")
-    
     if not request.user.is_superuser:
-        print(f"❌ Access denied: user {request.user.username} is not superuser")
         return JsonResponse({'error': 'Access denied'}, status=403)
     
     try:
-        from django.apps import apps
-        profile = get_object_or_404(Profile, id=profile_id)
-        print(f"✅ Profile found: {profile.name}")
-        
-        module = get_object_or_404(Module, name=module_name)
-        print(f"✅ Module found: {module.display_name}")
-        
-        # Get all models for this module
-        # Try to find the Django app with name variations
-        app_config = None
-        app_name_to_use = module_name
-        
-        # Try exact match first
-        try:
-            app_config = apps.get_app_config(module_name)
-            print(f"✅ App config found for {module_name} (exact match)")
-        except LookupError:
-            # Try with 's' added (property -> properties)
-            try:
-                app_config = apps.get_app_config(module_name + 's')
-                app_name_to_use = module_name + 's'
-                print(f"✅ App config found for {app_name_to_use} (plural)")
-            except LookupError:
-                # Try without 's' (leads -> lead)
-                if module_name.endswith('s'):
-                    try:
-                        app_config = apps.get_app_config(module_name[:-1])
-                        app_name_to_use = module_name[:-1]
-                        print(f"✅ App config found for {app_name_to_use} (singular)")
-                    except LookupError:
-                        pass
-                
-                # Try y -> ies (property -> properties)
-                if not app_config and module_name.endswith('y'):
-                    try:
-                        app_config = apps.get_app_config(module_name[:-1] + 'ies')
-                        app_name_to_use = module_name[:-1] + 'ies'
-                        print(f"✅ App config found for {app_name_to_use} (y->ies)")
-                    except LookupError:
-                        pass
-        
-        if not app_config:
+        # Cached per profile and RBAC version; a miss costs two queries
+        models_data = get_cached(
+            'editor_fields', f'{profile_id}:{module_name}',
+            lambda key: _module_field_permissions(profile_id, module_name)
+        )
+        if models_data is None:
             error_msg = f'Django app not found for module "{module_name}". This module may have been deleted from the codebase.'
-            print(f"❌ {error_msg}")
             return JsonResponse({'error': error_msg}, status=404)
         
-        models_data = []
-        
-        for model in app_config.get_models():
-            # Skip through models, history models, and preference models
-            model_name = model._meta.model_name
-            if model_name and ('through' in model_name or 'history' in model_name or 'preferences' in model_name or 'audit' in model_name):
-                continue
-            
-            fields_data = []
-            
-            # Get all fields except many-to-many and reverse relations
-            for field in model._meta.get_fields():
-                if field.many_to_many or field.one_to_many:
-                    continue
-                
-                # Get existing field permission if any
-                try:
-                    field_perm = FieldPermission.objects.get(
-                        profile=profile,
-                        module=module,
-                        model_name=model.__name__,
-                        field_name=field.name
-                    )
-                    can_view = field_perm.can_view
-                    can_edit = field_perm.can_edit
-                except FieldPermission.DoesNotExist:
-                    # Default: all fields visible and editable
-                    can_view = True
-                    can_edit = True
-                
-                field_info = {
-                    'name': field.name,
-                    'verbose_name': getattr(field, 'verbose_name', field.name).title(),
-                    'field_type': field.get_internal_type() if hasattr(field, 'get_internal_type') else 'Unknown',
-                    'can_view': can_view,
-                    'can_edit': can_edit,
-                    'is_required': not getattr(field, 'blank', True) if hasattr(field, 'blank') else False,
-                }
-                
-                fields_data.append(field_info)
-            
-            if fields_data:  # Only include models that have fields
-                verbose_name = model._meta.verbose_name
-                model_verbose_name = verbose_name.title() if verbose_name else model.__name__
-                models_data.append({
-                    'model_name': model.__name__,
-                    'model_verbose_name': model_verbose_name,
-                    'fields': fields_data
-                })
-        
-        print(f"✅ Found {len(models_data)} models with fields for {module_name}")
-        
         return JsonResponse({
             'success': True,
             'module': module_name,
             'models': models_data
         })
         
+    except Http404:
+        raise
     except Exception as e:
         import traceback
-        error_msg = str(e)
-        traceback_str = traceback.format_exc()
-        print(f"❌ Error getting module fields: {error_msg}")
-        print(f"❌ Traceback: {traceback_str}")
         return JsonResponse({
             'success': False,
-            'error': error_msg,
-            'traceback': traceback_str if request.user.is_superuser else None
+            'error': str(e),
+            'traceback': traceback.format_exc() if request.user.is_superuser else None
         }, status=500)
 
 
+def _module_field_permissions(profile_id, module_name):
+    """
+    The module's model schema with the profile's can_view/can_edit merged in, or None
+    when no Django app holds the module
+    """
+    module = get_object_or_404(Module, name=module_name)
+    schema = get_module_schema(module.name)
+    if schema is None:
+        return None
+    
+    permissions = {
+        (model_name, field_name): (can_view, can_edit)
+        for model_name, field_name, can_view, can_edit in FieldPermission.objects.filter(
+            profile_id=profile_id, module=module
+        ).values_list('model_name', 'field_name', 'can_view', 'can_edit')
+    }
+    # Rows prove the profile exists; only check when it has none
+    if not permissions and not Profile.objects.filter(id=profile_id).exists():
+        raise Http404('No Profile matches the given query.')
+    
+    models_data = []
+    for model_schema in schema:
+        fields_data = []
+        for field in model_schema['fields']:
+            # Default: all fields visible and editable
+            can_view, can_edit = permissions.get((model_schema['model_name'], field['name']), (True, True))
+            fields_data.append({
+                'name': field['name'],
+                'verbose_name': field['verbose_name'],
+                'field_type': field['field_type'],
+                'can_view': can_view,
+                'can_edit': can_edit,
+                'is_required': field['is_required'],
+            })
+        models_data.append({**model_schema, 'fields': fields_data})
+    return models_data
+
+
 @login_required
 def assign_user_profile_view(request, user_id):
     """Assign profile to user"""
@@ -999,19 +946,11 @@ def get_model_fields_for_filter(request, module_name):
     try:
         from django.apps import apps
         
-        # Map module names to app names and model names
-        model_map = {
-            'leads': ('leads', 'Lead'),
-            'properties': ('properties', 'Property'),
-            'projects': ('projects', 'Project'),
-            'authentication': ('authentication', 'User'),
-        }
-        
         module_lower = module_name.lower()
-        if module_lower not in model_map:
+        if module_lower not in LOOKUP_MODELS:
             return JsonResponse({'error': f'Unknown module: {module_name}'}, status=400)
         
-        app_label, model_name = model_map[module_lower]
+        app_label, model_name = LOOKUP_MODELS[module_lower]
         
         try:
             model = apps.get_model(app_label, model_name)
@@ -1106,26 +1045,23 @@ def get_model_fields_for_filter(request, module_name):
 @csrf_exempt
 @login_required
 def get_field_choices(request, module_name, field_name):
-    """Get available choices/values for a specific field (especially ForeignKey fields)"""
+    """
+    Get available choices/values for a specific field (especially ForeignKey fields)
+    
+    Related records are searched by display-value prefix (`q`) and paged with `cursor`
+    (the previous response's `next_cursor`) and `limit`.
+    """
     if not request.user.is_superuser:
         return JsonResponse({'error': 'Access denied'}, status=403)
     
     try:
         from django.apps import apps
         
-        # Map module names to app names and model names
-        model_map = {
-            'leads': ('leads', 'Lead'),
-            'properties': ('properties', 'Property'),
-            'projects': ('projects', 'Project'),
-            'authentication': ('authentication', 'User'),
-        }
-        
         module_lower = module_name.lower()
-        if module_lower not in model_map:
+        if module_lower not in LOOKUP_MODELS:
             return JsonResponse({'error': f'Unknown module: {module_name}'}, status=400)
         
-        app_label, model_name = model_map[module_lower]
+        app_label, model_name = LOOKUP_MODELS[module_lower]
         
         try:
             model = apps.get_model(app_label, model_name)
@@ -1142,60 +1078,45 @@ def get_field_choices(request, module_name, field_name):
         except Exception as e:
             return JsonResponse({'error': f'Field not found: {field_name}'}, status=404)
         
-        choices = []
+        query = request.GET.get('q', '').strip()
+        next_cursor = None
         
         # Check if it's a ForeignKey
-        if hasattr(field, 'related_model'):
+        if field.is_relation and field.related_model:
             related_model = field.related_model
             
-            # Determine which field to display
-            if len(field_parts) > 1:
-                display_field = field_parts[1]  # e.g., "name" from "property_type__name"
-            else:
-                # Try to find a suitable display field
-                if hasattr(related_model, 'name'):
-                    display_field = 'name'
-                elif hasattr(related_model, 'display_name'):
-                    display_field = 'display_name'
-                elif hasattr(related_model, 'title'):
-                    display_field = 'title'
-                else:
-                    display_field = 'id'
+            # Determine which field to display, e.g. "name" from "property_type__name"
+            try:
+                display_field = get_display_field(related_model, field_parts[1] if len(field_parts) > 1 else None)
+            except LookupError:
+                return JsonResponse({'error': f'Field not found: {field_name}'}, status=404)
             
-            # Fetch all records from the related model
             try:
-                records = related_model.objects.all()[:100]  # Limit to 100 for performance
-                
-                for record in records:
-                    if hasattr(record, display_field):
-                        value = getattr(record, display_field)
-                        choices.append({
-                            'id': record.pk,
-                            'value': str(value),
-                            'display': str(value)
-                        })
-                    else:
-                        choices.append({
-                            'id': record.pk,
-                            'value': str(record.pk),
-                            'display': str(record)
-                        })
-            except Exception as e:
-                return JsonResponse({'error': f'Error fetching records: {str(e)}'}, status=500)
+                limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            except ValueError:
+                limit = DEFAULT_LIMIT
+            
+            try:
+                choices, next_cursor = related_choices(
+                    related_model, display_field, query, request.GET.get('cursor'), limit
+                )
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
         
         # Check if field has choices defined
-        elif hasattr(field, 'choices') and field.choices:
-            for choice_value, choice_display in field.choices:
-                choices.append({
-                    'value': choice_value,
-                    'display': choice_display
-                })
+        elif field.choices:
+            choices = field_choices(field, query)
+        
+        else:
+            choices = []
         
         return JsonResponse({
             'success': True,
             'field': field_name,
             'choices': choices,
-            'has_choices': len(choices) > 0
+            'has_choices': len(choices) > 0,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
         })
         
     except Exception as e:
@@ -0,0 +1,289 @@
+"""
+Automatic lead assignment.
+
+Eligible users are picked by profile. Their open-lead counts are kept in
+LeadOpenCount rows: the engine adds the leads it hands out, and lead saves and
+deletes move counts as leads change assignee or open state, each with an F()
+update inside the change's own transaction so concurrent changes cannot lose an
+increment and rolled back ones leave no trace. A user's count is recounted only
+when it is missing or older than COUNT_TIMEOUT, which also picks up changes made by
+queryset updates. Within a run counts live in an in-memory heap (or rotation).
+Assignments are written in batches with one UPDATE per user plus bulk-created
+activity and audit rows.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from authentication.change_stream import record_changes
+from authentication.models import Permission
+from .models import Lead, LeadActivity, LeadAudit, LeadOpenCount
+
+STRATEGIES = ('round_robin', 'least_open', 'weighted_capacity')
+
+DEFAULT_CONFIG = {
+    'STRATEGY': 'least_open',
+    # {profile name: open-lead capacity}; empty means every active profile with lead edit rights
+    'PROFILES': {},
+    'DEFAULT_CAPACITY': 50,
+    'BATCH_SIZE': 500,
+    # Assign leads created without an owner in the lead form; imports opt in per upload
+    'ON_CREATE': False,
+    # Holds the round-robin pointer, so it must be shared by all workers
+    'CACHE_ALIAS': 'shared',
+}
+
+ROUND_ROBIN_CACHE_KEY = 'leads:assignment:last_user'
+
+# Counts are recounted once this old, to pick up changes made without save()
+COUNT_TIMEOUT = 600
+
+
+def get_assignment_config():
+    """DEFAULT_CONFIG overlaid with settings.LEAD_AUTO_ASSIGNMENT"""
+    return dict(DEFAULT_CONFIG, **getattr(settings, 'LEAD_AUTO_ASSIGNMENT', {}))
+
+
+def open_leads_filter():
+    """Leads still being worked: not converted and not in a final (Won/Lost) status"""
+    return Q(converted_at__isnull=True) & (Q(status__isnull=True) | Q(status__is_final=False))
+
+
+def get_assignment_cache():
+    return caches[get_assignment_config()['CACHE_ALIAS']]
+
+
+def get_open_counts(user_ids):
+    """{user_id: open leads} from the kept counts, recounting users whose count is missing or old"""
+    now = timezone.now()
+    counts = dict(
+        LeadOpenCount.objects.filter(
+            user_id__in=user_ids, counted_at__gte=now - timedelta(seconds=COUNT_TIMEOUT)
+        ).values_list('user_id', 'open_leads')
+    )
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        loaded = dict.fromkeys(missing, 0)
+        loaded.update(
+            Lead.objects.filter(open_leads_filter(), assigned_to_id__in=missing).order_by(
+            ).values_list('assigned_to_id').annotate(count=Count('id'))
+        )
+        with transaction.atomic():
+            stored = set()
+            for user_id, count in loaded.items():
+                if LeadOpenCount.objects.filter(user_id=user_id).update(open_leads=count, counted_at=now):
+                    stored.add(user_id)
+            LeadOpenCount.objects.bulk_create(
+                [
+                    LeadOpenCount(user_id=user_id, open_leads=count, counted_at=now)
+                    for user_id, count in loaded.items() if user_id not in stored
+                ],
+                ignore_conflicts=True,
+            )
+        counts.update(loaded)
+    return counts
+
+
+def adjust_open_count(user_id, delta):
+    """
+    Move a user's kept count; call inside the transaction of the lead change. A user
+    without a count is counted afresh when next needed.
+    """
+    if user_id and delta:
+        LeadOpenCount.objects.filter(user_id=user_id).update(open_leads=F('open_leads') + delta)
+
+
+def track_lead_change(old_user_id, was_open, new_user_id, is_open):
+    """Update the kept counts for a lead moving between assignees or open states"""
+    if (old_user_id, was_open) == (new_user_id, is_open):
+        return
+    if was_open:
+        adjust_open_count(old_user_id, -1)
+    if is_open:
+        adjust_open_count(new_user_id, 1)
+
+
+class LeadAssignmentEngine:
+    """Distribute unassigned leads among eligible users"""
+
+    def __init__(self, strategy=None, batch_size=None, actor=None):
+        config = get_assignment_config()
+        self.strategy = strategy or config['STRATEGY']
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown assignment strategy '{self.strategy}'. Choose one of: {', '.join(STRATEGIES)}")
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.profiles = config['PROFILES']
+        self.default_capacity = config['DEFAULT_CAPACITY']
+        self.actor = actor
+
+        self.capacity = self._load_capacity()
+        self.open_counts = self._load_open_counts()
+        self._heap = None
+        self._rotation = None
+
+    def _load_capacity(self):
+        """Map eligible user ids to their open-lead capacity"""
+        users = User.objects.filter(
+            is_active=True,
+            user_profile__is_active=True,
+            user_profile__profile__is_active=True,
+        )
+        if self.profiles:
+            users = users.filter(user_profile__profile__name__in=list(self.profiles))
+        else:
+            editors = Permission.objects.filter(module__name='leads', level__gte=2, is_active=True)
+            users = users.filter(user_profile__profile__permissions__in=editors)
+
+        return {
+            user_id: self.profiles.get(profile_name, self.default_capacity)
+            for user_id, profile_name in users.values_list('id', 'user_profile__profile__name').distinct()
+        }
+
+    def _load_open_counts(self):
+        """Current open leads per eligible user, from the tracked counts"""
+        return get_open_counts(list(self.capacity))
+
+    def _has_room(self, user_id):
+        return self.open_counts[user_id] < self.capacity[user_id]
+
+    def _priority(self, user_id):
+        if self.strategy == 'weighted_capacity':
+            return (self.open_counts[user_id] / self.capacity[user_id] if self.capacity[user_id] else 1.0, user_id)
+        return (self.open_counts[user_id], user_id)
+
+    def _next_round_robin(self):
+        if self._rotation is None:
+            ordered = sorted(self.capacity)
+            last = get_assignment_cache().get(ROUND_ROBIN_CACHE_KEY)
+            start = next((i for i, user_id in enumerate(ordered) if user_id > last), 0) if last else 0
+            self._rotation = ordered[start:] + ordered[:start]
+        for _ in range(len(self._rotation)):
+            user_id = self._rotation.pop(0)
+            self._rotation.append(user_id)
+            if self._has_room(user_id):
+                return user_id
+        return None
+
+    def _next_by_load(self):
+        if self._heap is None:
+            self._heap = [self._priority(user_id) for user_id in self.capacity if self._has_room(user_id)]
+            heapq.heapify(self._heap)
+        if not self._heap:
+            return None
+        _, user_id = heapq.heappop(self._heap)
+        return user_id
+
+    def next_user(self):
+        """Pick the next assignee and count the lead against them; None when everyone is full"""
+        if self.strategy == 'round_robin':
+            user_id = self._next_round_robin()
+        else:
+            user_id = self._next_by_load()
+        if user_id is None:
+            return None
+
+        self.open_counts[user_id] += 1
+        if self.strategy != 'round_robin' and self._has_room(user_id):
+            heapq.heappush(self._heap, self._priority(user_id))
+        return user_id
+
+    def assign(self, leads):
+        """
+        Assign the given unassigned leads; returns {user_id: count} of the leads actually
+        claimed, which leaves out any assigned by someone else meanwhile
+
+        `leads` is an iterable of Lead instances (only id, first_name and last_name are read).
+        """
+        plan = defaultdict(list)
+        for lead in leads:
+            user_id = self.next_user()
+            if user_id is None:
+                break
+            plan[user_id].append(lead)
+
+        if not plan:
+            return {}
+        assigned = self._apply(plan)
+        if self.strategy == 'round_robin':
+            get_assignment_cache().set(ROUND_ROBIN_CACHE_KEY, self._rotation[-1], None)
+        return assigned
+
+    def assign_unassigned(self):
+        """Assign every unassigned open lead, oldest first, in batches; returns {user_id: count}"""
+        totals = defaultdict(int)
+        queryset = Lead.objects.filter(open_leads_filter(), assigned_to__isnull=True).only(
+            'id', 'first_name', 'last_name'
+        ).order_by('created_at', 'id')
+
+        while True:
+            batch = list(queryset[:self.batch_size])
+            if not batch:
+                break
+            assigned = self.assign(batch)
+            for user_id, count in assigned.items():
+                totals[user_id] += count
+            if sum(assigned.values()) < len(batch):
+                break  # everyone is at capacity
+        return dict(totals)
+
+    def _apply(self, plan):
+        now = timezone.now()
+        names = dict(
+            (user.id, user.get_full_name() or user.username)
+            for user in User.objects.filter(id__in=list(plan)).only('id', 'first_name', 'last_name', 'username')
+        )
+        actor_name = self.actor.get_full_name() if self.actor else ''
+
+        activities = []
+        audits = []
+        assigned = {}
+        with transaction.atomic():
+            for user_id, leads in plan.items():
+                ids = [lead.id for lead in leads]
+                # Only touch leads that are still unassigned, in case someone beat us to them
+                claimed = set(Lead.objects.filter(id__in=ids, assigned_to__isnull=True).values_list('id', flat=True))
+                Lead.objects.filter(id__in=claimed).update(assigned_to_id=user_id, updated_at=now)
+                record_changes(Lead, claimed, ['assigned_to', 'updated_at'])
+                # The UPDATE bypasses save(), so the leads are counted here
+                adjust_open_count(user_id, len(claimed))
+                if claimed:
+                    assigned[user_id] = len(claimed)
+
+                for lead in leads:
+                    if lead.id not in claimed:
+                        self.open_counts[user_id] -= 1
+                        continue
+                    activities.append(LeadActivity(
+                        lead_id=lead.id,
+                        user=self.actor,
+                        activity_type='assignment',
+                        title='Lead Auto-Assigned',
+                        description=f'Lead automatically assigned to {names[user_id]} ({self.strategy.replace("_", " ")})',
+                        is_completed=True,
+                        completed_at=now,
+                    ))
+                    audits.append(LeadAudit(
+                        lead_id=lead.id,
+                        lead_id_backup=lead.id,
+                        lead_name_backup=lead.full_name,
+                        action='assignment_change',
+                        description=f'Assigned To changed: None → {names[user_id]}',
+                        field_name='assigned_to',
+                        new_value=names[user_id],
+                        user=self.actor,
+                        user_name_backup=actor_name,
+                        source='auto_assign',
+                        severity='high',
+                        is_system_generated=True,
+                    ))
+
+            LeadActivity.objects.bulk_create(activities, batch_size=self.batch_size)
+            LeadAudit.objects.bulk_create(audits, batch_size=self.batch_size)
+        return assigned
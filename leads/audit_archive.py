@@ -0,0 +1,356 @@
+"""
+Monthly LeadAudit archival.
+
+Closed months are streamed out of the hot lead_audit table into gzip-compressed JSON
+Lines files (one per month, plus part files for late runs), recorded in
+LeadAuditArchive, and then purged from the hot table in small id-ordered chunks.
+Reads fall through to the archive, so audits stay reachable by id or time range.
+
+Each file is a series of gzip members of BLOCK_SIZE id-ordered rows. The archive
+entry keeps the first id and byte offset of every block, and LeadAuditArchiveLead
+lists the blocks holding each lead's audits, so a lookup by id or by lead
+decompresses only the blocks it needs. Files written before blocks existed are
+converted with `archive_lead_audits --reindex`.
+
+Native MySQL partitioning is not an option here: InnoDB does not allow foreign keys
+on partitioned tables and LeadAudit references Lead and User.
+"""
+import bisect
+import gzip
+import json
+import logging
+import os
+from collections import deque
+from datetime import date, datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .audit_rollups import rollup_audits
+from .models import LeadAudit, LeadAuditArchive, LeadAuditArchiveLead, LeadAuditSearchToken
+
+DEFAULT_KEEP_MONTHS = 3
+DEFAULT_CHUNK_SIZE = 5000
+
+# Rows per gzip member; the unit read for a lookup by id or lead
+BLOCK_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FIELDS = [field for field in LeadAudit._meta.concrete_fields]
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'LEAD_AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'lead_audits'))
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Aware [start, end) datetimes of a month in the current time zone"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime(month.year, month.month, 1), tz)
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), datetime.min.time()), tz)
+    return start, end
+
+
+def closed_months(keep_months=DEFAULT_KEEP_MONTHS, now=None):
+    """Months older than the retention window that still have rows in the hot table, oldest first"""
+    now = timezone.localtime(now or timezone.now())
+    cutoff = add_months(month_start(now), -keep_months)
+    oldest = LeadAudit.objects.aggregate(oldest=Min('timestamp'))['oldest']
+    if oldest is None:
+        return []
+
+    months = []
+    month = month_start(timezone.localtime(oldest))
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def serialize_audit(row):
+    return json.dumps(row, default=str, separators=(',', ':'))
+
+
+def parse_audit_values(line):
+    """Column values (by attname) of an archived JSON line"""
+    record = json.loads(line)
+    values = {}
+    for field in AUDIT_FIELDS:
+        value = record.get(field.attname)
+        target = field.target_field if field.is_relation else field
+        values[field.attname] = target.to_python(value) if value is not None else None
+    return values
+
+
+def deserialize_audit(line):
+    """Rebuild an unsaved LeadAudit from an archived JSON line"""
+    audit = LeadAudit(**parse_audit_values(line))
+    audit.is_archived = True
+    return audit
+
+
+def purge_audits(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Delete the queryset's rows and their search tokens in id-ordered chunks; returns the number deleted
+
+    Small primary-key deletes keep each transaction short and avoid the long locks and
+    replication lag of one huge DELETE.
+    """
+    deleted = 0
+    queryset = queryset.order_by('id')
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            LeadAuditSearchToken.objects.filter(audit_id__in=ids).delete()
+            deleted += LeadAudit.objects.filter(id__in=ids).delete()[0]
+
+
+def _archive_path(month):
+    """Relative path for a month's archive file, adding a part suffix if one already exists"""
+    base = f"{month:%Y}/{month:%Y-%m}"
+    relative = f"{base}.jsonl.gz"
+    part = 1
+    while (get_archive_dir() / relative).exists() or LeadAuditArchive.objects.filter(file_path=relative).exists():
+        part += 1
+        relative = f"{base}.part{part}.jsonl.gz"
+    return relative
+
+
+class _BlockWriter:
+    """Writes id-ordered audit rows as gzip members of BLOCK_SIZE rows, indexing them by lead"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.pending = []
+        self.blocks = []
+        self.leads = {}
+        self.count = 0
+        self.min_id = self.max_id = self.first_timestamp = self.last_timestamp = None
+
+    def add(self, row):
+        self.pending.append(row)
+        if len(self.pending) == BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        index = len(self.blocks)
+        self.blocks.append([rows[0]['id'], self.sink.tell()])
+        self.sink.write(gzip.compress(''.join(serialize_audit(row) + '\n' for row in rows).encode('utf-8')))
+
+        for row in rows:
+            timestamp = row['timestamp']
+            self.first_timestamp = min(self.first_timestamp or timestamp, timestamp)
+            self.last_timestamp = max(self.last_timestamp or timestamp, timestamp)
+            if row['lead_id_backup'] is None:
+                continue
+            entry = self.leads.setdefault(row['lead_id_backup'], {'blocks': [], 'last_timestamp': timestamp})
+            if not entry['blocks'] or entry['blocks'][-1] != index:
+                entry['blocks'].append(index)
+            entry['last_timestamp'] = max(entry['last_timestamp'], timestamp)
+        self.count += len(rows)
+        self.min_id = self.min_id or rows[0]['id']
+        self.max_id = rows[-1]['id']
+
+    def save_lead_index(self, archive):
+        LeadAuditArchiveLead.objects.bulk_create([
+            LeadAuditArchiveLead(
+                archive=archive,
+                lead_id_backup=lead_id,
+                blocks=entry['blocks'],
+                last_timestamp=entry['last_timestamp'],
+            )
+            for lead_id, entry in self.leads.items()
+        ], batch_size=1000)
+
+
+def _write_blocks(temp, row_chunks):
+    """Write row chunks to `temp` as blocks and sync it to disk; returns the writer"""
+    with open(temp, 'wb') as sink:
+        writer = _BlockWriter(sink)
+        for chunk in row_chunks:
+            for row in chunk:
+                writer.add(row)
+        writer.flush()
+        # The rows are deleted right after this, so make sure the file is really on disk
+        sink.flush()
+        os.fsync(sink.fileno())
+    return writer
+
+
+def archive_month(month, chunk_size=DEFAULT_CHUNK_SIZE, purge=True):
+    """
+    Move one month of audits from the hot table into a compressed archive file
+
+    Returns the LeadAuditArchive entry, or None when the month has no rows.
+    """
+    start, end = month_bounds(month)
+    rows = LeadAudit.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by('id')
+    attnames = [field.attname for field in AUDIT_FIELDS]
+
+    relative = _archive_path(month)
+    target = get_archive_dir() / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(target.name + '.tmp')
+
+    def chunks():
+        last_id = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id).values(*attnames)[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1]['id']
+
+    writer = _write_blocks(temp, chunks())
+    if not writer.count:
+        temp.unlink()
+        return None
+
+    os.replace(temp, target)
+    with transaction.atomic():
+        archive = LeadAuditArchive.objects.create(
+            month=month,
+            file_path=relative,
+            row_count=writer.count,
+            min_id=writer.min_id,
+            max_id=writer.max_id,
+            first_timestamp=writer.first_timestamp,
+            last_timestamp=writer.last_timestamp,
+            blocks=writer.blocks,
+        )
+        writer.save_lead_index(archive)
+
+    if purge:
+        # Purged rows must already be counted in the statistics rollups
+        rollup_audits()
+        # Only ids that made it into the file; nothing newer can land in a closed month
+        purge_audits(rows.filter(id__lte=writer.max_id), chunk_size)
+    return archive
+
+
+def reindex_archive(archive):
+    """Rewrite an archive file from before blocks existed into blocks and index its leads"""
+    path = get_archive_dir() / archive.file_path
+    temp = path.with_name(path.name + '.tmp')
+    with gzip.open(path, 'rt', encoding='utf-8') as source:
+        records = sorted(
+            (parse_audit_values(line) for line in source if line.strip()),
+            key=lambda values: values['id'],
+        )
+    writer = _write_blocks(temp, [records])
+    os.replace(temp, path)
+    with transaction.atomic():
+        archive.blocks = writer.blocks
+        archive.save(update_fields=['blocks'])
+        archive.lead_entries.all().delete()
+        writer.save_lead_index(archive)
+    return archive
+
+
+def _read_lines(path, archive, blocks):
+    """Lines of the whole file, or only of the given block indexes"""
+    if blocks is None or not archive.blocks:
+        with gzip.open(path, 'rt', encoding='utf-8') as source:
+            yield from source
+        return
+    with open(path, 'rb') as source:
+        for index in blocks:
+            offset = archive.blocks[index][1]
+            source.seek(offset)
+            if index + 1 < len(archive.blocks):
+                data = source.read(archive.blocks[index + 1][1] - offset)
+            else:
+                data = source.read()
+            yield from gzip.decompress(data).decode('utf-8').splitlines()
+
+
+def read_archive(archive, blocks=None):
+    """Yield the audits stored in one archive file (or only in the given blocks), in id order"""
+    path = get_archive_dir() / archive.file_path
+    if not path.exists():
+        logger.warning("Lead audit archive file missing: %s", path)
+        return
+    for line in _read_lines(path, archive, blocks):
+        if line.strip():
+            yield deserialize_audit(line)
+
+
+def get_audit(audit_id):
+    """Find an audit by id in the hot table, then in the archive block whose id range covers it"""
+    audit = LeadAudit.objects.select_related('user', 'lead').filter(id=audit_id).first()
+    if audit is not None:
+        return audit
+
+    for archive in LeadAuditArchive.objects.filter(min_id__lte=audit_id, max_id__gte=audit_id):
+        blocks = None
+        if archive.blocks:
+            first_ids = [first_id for first_id, _ in archive.blocks]
+            blocks = [bisect.bisect_right(first_ids, audit_id) - 1]
+        for archived in read_archive(archive, blocks):
+            if archived.id == audit_id:
+                return archived
+    return None
+
+
+def find_archived_audits(start=None, end=None, lead_id=None, user_id=None, exclude_id=None, limit=10):
+    """
+    Newest-first archived audits in [start, end), optionally for one lead (by backup id) or user
+
+    Only archive files overlapping the time range are opened, newest month first, and
+    reading stops once `limit` matches are found. For a lead, only the blocks the lead
+    index lists are read, and indexed files without the lead are not opened at all.
+    """
+    archives = LeadAuditArchive.objects.order_by('-last_timestamp')
+    if start is not None:
+        archives = archives.filter(last_timestamp__gte=start)
+    if end is not None:
+        archives = archives.filter(first_timestamp__lt=end)
+
+    lead_blocks = {}
+    if lead_id is not None:
+        lead_blocks = dict(
+            LeadAuditArchiveLead.objects.filter(lead_id_backup=lead_id).values_list('archive_id', 'blocks')
+        )
+
+    found = []
+    for archive in archives:
+        blocks = None
+        if lead_id is not None and archive.blocks:
+            if archive.id not in lead_blocks:
+                continue
+            blocks = lead_blocks[archive.id]
+        matches = deque(maxlen=limit - len(found))
+        for audit in read_archive(archive, blocks):
+            if start is not None and audit.timestamp < start:
+                continue
+            if end is not None and audit.timestamp >= end:
+                continue
+            if lead_id is not None and audit.lead_id_backup != lead_id:
+                continue
+            if user_id is not None and audit.user_id != user_id:
+                continue
+            if exclude_id is not None and audit.id == exclude_id:
+                continue
+            matches.append(audit)
+        found.extend(sorted(matches, key=lambda audit: (audit.timestamp, audit.id), reverse=True))
+        if len(found) >= limit:
+            break
+    return found[:limit]
@@ -0,0 +1,137 @@
+"""
+Keyset pagination and cheap totals for the audit log list.
+
+Pages are read newest first with a cursor on (timestamp, id) instead of an OFFSET,
+so any page costs one range scan on the timestamp indexes (InnoDB secondary indexes
+carry the primary key, which makes the id tiebreaker free). Totals are never a full
+COUNT: the unfiltered size comes from table statistics and filtered sizes are counted
+up to a cap.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection
+from django.db.models import Q
+
+PAGE_SIZES = (10, 25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+
+# Filtered totals stop counting here and are shown as "10,000+"
+COUNT_CAP = 10000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def page_size(value):
+    """Requested page size if it is one of PAGE_SIZES, otherwise the default"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return value if value in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+
+def encode_cursor(timestamp, audit_id):
+    # Integer arithmetic keeps the cursor exact to the microsecond
+    micros = (timestamp - EPOCH) // MICROSECOND
+    raw = f'{micros}:{audit_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Parse a cursor into (timestamp, id); raises ValueError when it is malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        micros, audit_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        timestamp = EPOCH + int(micros) * MICROSECOND
+        return timestamp, int(audit_id)
+    except (ValueError, UnicodeDecodeError, OverflowError, OSError):
+        raise ValueError('Invalid audit cursor')
+
+
+class AuditPage:
+    """One page of audits with cursors to the neighbouring pages"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def keyset_page(audits, after=None, before=None, size=DEFAULT_PAGE_SIZE):
+    """
+    Newest-first page of `audits` older than the `after` cursor or newer than `before`
+
+    Fetches size + 1 rows to learn whether another page exists in the paging
+    direction. Raises ValueError for a malformed cursor.
+    """
+    if before:
+        timestamp, audit_id = decode_cursor(before)
+        rows = list(audits.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=audit_id)
+        ).order_by('timestamp', 'id')[:size + 1])
+        more = len(rows) > size
+        rows = rows[:size][::-1]
+        has_newer, has_older = more, True
+    else:
+        if after:
+            timestamp, audit_id = decode_cursor(after)
+            audits = audits.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=audit_id))
+        rows = list(audits.order_by('-timestamp', '-id')[:size + 1])
+        has_older = len(rows) > size
+        rows = rows[:size]
+        has_newer = bool(after)
+
+    if not rows:
+        # Paged past either end; the neighbouring page in the other direction still exists
+        return AuditPage([], next_cursor=before or None, previous_cursor=after or None)
+
+    return AuditPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1].timestamp, rows[-1].id) if has_older else None,
+        previous_cursor=encode_cursor(rows[0].timestamp, rows[0].id) if has_newer else None,
+    )
+
+
+def capped_count(queryset, cap=COUNT_CAP):
+    """Return (count, exact); stops counting after `cap` rows"""
+    count = queryset.order_by().values('id')[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+def estimated_table_rows(model):
+    """Approximate row count from MySQL table statistics, or None on other backends"""
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def format_total(count, exact=True, estimated=False):
+    if estimated:
+        return f'~{count:,}'
+    return f'{count:,}' if exact else f'{count:,}+'
@@ -0,0 +1,173 @@
+"""
+Daily LeadAudit statistics.
+
+Audit counts per (day, action), (day, user) and (day, severity) are kept in small
+rollup tables. A periodic job (`rollup_lead_audits`) folds new audits into them
+incrementally, keyed on the last processed audit id, so every audit is counted once
+no matter which code path wrote it (single saves, buffered bulk inserts, imports).
+Readers combine the rollups with a grouped query over the few audits past the
+watermark, which keeps the numbers exact between job runs.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    LeadAudit, LeadAuditActionDaily, LeadAuditRollupState, LeadAuditSeverityDaily, LeadAuditUserDaily,
+)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Audits younger than this wait for the next run: ids are allocated before commit, so a
+# slow transaction can still make a lower id visible after higher ones were rolled up
+SETTLE_SECONDS = 60
+
+ROLLUPS = (
+    (LeadAuditActionDaily, 'action'),
+    (LeadAuditUserDaily, 'user_id'),
+    (LeadAuditSeverityDaily, 'severity'),
+)
+
+
+def _group_counts(audits, key):
+    """{(local day, key value): count} from one grouped query"""
+    day = TruncDate('timestamp', tzinfo=timezone.get_current_timezone())
+    rows = audits.order_by().annotate(day=day).values_list('day', key).annotate(count=Count('id'))
+    return {(row_day, value): count for row_day, value, count in rows}
+
+
+def _merge(model, key, counts):
+    """Add counts onto the rollup rows, creating missing ones"""
+    if not counts:
+        return
+    days = {day for day, _ in counts}
+    existing = {(row.day, getattr(row, key)): row for row in model.objects.filter(day__in=days)}
+
+    created, changed = [], []
+    for (day, value), count in counts.items():
+        row = existing.get((day, value))
+        if row is None:
+            created.append(model(day=day, count=count, **{key: value}))
+        else:
+            row.count += count
+            changed.append(row)
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(changed, ['count'])
+
+
+def get_watermark():
+    return LeadAuditRollupState.objects.filter(pk=1).values_list('last_audit_id', flat=True).first() or 0
+
+
+def rollup_audits(batch_size=DEFAULT_BATCH_SIZE, settle_seconds=SETTLE_SECONDS):
+    """Fold audits past the watermark into the daily rollups; returns how many were added"""
+    total = 0
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    while True:
+        with transaction.atomic():
+            # The locked state row keeps concurrent runs from counting the same audits twice
+            state, _ = LeadAuditRollupState.objects.select_for_update().get_or_create(pk=1)
+            rows = list(
+                LeadAudit.objects.filter(id__gt=state.last_audit_id).order_by('id').values_list('id', 'timestamp')[:batch_size]
+            )
+            settled = 0
+            for _, timestamp in rows:
+                if timestamp >= cutoff:
+                    break
+                settled += 1
+            if not settled:
+                return total
+
+            upper = rows[settled - 1][0]
+            batch = LeadAudit.objects.filter(id__gt=state.last_audit_id, id__lte=upper)
+            for model, key in ROLLUPS:
+                _merge(model, key, _group_counts(batch, key))
+            state.last_audit_id = upper
+            state.save(update_fields=['last_audit_id', 'updated_at'])
+
+        total += settled
+        if settled < batch_size:
+            return total
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _summarize(daily, actions, users, user_limit):
+    """Shape grouped counts like the audit stats API response"""
+    top_users = sorted(users.items(), key=lambda item: item[1], reverse=True)[:user_limit]
+    names = {
+        user.id: user
+        for user in User.objects.filter(id__in=[user_id for user_id, _ in top_users if user_id]).only(
+            'id', 'first_name', 'last_name', 'username'
+        )
+    }
+    return {
+        'daily_stats': [{'day': day, 'count': count} for day, count in sorted(daily.items())],
+        'action_stats': [
+            {'action': action, 'count': count}
+            for action, count in sorted(actions.items(), key=lambda item: item[1], reverse=True)
+        ],
+        'user_stats': [
+            {
+                'user__first_name': names[user_id].first_name if user_id in names else None,
+                'user__last_name': names[user_id].last_name if user_id in names else None,
+                'user__username': names[user_id].username if user_id in names else None,
+                'count': count,
+            }
+            for user_id, count in top_users
+        ],
+        'total_audits': sum(daily.values()),
+    }
+
+
+def _fold(counts, totals, by_day):
+    for (day, value), count in counts.items():
+        totals[value] += count
+        if by_day is not None:
+            by_day[day] += count
+
+
+def rollup_stats(start_day, user_limit=10):
+    """Audit statistics since `start_day` (inclusive) for the whole system"""
+    for _ in range(3):
+        watermark = get_watermark()
+        daily, actions, users = defaultdict(int), defaultdict(int), defaultdict(int)
+
+        # Severity has the fewest rows per day, so it carries the daily totals
+        for day, count in LeadAuditSeverityDaily.objects.filter(day__gte=start_day).values_list('day').annotate(
+            total=Sum('count')
+        ).order_by():
+            daily[day] += count
+        actions.update(LeadAuditActionDaily.objects.filter(day__gte=start_day).values_list('action').annotate(
+            total=Sum('count')
+        ).order_by())
+        users.update(LeadAuditUserDaily.objects.filter(day__gte=start_day).values_list('user_id').annotate(
+            total=Sum('count')
+        ).order_by())
+
+        # A job run in between would make the tail overlap the rollups; read again
+        if get_watermark() == watermark:
+            break
+
+    tail = LeadAudit.objects.filter(id__gt=watermark, timestamp__gte=_day_start(start_day))
+    _fold(_group_counts(tail, 'severity'), defaultdict(int), daily)
+    _fold(_group_counts(tail, 'action'), actions, None)
+    _fold(_group_counts(tail, 'user_id'), users, None)
+    return _summarize(daily, actions, users, user_limit)
+
+
+def queryset_stats(audits, start_day, user_limit=10):
+    """Audit statistics since `start_day` computed directly from an (already narrow) queryset"""
+    audits = audits.filter(timestamp__gte=_day_start(start_day))
+    daily, actions, users = defaultdict(int), defaultdict(int), defaultdict(int)
+    _fold(_group_counts(audits, 'action'), actions, daily)
+    _fold(_group_counts(audits, 'user_id'), users, None)
+    return _summarize(daily, actions, users, user_limit)
+
@@ -0,0 +1,140 @@
+"""
+Indexed search over audit text.
+
+Each audit's description, old/new values, field name and backup names are split into
+normalized words stored in LeadAuditSearchToken with a copy of the audit timestamp.
+A search term is then a prefix range on the (token, timestamp) index, bounded by the
+requested dates, instead of six leading-wildcard LIKE scans over TextFields.
+
+The index is filled by a periodic job (`index_lead_audits`) keyed on the last indexed
+audit id: audits are also written with bulk_create, which does not return ids on
+MySQL, so tokens cannot be written alongside them. Audits past the watermark are
+still searched with plain substring matching, so results are complete between runs.
+"""
+import re
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .audit_rollups import SETTLE_SECONDS
+from .models import LeadAudit, LeadAuditSearchState, LeadAuditSearchToken, normalize_phone, normalize_search_text
+
+DEFAULT_BATCH_SIZE = 2000
+
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+# Keeps a huge note or value from flooding the index
+MAX_TOKENS_PER_AUDIT = 200
+
+# Phone-like values are also indexed as one digit string, so "+20 100 123" matches "20100"
+MIN_PHONE_DIGITS = 6
+
+SEARCH_FIELDS = (
+    'description', 'old_value', 'new_value', 'field_name', 'lead_name_backup', 'user_name_backup',
+)
+
+WORD_RE = re.compile(r'\w+')
+PHONE_RE = re.compile(r'\d[\d ()./-]*\d')
+
+
+def split_words(text):
+    """Normalized words of a text, in order and without duplicates"""
+    words = WORD_RE.findall(normalize_search_text(text))
+    return list(dict.fromkeys(
+        word[:MAX_TOKEN_LENGTH] for word in words if len(word) >= MIN_TOKEN_LENGTH
+    ))
+
+
+def audit_tokens(values):
+    """Search tokens for one audit's SEARCH_FIELDS values"""
+    tokens = {}
+    for value in values:
+        if not value:
+            continue
+        for word in split_words(value):
+            tokens[word] = None
+        for number in PHONE_RE.findall(value):
+            digits = normalize_phone(number)
+            if MIN_PHONE_DIGITS <= len(digits) <= MAX_TOKEN_LENGTH:
+                tokens[digits] = None
+    return list(tokens)[:MAX_TOKENS_PER_AUDIT]
+
+
+def get_watermark():
+    return LeadAuditSearchState.objects.filter(pk=1).values_list('last_audit_id', flat=True).first() or 0
+
+
+def index_audits(batch_size=DEFAULT_BATCH_SIZE, settle_seconds=SETTLE_SECONDS):
+    """Add audits past the watermark to the search index; returns how many were indexed"""
+    total = 0
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    while True:
+        with transaction.atomic():
+            state, _ = LeadAuditSearchState.objects.select_for_update().get_or_create(pk=1)
+            rows = list(
+                LeadAudit.objects.filter(id__gt=state.last_audit_id).order_by('id').values_list(
+                    'id', 'timestamp', *SEARCH_FIELDS
+                )[:batch_size]
+            )
+            settled = []
+            for row in rows:
+                if row[1] >= cutoff:
+                    break
+                settled.append(row)
+            if not settled:
+                return total
+
+            LeadAuditSearchToken.objects.bulk_create(
+                [
+                    LeadAuditSearchToken(token=token, audit_id=audit_id, timestamp=timestamp)
+                    for audit_id, timestamp, *values in settled
+                    for token in audit_tokens(values)
+                ],
+                batch_size=5000,
+            )
+            state.last_audit_id = settled[-1][0]
+            state.save(update_fields=['last_audit_id', 'updated_at'])
+
+        total += len(settled)
+        if len(settled) < batch_size:
+            return total
+
+
+def _token_match(word, start=None, end=None):
+    # Tokens are stored lowercased, so istartswith compiles to a plain LIKE 'prefix%' that
+    # the (token, timestamp) index serves; startswith would be LIKE BINARY on MySQL
+    tokens = LeadAuditSearchToken.objects.filter(token__istartswith=word)
+    if start is not None:
+        tokens = tokens.filter(timestamp__gte=start)
+    if end is not None:
+        tokens = tokens.filter(timestamp__lt=end)
+    return Q(id__in=tokens.values('audit_id'))
+
+
+def _text_match(word):
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': word})
+    return condition
+
+
+def search_audits(audits, query, start=None, end=None):
+    """
+    Narrow `audits` to those containing every word of `query` as a word prefix
+
+    `start`/`end` should repeat the time bounds already applied to `audits` so each
+    token lookup is limited to that window in the (token, timestamp) index.
+    """
+    words = split_words(query)
+    if not words:
+        return audits.filter(_text_match(query.strip())) if query.strip() else audits
+
+    watermark = get_watermark()
+    indexed = Q(id__lte=watermark)
+    pending = Q(id__gt=watermark)
+    for word in words:
+        indexed &= _token_match(word, start, end)
+        pending &= _text_match(word)
+    return audits.filter(indexed | pending)
@@ -1,54 +1,40 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.http import JsonResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse
+from django.db.models import Q, Count, Exists, OuterRef
 from django.utils import timezone
 from django.contrib.auth.models import User
 from datetime import datetime, timedelta
 import csv
 import json
+import logging
+import zlib
 
+from leads import audit_paging, audit_rollups, audit_search
 from leads.models import Lead, LeadAudit
-from authentication.models import UserProfile
+from leads.audit_archive import get_audit, find_archived_audits, purge_audits
+from authentication.permissions import get_permission_snapshot
+
+logger = logging.getLogger(__name__)
+
+MAX_STATS_DAYS = 3660
 
 
 def has_audit_permission(user, permission_code):
     """Check if user has specific audit permission"""
-    print(f"🔍 PERMISSION DEBUG: Checking {user.username} for audit.{permission_code}")
-    try:
-        user_profile = user.user_profile
-        print(f"🔍 PERMISSION DEBUG: User profile found: {user_profile.id}")
-        
-        result = user_profile.has_permission('audit', permission_code)
-        print(f"🔍 PERMISSION DEBUG: Permission result: {result}")
-        return result
-    except (UserProfile.DoesNotExist, AttributeError) as e:
-        print(f"❌ PERMISSION DEBUG: Error: {e}")
-        return False
+    # Granted through the profile only; superusers get no implicit audit access
+    result = ('audit', permission_code) in get_permission_snapshot(user).codes
+    logger.debug("Audit permission %s for %s: %s", permission_code, user.username, result)
+    return result
 
 
-@login_required
-def audit_list(request):
-    """Main audit list view with filtering and search"""
-    print(f"🔍 AUDIT DEBUG: User: {request.user.username}, is_authenticated: {request.user.is_authenticated}")
-    
-    # Check permissions
-    has_view_perm = has_audit_permission(request.user, 'view')
-    print(f"🔍 AUDIT DEBUG: has_audit_permission('view'): {has_view_perm}")
-    
-    if not has_view_perm:
-        print(f"❌ AUDIT DEBUG: No permission, rendering no_permission template")
-        return render(request, 'audit/no_permission.html', {
-            'message': 'You do not have permission to view audit logs.'
-        })
-    
-    can_view_all = has_audit_permission(request.user, 'view_all')
-    can_export = has_audit_permission(request.user, 'export')
-    can_manage = has_audit_permission(request.user, 'manage')
-    
-    print(f"🔍 AUDIT DEBUG: can_view_all: {can_view_all}, can_export: {can_export}, can_manage: {can_manage}")
-    
+def _day_start(day):
+    """Aware start of a local calendar day, so date filters stay index range scans"""
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def filter_audits(request, can_view_all):
+    """Audits visible to the user, narrowed by the list filters in request.GET; returns (audits, filters)"""
     # Base queryset
     if can_view_all:
         audits = LeadAudit.objects.all()
@@ -56,18 +42,18 @@ def audit_list(request):
         # Users can only see their own actions
         audits = LeadAudit.objects.filter(user=request.user)
     
-    print(f"🔍 AUDIT DEBUG: Total audits before filtering: {audits.count()}")
-    
     # Apply filters
     filters = {}
     
     # Date range filter
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
+    start = end = None
     if date_from:
         try:
             date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-            audits = audits.filter(timestamp__date__gte=date_from)
+            start = _day_start(date_from)
+            audits = audits.filter(timestamp__gte=start)
             filters['date_from'] = date_from.strftime('%Y-%m-%d')
         except ValueError:
             pass
@@ -75,7 +61,8 @@ def audit_list(request):
     if date_to:
         try:
             date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-            audits = audits.filter(timestamp__date__lte=date_to)
+            end = _day_start(date_to + timedelta(days=1))
+            audits = audits.filter(timestamp__lt=end)
             filters['date_to'] = date_to.strftime('%Y-%m-%d')
         except ValueError:
             pass
@@ -102,59 +89,89 @@ def audit_list(request):
         audits = audits.filter(severity=severity_filter)
         filters['severity'] = severity_filter
     
-    # Search filter
+    # Search filter: word prefixes through the audit search index, within the date range
     search_query = request.GET.get('search')
     if search_query:
-        audits = audits.filter(
-            Q(description__icontains=search_query) |
-            Q(lead_name_backup__icontains=search_query) |
-            Q(user_name_backup__icontains=search_query) |
-            Q(field_name__icontains=search_query) |
-            Q(old_value__icontains=search_query) |
-            Q(new_value__icontains=search_query)
-        )
+        audits = audit_search.search_audits(audits, search_query, start, end)
         filters['search'] = search_query
     
-    # Order by timestamp (newest first)
-    audits = audits.select_related('user', 'lead').order_by('-timestamp')
+    return audits, filters
+
+
+@login_required
+def audit_list(request):
+    """Main audit list view with filtering and search"""
+    # Check permissions
+    if not has_audit_permission(request.user, 'view'):
+        return render(request, 'audit/no_permission.html', {
+            'message': 'You do not have permission to view audit logs.'
+        })
     
-    print(f"🔍 AUDIT DEBUG: Audits after ordering: {audits.count()}")
+    can_view_all = has_audit_permission(request.user, 'view_all')
+    can_export = has_audit_permission(request.user, 'export')
+    can_manage = has_audit_permission(request.user, 'manage')
+    
+    audits, filters = filter_audits(request, can_view_all)
     
-    # Pagination
-    page_size = int(request.GET.get('page_size', 25))
-    paginator = Paginator(audits, page_size)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (timestamp, id), newest first: no OFFSET and no COUNT
+    page_size = audit_paging.page_size(request.GET.get('page_size'))
+    try:
+        page_obj = audit_paging.keyset_page(
+            audits.select_related('user', 'lead'),
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            size=page_size,
+        )
+    except ValueError:
+        return HttpResponseBadRequest('Invalid audit cursor')
     
-    print(f"🔍 AUDIT DEBUG: Page size: {page_size}, Current page: {page_number or 1}")
-    print(f"🔍 AUDIT DEBUG: Page object has {len(page_obj)} items")
-    print(f"🔍 AUDIT DEBUG: Sample audit items:")
-    for i, audit in enumerate(page_obj[:3]):  # Show first 3
-        print(f"  {i+1}. ID: {audit.id}, Action: {audit.action}, User: {audit.user_identifier}, Time: {audit.timestamp}")
+    logger.debug(
+        "Audit list for %s: filters=%s page_size=%s rows=%s",
+        request.user.username, filters, page_size, len(page_obj)
+    )
+    
+    # Other parameters to carry over into the page links
+    page_query = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        page_query.pop(key, None)
     
     # Get filter options for dropdowns
     action_choices = LeadAudit.ACTION_TYPES
     severity_choices = LeadAudit.SEVERITY_CHOICES
     
-    # Get users for filter (only if can view all)
+    # Get users for filter (only if can view all); EXISTS probes the (user, timestamp) index
     users_for_filter = []
     if can_view_all:
         users_for_filter = User.objects.filter(
-            lead_audits__isnull=False
-        ).distinct().order_by('first_name', 'last_name', 'username')
+            Exists(LeadAudit.objects.filter(user=OuterRef('pk')))
+        ).order_by('first_name', 'last_name', 'username')
+    
+    # Get statistics: table statistics when unfiltered, otherwise counts capped at COUNT_CAP
+    estimate = None
+    if can_view_all and not filters:
+        estimate = audit_paging.estimated_table_rows(LeadAudit)
+    if estimate is not None:
+        total_audits = audit_paging.format_total(estimate, estimated=True)
+    else:
+        total_audits = audit_paging.format_total(*audit_paging.capped_count(audits))
     
-    # Get statistics
-    total_audits = audits.count()
-    today_audits = audits.filter(timestamp__date=timezone.now().date()).count()
+    today_start = _day_start(timezone.localdate())
+    today_audits = audit_paging.format_total(
+        *audit_paging.capped_count(audits.filter(timestamp__gte=today_start))
+    )
     
-    # Recent activities (last 7 days)
+    # Recent activities (last 7 days), from the daily rollups when nothing narrows the list
     week_ago = timezone.now() - timedelta(days=7)
-    recent_stats = audits.filter(timestamp__gte=week_ago).values('action').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
+    if can_view_all and not filters:
+        recent_stats = audit_rollups.rollup_stats(timezone.localdate(week_ago), user_limit=0)['action_stats'][:5]
+    else:
+        recent_stats = audits.filter(timestamp__gte=week_ago).values('action').annotate(
+            count=Count('id')
+        ).order_by('-count')[:5]
     
     context = {
         'page_obj': page_obj,
+        'page_query': page_query.urlencode(),
         'filters': filters,
         'action_choices': action_choices,
         'severity_choices': severity_choices,
@@ -174,39 +191,101 @@ def audit_list(request):
 @login_required
 def audit_detail(request, audit_id):
     """Detailed view of a specific audit log"""
-    audit = get_object_or_404(LeadAudit, id=audit_id)
+    # Falls back to the compressed archive for audits moved out of the hot table
+    audit = get_audit(audit_id)
+    if audit is None:
+        raise Http404('Audit log not found')
     
     # Check permissions
     can_view_all = has_audit_permission(request.user, 'view_all')
     
-    if not can_view_all and audit.user != request.user:
+    if not can_view_all and audit.user_id != request.user.id:
         return render(request, 'audit/no_permission.html', {
             'message': 'You do not have permission to view this audit log.'
         })
     
-    # Get related audits for the same lead
+    # Get related audits for the same lead, topping up from the archive when the hot table runs out
     related_audits = []
-    try:
-        if audit.lead:
-            related_audits = LeadAudit.objects.filter(
-                lead=audit.lead
-            ).exclude(id=audit.id).order_by('-timestamp')[:10]
-    except Lead.DoesNotExist:
-        # Lead has been deleted, no related audits to show
-        related_audits = []
+    if audit.lead_id:
+        related_audits = list(LeadAudit.objects.filter(
+            lead_id=audit.lead_id
+        ).exclude(id=audit.id).order_by('-timestamp')[:10])
+        if len(related_audits) < 10:
+            related_audits += find_archived_audits(
+                lead_id=audit.lead_id_backup, exclude_id=audit.id, limit=10 - len(related_audits)
+            )
     
     context = {
         'audit': audit,
         'related_audits': related_audits,
         'can_view_all': can_view_all,
+        'is_archived': getattr(audit, 'is_archived', False),
     }
     
     return render(request, 'audit/audit_detail.html', context)
 
 
+class _Echo:
+    """Pseudo-buffer for csv.writer that hands each row straight back to the caller"""
+    def write(self, value):
+        return value
+
+
+# Columns pulled for the CSV export; backup names instead of the lead/user objects
+EXPORT_AUDIT_COLUMNS = (
+    'id', 'timestamp', 'action', 'lead_name_backup', 'lead_id_backup', 'user_name_backup',
+    'user__username', 'description', 'field_name', 'old_value', 'new_value', 'severity', 'ip_address',
+)
+
+# Compress about this much CSV at a time when streaming gzip
+GZIP_FLUSH_BYTES = 64 * 1024
+
+
+def iter_audits_for_export(queryset, chunk_size=2000):
+    """
+    Yield export rows newest first in (timestamp, id) keyset chunks so memory stays
+    constant no matter how many audits are exported
+    """
+    queryset = queryset.order_by('-timestamp', '-id').values_list(*EXPORT_AUDIT_COLUMNS)
+    last_timestamp = last_id = None
+    
+    while True:
+        chunk = queryset
+        if last_id is not None:
+            chunk = chunk.filter(
+                Q(timestamp__lt=last_timestamp) |
+                Q(timestamp=last_timestamp, id__lt=last_id)
+            )
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        
+        yield from rows
+        
+        if len(rows) < chunk_size:
+            return
+        last_id, last_timestamp = rows[-1][0], rows[-1][1]
+
+
+def _gzip_stream(chunks):
+    """Compress a stream of text chunks into gzip output in GZIP_FLUSH_BYTES pieces"""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip header and trailer
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk.encode('utf-8'))
+        size += len(pending[-1])
+        if size >= GZIP_FLUSH_BYTES:
+            data = compressor.compress(b''.join(pending))
+            pending, size = [], 0
+            if data:
+                yield data
+    yield compressor.compress(b''.join(pending)) + compressor.flush()
+
+
 @login_required
 def audit_export(request):
-    """Export audit logs to CSV"""
+    """Stream audit logs to CSV (gzip with ?compress=gzip) using the audit list filters"""
     if not has_audit_permission(request.user, 'export'):
         return JsonResponse({
             'success': False,
@@ -214,50 +293,47 @@ def audit_export(request):
         }, status=403)
     
     can_view_all = has_audit_permission(request.user, 'view_all')
-    
-    # Get the same filtered queryset as the list view
-    if can_view_all:
-        audits = LeadAudit.objects.all()
-    else:
-        audits = LeadAudit.objects.filter(user=request.user)
-    
-    # Apply the same filters as in audit_list
-    # (This is a simplified version - you could extract the filtering logic to a separate function)
-    
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="audit_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Write header
-    writer.writerow([
-        'Timestamp',
-        'Action',
-        'Lead Name',
-        'User',
-        'Description',
-        'Field Changed',
-        'Old Value',
-        'New Value',
-        'Severity',
-        'IP Address'
-    ])
-    
-    # Write data
-    for audit in audits.select_related('user', 'lead').order_by('-timestamp'):
-        writer.writerow([
-            audit.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            audit.get_action_display(),
-            audit.lead_identifier,
-            audit.user_identifier,
-            audit.description,
-            audit.field_name,
-            audit.old_value,
-            audit.new_value,
-            audit.get_severity_display(),
-            audit.ip_address or ''
+    audits, _ = filter_audits(request, can_view_all)
+    
+    action_labels = dict(LeadAudit.ACTION_TYPES)
+    severity_labels = dict(LeadAudit.SEVERITY_CHOICES)
+    
+    def rows():
+        writer = csv.writer(_Echo())
+        yield writer.writerow([
+            'Timestamp',
+            'Action',
+            'Lead Name',
+            'User',
+            'Description',
+            'Field Changed',
+            'Old Value',
+            'New Value',
+            'Severity',
+            'IP Address'
         ])
+        for (_, timestamp, action, lead_name, lead_id, user_name, username, description,
+             field_name, old_value, new_value, severity, ip_address) in iter_audits_for_export(audits):
+            yield writer.writerow([
+                timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                action_labels.get(action, action),
+                f"{lead_name} (ID: {lead_id})" if lead_id else lead_name,
+                user_name or username or 'Unknown User',
+                description,
+                field_name,
+                old_value,
+                new_value,
+                severity_labels.get(severity, severity),
+                ip_address or ''
+            ])
+    
+    filename = f'audit_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    if request.GET.get('compress') == 'gzip':
+        response = StreamingHttpResponse(_gzip_stream(rows()), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
 
@@ -273,46 +349,23 @@ def audit_stats_api(request):
     
     can_view_all = has_audit_permission(request.user, 'view_all')
     
-    # Base queryset
+    # Get date range (last 30 days by default, including today)
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), MAX_STATS_DAYS)
+    except (TypeError, ValueError):
+        days = 30
+    start_day = timezone.localdate() - timedelta(days=days - 1)
+    
+    # System-wide numbers come from the daily rollups; one user's own rows are few enough
+    # to group directly on the (user, timestamp) index
     if can_view_all:
-        audits = LeadAudit.objects.all()
+        stats = audit_rollups.rollup_stats(start_day)
     else:
-        audits = LeadAudit.objects.filter(user=request.user)
-    
-    # Get date range (last 30 days by default)
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now() - timedelta(days=days)
-    
-    audits = audits.filter(timestamp__gte=start_date)
-    
-    # Daily activity counts
-    daily_stats = audits.extra(
-        select={'day': 'date(timestamp)'}
-    ).values('day').annotate(
-        count=Count('id')
-    ).order_by('day')
-    
-    # Action type distribution
-    action_stats = audits.values('action').annotate(
-        count=Count('id')
-    ).order_by('-count')
+        stats = audit_rollups.queryset_stats(
+            LeadAudit.objects.filter(user=request.user), start_day, user_limit=0
+        )
     
-    # User activity (only if can view all)
-    user_stats = []
-    if can_view_all:
-        user_stats = audits.values(
-            'user__first_name', 'user__last_name', 'user__username'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
-    
-    return JsonResponse({
-        'success': True,
-        'daily_stats': list(daily_stats),
-        'action_stats': list(action_stats),
-        'user_stats': list(user_stats),
-        'total_audits': audits.count()
-    })
+    return JsonResponse({'success': True, **stats})
 
 
 @login_required
@@ -331,9 +384,11 @@ def audit_settings(request):
             days = int(request.POST.get('days', 90))
             cutoff_date = timezone.now() - timedelta(days=days)
             
-            deleted_count = LeadAudit.objects.filter(
-                timestamp__lt=cutoff_date
-            ).delete()[0]
+            # Count everything into the statistics rollups before it goes
+            audit_rollups.rollup_audits(settle_seconds=0)
+            
+            # Delete in small id-ordered chunks rather than one long-running DELETE
+            deleted_count = purge_audits(LeadAudit.objects.filter(timestamp__lt=cutoff_date))
             
             # Log this action
             LeadAudit.log_action(
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from leads.audit_archive import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_KEEP_MONTHS, archive_month, closed_months, get_archive_dir, reindex_archive,
+)
+from leads.models import LeadAuditArchive
+
+
+class Command(BaseCommand):
+    help = 'Move closed months of lead audit logs into compressed archive files and purge them from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=DEFAULT_KEEP_MONTHS,
+                            help='Complete months to keep in the database besides the current one')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows read and deleted per query')
+        parser.add_argument('--no-purge', action='store_true',
+                            help='Write archive files but keep the rows in the database')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would be archived')
+        parser.add_argument('--reindex', action='store_true',
+                            help='Convert archive files written before block indexes into indexed blocks')
+
+    def handle(self, *args, **options):
+        if options['reindex']:
+            self.reindex()
+            return
+
+        months = closed_months(options['keep_months'])
+        if not months:
+            self.stdout.write('No closed months to archive')
+            return
+
+        if options['dry_run']:
+            for month in months:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+            return
+
+        archived = 0
+        for month in months:
+            archive = archive_month(month, chunk_size=options['chunk_size'], purge=not options['no_purge'])
+            if archive is None:
+                continue
+            archived += archive.row_count
+            self.stdout.write(f"  {month:%Y-%m}: {archive.row_count} audits -> {archive.file_path}")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} audit logs to {get_archive_dir()}"))
+
+    def reindex(self):
+        archives = [archive for archive in LeadAuditArchive.objects.order_by('month') if not archive.blocks]
+        for archive in archives:
+            reindex_archive(archive)
+            self.stdout.write(f"  {archive.file_path}: {len(archive.blocks)} blocks")
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {len(archives)} archive files"))
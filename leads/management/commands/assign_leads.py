@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.assignment import LeadAssignmentEngine, STRATEGIES
+
+
+class Command(BaseCommand):
+    help = 'Assign unassigned open leads to eligible users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=STRATEGIES,
+                            help='Assignment strategy (defaults to LEAD_AUTO_ASSIGNMENT["STRATEGY"])')
+        parser.add_argument('--batch-size', type=int, help='Leads assigned per batch')
+
+    def handle(self, *args, **options):
+        engine = LeadAssignmentEngine(strategy=options['strategy'], batch_size=options['batch_size'])
+        if not engine.capacity:
+            raise CommandError('No eligible users found for lead assignment')
+
+        assigned = engine.assign_unassigned()
+
+        names = dict(User.objects.filter(id__in=list(assigned)).values_list('id', 'username'))
+        for user_id, count in sorted(assigned.items(), key=lambda item: -item[1]):
+            self.stdout.write(
+                f"  {names.get(user_id, user_id)}: {count} assigned, "
+                f"{engine.open_counts[user_id]}/{engine.capacity[user_id]} open"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Assigned {sum(assigned.values())} leads using {engine.strategy.replace('_', ' ')}"
+        ))
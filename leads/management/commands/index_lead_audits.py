@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from leads.audit_search import DEFAULT_BATCH_SIZE, get_watermark, index_audits
+
+
+class Command(BaseCommand):
+    help = 'Add new lead audit logs to the audit search index (run periodically, e.g. every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Audits indexed per transaction')
+
+    def handle(self, *args, **options):
+        indexed = index_audits(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} audit logs (up to #{get_watermark()})"))
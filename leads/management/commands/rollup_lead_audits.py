@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from leads.audit_rollups import DEFAULT_BATCH_SIZE, get_watermark, rollup_audits
+
+
+class Command(BaseCommand):
+    help = 'Fold new lead audit logs into the daily statistics rollups (run periodically, e.g. every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Audits folded in per transaction')
+
+    def handle(self, *args, **options):
+        added = rollup_audits(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {added} audit logs (up to #{get_watermark()})"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Recompute lead scores from recency, activity, budget, temperature and source conversion rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compute scores without saving them')
+
+    def handle(self, *args, **options):
+        try:
+            from leads.scoring import score_leads
+        except ImportError as e:
+            raise CommandError(f'Lead scoring requires numpy ({e}). Install it with "pip install numpy".')
+
+        started = time.monotonic()
+        scored, changed = score_leads(dry_run=options['dry_run'])
+        elapsed = time.monotonic() - started
+
+        action = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(f"Scored {scored} leads, {action} {changed} scores in {elapsed:.1f}s")
+        self.stdout.write(self.style.SUCCESS('Lead scoring finished'))
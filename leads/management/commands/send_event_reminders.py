@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from leads.reminders import (
+    ReminderDispatcher, get_reminder_backends,
+    DEFAULT_MAX_REMINDER_MINUTES, DEFAULT_GRACE_MINUTES,
+)
+
+
+class Command(BaseCommand):
+    help = 'Send due lead event reminders, polling every --interval seconds (use --once for a single pass)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single dispatch pass and exit')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between dispatch passes')
+        parser.add_argument('--workers', type=int, default=4, help='Delivery threads per pass')
+        parser.add_argument(
+            '--backend', action='append', dest='backends',
+            help='Dotted path of a reminder backend (repeatable, defaults to LEAD_EVENT_REMINDER_BACKENDS)'
+        )
+        parser.add_argument('--max-reminder-minutes', type=int, default=DEFAULT_MAX_REMINDER_MINUTES,
+                            help='Largest reminder offset to look ahead for')
+        parser.add_argument('--grace-minutes', type=int, default=DEFAULT_GRACE_MINUTES,
+                            help='Still remind for events that started this many minutes ago')
+
+    def handle(self, *args, **options):
+        dispatcher = ReminderDispatcher(
+            backends=get_reminder_backends(options['backends']),
+            workers=options['workers'],
+            max_reminder_minutes=options['max_reminder_minutes'],
+            grace_minutes=options['grace_minutes'],
+        )
+        backend_names = ', '.join(backend.__class__.__name__ for backend in dispatcher.backends)
+        self.stdout.write(f"Dispatching event reminders via {backend_names}")
+
+        try:
+            while True:
+                close_old_connections()
+                sent, failed = dispatcher.run_once()
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} reminders, {failed} failed")
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping reminder dispatcher')
+
+        self.stdout.write(self.style.SUCCESS('Reminder dispatcher finished'))
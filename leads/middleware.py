@@ -1,9 +1,12 @@
-from .signals import set_current_request, clear_current_request
+from .signals import set_current_request, clear_current_request, start_audit_buffer, flush_audit_buffer
 
 
 class AuditMiddleware:
     """
     Middleware to track current request for audit logging
+    
+    Audit records made while handling the request are buffered and written
+    with a single bulk insert once the response is ready.
     """
     def __init__(self, get_response):
         self.get_response = get_response
@@ -11,11 +14,15 @@ class AuditMiddleware:
     def __call__(self, request):
         # Set the current request in thread-local storage
         set_current_request(request)
+        start_audit_buffer()
         
         try:
             response = self.get_response(request)
         finally:
-            # Clear the request after processing
-            clear_current_request()
+            try:
+                flush_audit_buffer()
+            finally:
+                # Clear the request after processing
+                clear_current_request()
         
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,64 @@
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_events_to_leads(apps, schema_editor):
+    """Resolve the legacy UUID strings (with or without dashes) into real lead FKs"""
+    Lead = apps.get_model('leads', 'Lead')
+    LeadEvent = apps.get_model('leads', 'LeadEvent')
+
+    refs = {}
+    for event_id, lead_ref in LeadEvent.objects.values_list('id', 'lead_ref').iterator():
+        try:
+            refs[event_id] = uuid.UUID(str(lead_ref).strip())
+        except (TypeError, ValueError):
+            continue
+
+    existing = set(Lead.objects.filter(id__in=set(refs.values())).values_list('id', flat=True))
+
+    events = []
+    for event_id, lead_uuid in refs.items():
+        if lead_uuid in existing:
+            events.append(LeadEvent(id=event_id, lead_id=lead_uuid))
+    LeadEvent.objects.bulk_update(events, ['lead'], batch_size=1000)
+
+
+def unlink_events_from_leads(apps, schema_editor):
+    LeadEvent = apps.get_model('leads', 'LeadEvent')
+
+    events = []
+    for event_id, lead_id in LeadEvent.objects.exclude(lead__isnull=True).values_list('id', 'lead_id').iterator():
+        events.append(LeadEvent(id=event_id, lead_ref=str(lead_id)))
+    LeadEvent.objects.bulk_update(events, ['lead_ref'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0009_leadevent'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='leadevent',
+            old_name='lead_id',
+            new_name='lead_ref',
+        ),
+        migrations.AlterField(
+            model_name='leadevent',
+            name='lead_ref',
+            field=models.CharField(blank=True, default='', max_length=36),
+        ),
+        migrations.AddField(
+            model_name='leadevent',
+            name='lead',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='leads.lead'),
+        ),
+        migrations.RunPython(link_events_to_leads, unlink_events_from_leads),
+        migrations.RemoveField(
+            model_name='leadevent',
+            name='lead_ref',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0010_leadevent_lead_fk'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['assigned_to', 'updated_at'], name='leads_leade_assigne_effd9e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0011_leadevent_assigned_to_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['status', 'reminder_sent', 'start_datetime'], name='leads_leade_status_fdd123_idx'),
+        ),
+    ]
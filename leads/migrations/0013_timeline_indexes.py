@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0012_leadevent_reminder_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leadactivity',
+            index=models.Index(fields=['lead', 'created_at'], name='leads_leada_lead_id_b4ac2c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaddocument',
+            index=models.Index(fields=['lead', 'created_at'], name='leads_leadd_lead_id_8eb2dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['lead', 'start_datetime'], name='leads_leade_lead_id_c14dc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadnote',
+            index=models.Index(fields=['lead', 'created_at'], name='leads_leadn_lead_id_5ebe12_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copies of leads.models.normalize_search_text / normalize_phone as of this migration
+def normalize_search_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.casefold().split())
+
+
+def normalize_phone(value):
+    return ''.join(ch for ch in (value or '') if ch.isdigit())
+
+
+def fill_search_keys(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+
+    batch = []
+    rows = Lead.objects.values_list('id', 'first_name', 'last_name', 'mobile', 'email').iterator(chunk_size=2000)
+    for lead_id, first_name, last_name, mobile, email in rows:
+        first_name = normalize_search_text(first_name)
+        last_name = normalize_search_text(last_name)
+        batch.append(Lead(
+            id=lead_id,
+            search_name=f"{first_name} {last_name}".strip(),
+            search_name_reversed=f"{last_name} {first_name}".strip(),
+            search_phone=normalize_phone(mobile),
+            search_email=(email or '').strip().lower(),
+        ))
+        if len(batch) >= 1000:
+            Lead.objects.bulk_update(batch, ['search_name', 'search_name_reversed', 'search_phone', 'search_email'])
+            batch = []
+    if batch:
+        Lead.objects.bulk_update(batch, ['search_name', 'search_name_reversed', 'search_phone', 'search_email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0013_timeline_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='search_email',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_name_reversed',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_phone',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_name'], name='leads_lead_search__5d0153_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_name_reversed'], name='leads_lead_search__c6823e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_phone'], name='leads_lead_search__ae6fcf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_email'], name='leads_lead_search__81faf3_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0014_lead_search_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['assigned_to', 'created_at'], name='leads_lead_assigne_a171b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['status', 'score'], name='leads_lead_status__0b9377_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['next_follow_up'], name='leads_lead_next_fo_b18d27_idx'),
+        ),
+    ]
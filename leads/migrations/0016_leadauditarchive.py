@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0015_list_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadAuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the archived month')),
+                ('file_path', models.CharField(help_text='Path relative to LEAD_AUDIT_ARCHIVE_DIR', max_length=500, unique=True)),
+                ('row_count', models.PositiveIntegerField()),
+                ('min_id', models.BigIntegerField()),
+                ('max_id', models.BigIntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-month', '-created_at'],
+                'indexes': [models.Index(fields=['min_id', 'max_id'], name='leads_leada_min_id_9a557a_idx'), models.Index(fields=['first_timestamp', 'last_timestamp'], name='leads_leada_first_t_972b46_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0016_leadauditarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadAuditRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_audit_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeadAuditActionDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(choices=[('create', 'Lead Created'), ('update', 'Lead Updated'), ('delete', 'Lead Deleted'), ('status_change', 'Status Changed'), ('assignment_change', 'Assignment Changed'), ('priority_change', 'Priority Changed'), ('temperature_change', 'Temperature Changed'), ('contact', 'Contact Made'), ('note_added', 'Note Added'), ('document_added', 'Document Added'), ('activity_added', 'Activity Added'), ('score_change', 'Score Changed'), ('conversion', 'Lead Converted'), ('restore', 'Lead Restored')], max_length=30)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'action'],
+                'unique_together': {('day', 'action')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeadAuditSeverityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('severity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'severity'],
+                'unique_together': {('day', 'severity')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeadAuditUserDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['day', 'user'],
+                'unique_together': {('day', 'user')},
+            },
+        ),
+    ]
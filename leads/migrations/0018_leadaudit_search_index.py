@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0017_leadaudit_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadAuditSearchState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_audit_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeadAuditSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('timestamp', models.DateTimeField()),
+                ('audit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='leads.leadaudit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'timestamp'], name='leads_leada_token_33bfea_idx')],
+            },
+        ),
+    ]
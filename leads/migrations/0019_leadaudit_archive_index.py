@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0018_leadaudit_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leadauditarchive',
+            name='blocks',
+            field=models.JSONField(blank=True, default=list, help_text='[first id, byte offset] of each gzip member, in id order'),
+        ),
+        migrations.CreateModel(
+            name='LeadAuditArchiveLead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lead_id_backup', models.UUIDField(db_index=True)),
+                ('blocks', models.JSONField(default=list, help_text="Indexes into the archive's blocks")),
+                ('last_timestamp', models.DateTimeField()),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lead_entries', to='leads.leadauditarchive')),
+            ],
+            options={
+                'unique_together': {('archive', 'lead_id_backup')},
+            },
+        ),
+    ]
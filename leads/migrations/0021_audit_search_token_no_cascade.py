@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0020_leadeventtombstone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leadauditsearchtoken',
+            name='audit',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='search_tokens', to='leads.leadaudit'),
+        ),
+    ]
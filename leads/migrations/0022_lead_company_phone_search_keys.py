@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copies of leads.models.normalize_search_text / normalize_phone as of this migration
+def normalize_search_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.casefold().split())
+
+
+def normalize_phone(value):
+    return ''.join(ch for ch in (value or '') if ch.isdigit())
+
+
+def fill_search_keys(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+
+    batch = []
+    rows = Lead.objects.exclude(phone='', company='').values_list('id', 'phone', 'company').iterator(chunk_size=2000)
+    for lead_id, phone, company in rows:
+        batch.append(Lead(
+            id=lead_id,
+            search_alt_phone=normalize_phone(phone),
+            search_company=normalize_search_text(company)[:200],
+        ))
+        if len(batch) >= 1000:
+            Lead.objects.bulk_update(batch, ['search_alt_phone', 'search_company'])
+            batch = []
+    if batch:
+        Lead.objects.bulk_update(batch, ['search_alt_phone', 'search_company'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0021_audit_search_token_no_cascade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='search_alt_phone',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_company',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_alt_phone'], name='leads_lead_search__42cac6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['search_company'], name='leads_lead_search__f42f40_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('leads', '0022_lead_company_phone_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadOpenCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_leads', models.IntegerField(default=0)),
+                ('counted_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -2,8 +2,12 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+import unicodedata
 import uuid
 
+from authentication.change_stream import ChangeStreamMixin
+from authentication.data_filters import DataFilterQuerySet
+
 
 class LeadSource(models.Model):
     """Lead source tracking (Website, Referral, Advertisement, etc.)"""
@@ -109,7 +113,23 @@ class LeadStatus(models.Model):
         return self.name
 
 
-class Lead(models.Model):
+def normalize_search_text(value):
+    """Lowercase, strip accents and collapse whitespace for prefix search keys"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.casefold().split())
+
+
+def normalize_phone(value):
+    """Keep only the digits of a phone number"""
+    return ''.join(ch for ch in (value or '') if ch.isdigit())
+
+
+class LeadQuerySet(DataFilterQuerySet):
+    data_filter_module = 'leads'
+
+
+class Lead(ChangeStreamMixin, models.Model):
     """Main Lead model for real estate CRM - Only essential fields mandatory"""
     
     # Basic Information (MANDATORY)
@@ -190,15 +210,46 @@ class Lead(models.Model):
     tags = models.CharField(max_length=500, blank=True, help_text="Comma-separated tags")
     is_qualified = models.BooleanField(default=False)
     
+    # Normalized search keys (maintained in save(), used for indexed prefix lookups)
+    search_name = models.CharField(max_length=201, blank=True, editable=False)
+    search_name_reversed = models.CharField(max_length=201, blank=True, editable=False)
+    search_phone = models.CharField(max_length=20, blank=True, editable=False)
+    search_alt_phone = models.CharField(max_length=20, blank=True, editable=False)
+    search_email = models.CharField(max_length=254, blank=True, editable=False)
+    search_company = models.CharField(max_length=200, blank=True, editable=False)
+    
+    # Fields whose changes are written to the audit trail (see leads.signals)
+    AUDIT_TRACKED_FIELDS = (
+        'first_name', 'last_name', 'mobile', 'email', 'status', 'priority', 'temperature',
+        'assigned_to', 'score', 'budget_min', 'budget_max', 'lead_type', 'source', 'company',
+        'title', 'preferred_contact_method', 'is_qualified', 'notes', 'tags',
+    )
+    
+    SEARCH_SOURCE_FIELDS = {'first_name', 'last_name', 'mobile', 'phone', 'email', 'company'}
+    SEARCH_KEY_FIELDS = {
+        'search_name', 'search_name_reversed', 'search_phone', 'search_alt_phone', 'search_email', 'search_company',
+    }
+    
+    objects = LeadQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['mobile']),
             models.Index(fields=['email']),
+            models.Index(fields=['search_name']),
+            models.Index(fields=['search_name_reversed']),
+            models.Index(fields=['search_phone']),
+            models.Index(fields=['search_alt_phone']),
+            models.Index(fields=['search_email']),
+            models.Index(fields=['search_company']),
             models.Index(fields=['status']),
             models.Index(fields=['assigned_to']),
             models.Index(fields=['created_at']),
             models.Index(fields=['score']),
+            models.Index(fields=['assigned_to', 'created_at']),
+            models.Index(fields=['status', 'score']),
+            models.Index(fields=['next_follow_up']),
         ]
         permissions = [
             ("can_view_leads", "Can view leads"),
@@ -212,6 +263,52 @@ class Lead(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.mobile})"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if self.SEARCH_SOURCE_FIELDS & set(update_fields):
+                self.refresh_search_keys()
+                kwargs['update_fields'] = set(update_fields) | self.SEARCH_KEY_FIELDS
+        elif self._search_sources_changed():
+            self.refresh_search_keys()
+        super().save(*args, **kwargs)
+    
+    def _search_sources_changed(self):
+        """Whether a search key source differs from the loaded value (always for new leads)"""
+        loaded = self.get_loaded_values()
+        if self._state.adding or loaded is None:
+            return True
+        if self.SEARCH_SOURCE_FIELDS & set(self.get_changes()):
+            return True
+        # Deferred when loaded and assigned since
+        return any(name in self.__dict__ and name not in loaded for name in self.SEARCH_SOURCE_FIELDS)
+    
+    def get_audit_changes(self):
+        """
+        Return {field name: (old raw value, new raw value)} for audited fields changed since load
+        
+        Read from the change stream's load-time snapshot, so no related object is fetched.
+        """
+        return {
+            name: change for name, change in self.get_changes().items() if name in self.AUDIT_TRACKED_FIELDS
+        }
+    
+    def refresh_search_keys(self):
+        """Recompute the normalized search keys from the contact fields"""
+        if not self._state.adding:
+            # Load deferred sources in one query rather than one per field
+            deferred = [name for name in self.SEARCH_SOURCE_FIELDS if name not in self.__dict__]
+            if deferred:
+                self.refresh_from_db(fields=deferred)
+        first_name = normalize_search_text(self.first_name)
+        last_name = normalize_search_text(self.last_name)
+        self.search_name = f"{first_name} {last_name}".strip()
+        self.search_name_reversed = f"{last_name} {first_name}".strip()
+        self.search_phone = normalize_phone(self.mobile)
+        self.search_alt_phone = normalize_phone(self.phone)
+        self.search_email = (self.email or '').strip().lower()
+        self.search_company = normalize_search_text(self.company)[:200]
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -280,6 +377,9 @@ class LeadNote(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Note for {self.lead.full_name} by {self.user}"
@@ -324,6 +424,9 @@ class LeadActivity(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.get_activity_type_display()} - {self.lead.full_name}"
@@ -347,6 +450,9 @@ class LeadDocument(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.lead.full_name}"
@@ -495,14 +601,29 @@ class LeadAudit(models.Model):
         """
         Convenience method to log an audit action
         """
-        # Backup lead info in case lead gets deleted
-        lead_id_backup = str(lead.id) if lead else None
-        lead_name_backup = lead.full_name if lead else ""
+        audit = cls.build(lead, action, user=user, description=description, field_name=field_name,
+                          old_value=old_value, new_value=new_value, ip_address=ip_address,
+                          user_agent=user_agent, severity=severity, **kwargs)
+        audit.save()
+        return audit
+    
+    @classmethod
+    def build(cls, lead, action, user=None, description="", field_name="", 
+              old_value="", new_value="", ip_address=None, user_agent="", 
+              severity="medium", **kwargs):
+        """
+        Build an unsaved audit record (see leads.signals.record_audit for buffered writes)
+        """
+        # Backup lead info in case lead gets deleted (callers logging a deletion pass these)
+        lead_id_backup = kwargs.pop('lead_id_backup', None) or (str(lead.id) if lead else None)
+        lead_name_backup = kwargs.pop('lead_name_backup', None) or (lead.full_name if lead else "")
         
         # Backup user info in case user gets deleted
-        user_name_backup = user.get_full_name() if user else ""
+        user_name_backup = kwargs.pop('user_name_backup', None)
+        if user_name_backup is None:
+            user_name_backup = user.get_full_name() if user else ""
         
-        return cls.objects.create(
+        return cls(
             lead=lead,
             lead_id_backup=lead_id_backup,
             lead_name_backup=lead_name_backup,
@@ -520,6 +641,122 @@ class LeadAudit(models.Model):
         )
 
 
+class LeadAuditArchive(models.Model):
+    """A compressed file of LeadAudit rows moved out of the hot table (see leads.audit_archive)"""
+    month = models.DateField(help_text="First day of the archived month")
+    file_path = models.CharField(max_length=500, unique=True, help_text="Path relative to LEAD_AUDIT_ARCHIVE_DIR")
+    row_count = models.PositiveIntegerField()
+    min_id = models.BigIntegerField()
+    max_id = models.BigIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    blocks = models.JSONField(default=list, blank=True, help_text="[first id, byte offset] of each gzip member, in id order")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-month', '-created_at']
+        indexes = [
+            models.Index(fields=['min_id', 'max_id']),
+            models.Index(fields=['first_timestamp', 'last_timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.row_count} audits)"
+
+
+class LeadAuditArchiveLead(models.Model):
+    """Archive blocks holding a lead's audits, so lead lookups open only those blocks"""
+    archive = models.ForeignKey(LeadAuditArchive, on_delete=models.CASCADE, related_name='lead_entries')
+    lead_id_backup = models.UUIDField(db_index=True)
+    blocks = models.JSONField(default=list, help_text="Indexes into the archive's blocks")
+    last_timestamp = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['archive', 'lead_id_backup']
+    
+    def __str__(self):
+        return f"{self.lead_id_backup} in {self.archive}"
+
+
+class LeadAuditRollupState(models.Model):
+    """Id of the last LeadAudit folded into the daily rollups (see leads.audit_rollups)"""
+    last_audit_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Audit rollups up to #{self.last_audit_id}"
+
+
+class LeadAuditActionDaily(models.Model):
+    """Audit count per day and action"""
+    day = models.DateField()
+    action = models.CharField(max_length=30, choices=LeadAudit.ACTION_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'action']
+        ordering = ['day', 'action']
+
+
+class LeadAuditUserDaily(models.Model):
+    """Audit count per day and acting user (null for system actions)"""
+    day = models.DateField()
+    # No constraint: the counts outlive deleted users
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'user']
+        ordering = ['day', 'user']
+
+
+class LeadAuditSeverityDaily(models.Model):
+    """Audit count per day and severity"""
+    day = models.DateField()
+    severity = models.CharField(max_length=10, choices=LeadAudit.SEVERITY_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'severity']
+        ordering = ['day', 'severity']
+
+
+class LeadAuditSearchToken(models.Model):
+    """One normalized word of an audit's text, for indexed audit search (see leads.audit_search)"""
+    token = models.CharField(max_length=64)
+    # No cascade, so LeadAudit stays fast-deletable; purge_audits removes the tokens itself
+    audit = models.ForeignKey(
+        LeadAudit, on_delete=models.DO_NOTHING, db_constraint=False, related_name='search_tokens'
+    )
+    # Copy of the audit timestamp so time-bounded searches stay inside one index
+    timestamp = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'timestamp']),
+        ]
+
+
+class LeadAuditSearchState(models.Model):
+    """Id of the last LeadAudit added to the search index"""
+    last_audit_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Audit search index up to #{self.last_audit_id}"
+
+
+class LeadOpenCount(models.Model):
+    """Open leads assigned to a user, kept for automatic assignment (see leads.assignment)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    # Moved with F() updates in the transaction of each lead change, so it cannot lose increments
+    open_leads = models.IntegerField(default=0)
+    counted_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.open_leads} open leads"
+
+
 class UserLeadPreferences(models.Model):
     """Store user preferences for lead list column display"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='lead_preferences')
@@ -630,7 +867,7 @@ class LeadEvent(models.Model):
         ('no_show', 'No Show'),
     ]
     
-    lead_id = models.CharField(max_length=36, db_index=True)  # UUID string to match Lead.id
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, null=True, blank=True, related_name='events')
     title = models.CharField(max_length=200)
     event_type = models.CharField(max_length=50, choices=EVENT_TYPES, default='meeting')
     description = models.TextField(blank=True)
@@ -666,19 +903,14 @@ class LeadEvent(models.Model):
         indexes = [
             models.Index(fields=['start_datetime', 'status']),
             models.Index(fields=['assigned_to', 'start_datetime']),
+            models.Index(fields=['assigned_to', 'updated_at']),
+            models.Index(fields=['status', 'reminder_sent', 'start_datetime']),
+            models.Index(fields=['lead', 'start_datetime']),
         ]
     
     def __str__(self):
         return f"{self.title} ({self.start_datetime.strftime('%Y-%m-%d %H:%M')})"
     
-    @property
-    def lead(self):
-        """Get the related lead object"""
-        try:
-            return Lead.objects.get(id=self.lead_id)
-        except Lead.DoesNotExist:
-            return None
-    
     @property
     def is_upcoming(self):
         return self.start_datetime > timezone.now() and self.status == 'scheduled'
@@ -691,3 +923,23 @@ class LeadEvent(models.Model):
     def duration_minutes(self):
         return int((self.end_datetime - self.start_datetime).total_seconds() / 60)
 
+
+class LeadEventTombstone(models.Model):
+    """A lead event that left a user's calendar feed, reported to syncing clients as deleted"""
+    # Clients that last synced longer ago than this can no longer be answered and need a full resync
+    RETENTION_DAYS = 90
+    
+    event_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    removed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'removed_at']),
+        ]
+    
+    def __str__(self):
+        return f"Event #{self.event_id} removed for {self.user_id}"
+
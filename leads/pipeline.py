@@ -0,0 +1,111 @@
+"""
+Lead pipeline (kanban) queries.
+
+Column totals come from one grouped COUNT; each column's cards are read newest-score
+first from the (status, score) index and paged independently with a keyset cursor.
+"""
+import base64
+import uuid
+
+from django.db.models import Count, Q
+
+DEFAULT_COLUMN_SIZE = 20
+MAX_COLUMN_SIZE = 100
+
+# Column key for leads without a status
+NO_STATUS = 'none'
+
+CARD_FIELDS = (
+    'id', 'first_name', 'last_name', 'company', 'mobile', 'score', 'status_id',
+    'next_follow_up', 'assigned_to__first_name', 'assigned_to__last_name', 'assigned_to__username',
+)
+
+
+def column_key(status_id):
+    return str(status_id) if status_id is not None else NO_STATUS
+
+
+def parse_column_key(key):
+    """Return the status id for a column key (None for the no-status column); raises ValueError"""
+    if key == NO_STATUS:
+        return None
+    try:
+        return int(key)
+    except ValueError:
+        raise ValueError(f'Invalid column: {key}')
+
+
+def parse_lead_id(value):
+    """Return the lead id (a UUID) sent by a client; raises ValueError when it is malformed"""
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('Invalid lead id')
+
+
+def column_limit(value):
+    try:
+        return min(max(int(value or DEFAULT_COLUMN_SIZE), 1), MAX_COLUMN_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+
+
+def encode_cursor(score, lead_id):
+    raw = f'{score}:{lead_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Parse an `after` cursor into (score, lead id); raises ValueError when it is malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        score, lead_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(score), uuid.UUID(lead_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid pipeline cursor')
+
+
+def column_counts(leads, status_ids=None):
+    """Lead totals per column key from one grouped query"""
+    if status_ids is not None:
+        condition = Q(status_id__in=[s for s in status_ids if s is not None])
+        if None in status_ids:
+            condition |= Q(status__isnull=True)
+        leads = leads.filter(condition)
+    rows = leads.order_by().values_list('status_id').annotate(count=Count('id'))
+    return {column_key(status_id): count for status_id, count in rows}
+
+
+def serialize_card(row):
+    assignee = ' '.join(
+        part for part in (row['assigned_to__first_name'], row['assigned_to__last_name']) if part
+    ) or row['assigned_to__username']
+    return {
+        'id': str(row['id']),
+        'name': f"{row['first_name']} {row['last_name']}",
+        'company': row['company'],
+        'mobile': row['mobile'],
+        'score': row['score'],
+        'assigned_to': assignee,
+        'next_follow_up': row['next_follow_up'].isoformat() if row['next_follow_up'] else None,
+    }
+
+
+def column_page(leads, status_id, after=None, limit=DEFAULT_COLUMN_SIZE):
+    """Return (cards, next_cursor) for one column, highest score first"""
+    if status_id is None:
+        leads = leads.filter(status__isnull=True)
+    else:
+        leads = leads.filter(status_id=status_id)
+
+    if after:
+        score, lead_id = decode_cursor(after)
+        leads = leads.filter(Q(score__lt=score) | Q(score=score, id__lt=lead_id))
+
+    rows = list(leads.order_by('-score', '-id').values(*CARD_FIELDS)[:limit + 1])
+    cards = [serialize_card(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last['score'], last['id'])
+    return cards, next_cursor
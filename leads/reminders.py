@@ -0,0 +1,184 @@
+"""
+Lead event reminder dispatching.
+
+Due reminders are found with one indexed range query per tick that reads only the
+timing columns, claimed under row locks that parallel dispatchers skip, and only the
+claimed events are loaded and handed to the delivery backends in a thread pool.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import LeadEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REMINDER_BACKENDS = [
+    'leads.reminders.EmailReminderBackend',
+]
+
+# Reminders can be set at most this far ahead of the event (matches the largest option in the UI)
+DEFAULT_MAX_REMINDER_MINUTES = 24 * 60
+
+# Events that started less than this long ago still get their reminder (e.g. after a restart)
+DEFAULT_GRACE_MINUTES = 15
+
+
+class BaseReminderBackend:
+    """Interface for reminder delivery backends"""
+
+    def send(self, reminder):
+        """Deliver one reminder dict; raise on failure so the reminder is retried"""
+        raise NotImplementedError
+
+
+class EmailReminderBackend(BaseReminderBackend):
+    """Send reminders through Django's configured EMAIL_BACKEND (console in development)"""
+
+    def send(self, reminder):
+        recipients = [email for email in reminder['recipients'] if email]
+        if not recipients:
+            return
+        send_mail(
+            subject=f"Reminder: {reminder['title']}",
+            message=(
+                f"{reminder['title']} with {reminder['lead_name']} starts at "
+                f"{reminder['start_datetime']}.\n"
+                f"Location: {reminder['location'] or 'N/A'}"
+            ),
+            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+            recipient_list=recipients,
+        )
+
+
+class FileReminderBackend(BaseReminderBackend):
+    """Append reminders as JSON lines to a local file"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or getattr(
+            settings, 'LEAD_EVENT_REMINDER_FILE', settings.BASE_DIR / 'logs' / 'event_reminders.jsonl'
+        )
+
+    def send(self, reminder):
+        line = json.dumps(reminder, default=str)
+        with self._lock:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as sink:
+                sink.write(line + '\n')
+
+
+def get_reminder_backends(paths=None):
+    """Instantiate backends from dotted paths (defaults to settings.LEAD_EVENT_REMINDER_BACKENDS)"""
+    if paths is None:
+        paths = getattr(settings, 'LEAD_EVENT_REMINDER_BACKENDS', DEFAULT_REMINDER_BACKENDS)
+    return [import_string(path)() for path in paths]
+
+
+class ReminderDispatcher:
+    """Find, claim and deliver due lead event reminders"""
+
+    def __init__(self, backends=None, workers=4, max_reminder_minutes=DEFAULT_MAX_REMINDER_MINUTES,
+                 grace_minutes=DEFAULT_GRACE_MINUTES):
+        self.backends = backends if backends is not None else get_reminder_backends()
+        self.workers = workers
+        self.max_reminder_minutes = max_reminder_minutes
+        self.grace_minutes = grace_minutes
+
+    def claim_due_reminders(self, now=None):
+        """
+        Mark the due reminders sent and return their event ids.
+
+        One range query over the (status, reminder_sent, start_datetime) index reads the
+        timing columns of every event starting inside the largest reminder window and
+        locks them; the per-event offset is applied here. Rows locked by another
+        dispatcher are skipped, so each reminder is claimed by exactly one of them.
+        """
+        now = now or timezone.now()
+        with transaction.atomic():
+            candidates = LeadEvent.objects.filter(
+                status='scheduled',
+                reminder_sent=False,
+                start_datetime__gte=now - timedelta(minutes=self.grace_minutes),
+                start_datetime__lte=now + timedelta(minutes=self.max_reminder_minutes),
+                send_reminder=True,
+                reminder_minutes_before__gt=0,
+            ).select_for_update(skip_locked=True).values_list('id', 'start_datetime', 'reminder_minutes_before')
+
+            event_ids = [
+                event_id for event_id, start, minutes_before in candidates
+                if start - timedelta(minutes=minutes_before) <= now
+            ]
+            if event_ids:
+                LeadEvent.objects.filter(id__in=event_ids).update(reminder_sent=True)
+        return event_ids
+
+    def due_reminders(self, now=None):
+        """Claim the due reminders and return their events, with lead and attendees loaded"""
+        event_ids = self.claim_due_reminders(now)
+        if not event_ids:
+            return []
+        return list(
+            LeadEvent.objects.filter(id__in=event_ids).select_related('lead', 'assigned_to').prefetch_related('attendees')
+        )
+
+    @staticmethod
+    def build_reminder(event):
+        recipients = []
+        if event.assigned_to and event.assigned_to.email:
+            recipients.append(event.assigned_to.email)
+        for attendee in event.attendees.all():
+            if attendee.email and attendee.email not in recipients:
+                recipients.append(attendee.email)
+
+        return {
+            'event_id': event.id,
+            'title': event.title,
+            'event_type': event.event_type,
+            'start_datetime': event.start_datetime.isoformat(),
+            'end_datetime': event.end_datetime.isoformat(),
+            'location': event.location,
+            'lead_id': str(event.lead_id) if event.lead_id else None,
+            'lead_name': event.lead.full_name if event.lead else 'Unknown Lead',
+            'recipients': recipients,
+        }
+
+    def deliver(self, reminder):
+        """Send a reminder through every backend; returns True when all succeeded"""
+        delivered = True
+        for backend in self.backends:
+            try:
+                backend.send(reminder)
+            except Exception:
+                logger.exception("Reminder backend %s failed for event %s",
+                                 backend.__class__.__name__, reminder['event_id'])
+                delivered = False
+        return delivered
+
+    def run_once(self, now=None):
+        """Dispatch one tick of reminders; returns (sent, failed) counts"""
+        # Already marked sent, so no other dispatcher delivers them too
+        events = self.due_reminders(now)
+        if not events:
+            return 0, 0
+
+        reminders = [self.build_reminder(event) for event in events]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self.deliver, reminders))
+
+        failed_ids = [reminder['event_id'] for reminder, ok in zip(reminders, results) if not ok]
+        if failed_ids:
+            # Release failed reminders so the next tick retries them
+            LeadEvent.objects.filter(id__in=failed_ids).update(reminder_sent=False)
+
+        return len(reminders) - len(failed_ids), len(failed_ids)
@@ -0,0 +1,221 @@
+"""
+Automatic lead scoring.
+
+Features for every lead are pulled with a handful of aggregate queries, scored in one
+vectorized NumPy pass and only the scores that changed are written back. Writes go
+through queryset updates, so no per-row save() signals or audit records are produced.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from authentication.change_stream import record_changes
+
+from .models import Lead, LeadActivity, LeadTemperature
+
+# Relative weight of each feature in the final 0-100 score
+SCORE_WEIGHTS = {
+    'recency': 0.25,
+    'activity': 0.20,
+    'budget': 0.15,
+    'temperature': 0.25,
+    'source': 0.15,
+}
+
+# Days for the recency signal to fall to ~37%
+RECENCY_DECAY_DAYS = 30
+
+# Activities in the window needed to reach ~63% of the activity signal
+ACTIVITY_SATURATION = 5
+ACTIVITY_WINDOW_DAYS = 90
+
+# Pseudo-count pulling small sources towards the overall conversion rate
+SOURCE_PRIOR_WEIGHT = 20
+
+TEMPERATURE_WEIGHTS = {
+    'hot': 1.0,
+    'warm': 0.6,
+    'cold': 0.2,
+}
+UNKNOWN_TEMPERATURE_WEIGHT = 0.4
+
+LOAD_CHUNK_SIZE = 5000
+UPDATE_BATCH_SIZE = 1000
+
+
+class LeadFeatures:
+    """Column arrays of the raw scoring inputs, one row per lead"""
+
+    def __init__(self, lead_ids, current_scores, last_touch, budget, temperature_ids, source_ids,
+                 activity_counts):
+        self.lead_ids = lead_ids
+        self.current_scores = current_scores
+        self.last_touch = last_touch
+        self.budget = budget
+        self.temperature_ids = temperature_ids
+        self.source_ids = source_ids
+        self.activity_counts = activity_counts
+
+    def __len__(self):
+        return len(self.lead_ids)
+
+
+def load_features(now=None, chunk_size=LOAD_CHUNK_SIZE):
+    """Read every lead's scoring inputs with keyset-chunked projections and one grouped activity count"""
+    now = now or timezone.now()
+
+    lead_ids = []
+    current_scores = []
+    last_touch = []
+    budget = []
+    temperature_ids = []
+    source_ids = []
+
+    rows = Lead.objects.order_by('id').values_list(
+        'id', 'score', 'last_contacted', 'created_at', 'budget_min', 'budget_max',
+        'temperature_id', 'source_id',
+    )
+    last_id = None
+    while True:
+        chunk = rows.filter(id__gt=last_id) if last_id is not None else rows
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        for lead_id, score, last_contacted, created_at, budget_min, budget_max, temperature_id, source_id in chunk:
+            lead_ids.append(lead_id)
+            current_scores.append(score)
+            touched = last_contacted or created_at
+            last_touch.append((now - touched).total_seconds() / 86400 if touched else np.nan)
+            if budget_min and budget_max:
+                budget.append(float(budget_min + budget_max) / 2)
+            else:
+                budget.append(float(budget_max or budget_min or 0) or np.nan)
+            temperature_ids.append(temperature_id or 0)
+            source_ids.append(source_id or 0)
+        last_id = chunk[-1][0]
+
+    index = {lead_id: position for position, lead_id in enumerate(lead_ids)}
+    activity_counts = np.zeros(len(lead_ids), dtype=np.float64)
+    recent_activity = LeadActivity.objects.filter(
+        created_at__gte=now - timedelta(days=ACTIVITY_WINDOW_DAYS)
+    ).values_list('lead_id').annotate(count=Count('id')).order_by()
+    for lead_id, count in recent_activity:
+        position = index.get(lead_id)
+        if position is not None:
+            activity_counts[position] = count
+
+    return LeadFeatures(
+        lead_ids=lead_ids,
+        current_scores=np.asarray(current_scores, dtype=np.int64),
+        last_touch=np.asarray(last_touch, dtype=np.float64),
+        budget=np.asarray(budget, dtype=np.float64),
+        temperature_ids=np.asarray(temperature_ids, dtype=np.int64),
+        source_ids=np.asarray(source_ids, dtype=np.int64),
+        activity_counts=activity_counts,
+    )
+
+
+def temperature_lookup():
+    """Map temperature ids to weights by temperature name"""
+    return {
+        temperature_id: TEMPERATURE_WEIGHTS.get(name.strip().lower(), UNKNOWN_TEMPERATURE_WEIGHT)
+        for temperature_id, name in LeadTemperature.objects.values_list('id', 'name')
+    }
+
+
+def source_conversion_lookup():
+    """Smoothed conversion rate per source id from one grouped query, scaled so the best source is 1"""
+    totals = defaultdict(lambda: [0, 0])
+    for source_id, total, converted in Lead.objects.values_list('source_id').annotate(
+        total=Count('id'), converted=Count('converted_at')
+    ).order_by():
+        totals[source_id or 0] = [total, converted]
+
+    all_leads = sum(total for total, _ in totals.values())
+    if not all_leads:
+        return {}
+    overall = sum(converted for _, converted in totals.values()) / all_leads
+
+    rates = {
+        source_id: (converted + SOURCE_PRIOR_WEIGHT * overall) / (total + SOURCE_PRIOR_WEIGHT)
+        for source_id, (total, converted) in totals.items()
+    }
+    best = max(rates.values())
+    return {source_id: (rate / best if best else 0.0) for source_id, rate in rates.items()}
+
+
+def _lookup(ids, mapping, default):
+    """Vectorized dict lookup over an integer id array"""
+    if not len(ids):
+        return np.zeros(0, dtype=np.float64)
+    table = np.full(int(max(ids.max(), max(mapping, default=0))) + 1, default, dtype=np.float64)
+    for key, value in mapping.items():
+        table[key] = value
+    return table[ids]
+
+
+def compute_scores(features, temperature_weights, source_rates):
+    """Score every lead in one vectorized pass, returning integer scores in 0-100"""
+    if not len(features):
+        return np.zeros(0, dtype=np.int64)
+
+    recency = np.exp(-np.nan_to_num(features.last_touch, nan=np.inf).clip(min=0) / RECENCY_DECAY_DAYS)
+    activity = 1 - np.exp(-features.activity_counts / ACTIVITY_SATURATION)
+
+    # Budget fit is the lead's budget percentile among leads that gave one
+    budget = np.zeros(len(features), dtype=np.float64)
+    has_budget = ~np.isnan(features.budget)
+    if has_budget.sum() > 1:
+        ranks = features.budget[has_budget].argsort().argsort()
+        budget[has_budget] = ranks / (has_budget.sum() - 1)
+    elif has_budget.any():
+        budget[has_budget] = 1.0
+
+    temperature = _lookup(features.temperature_ids, temperature_weights, UNKNOWN_TEMPERATURE_WEIGHT)
+    source = _lookup(features.source_ids, source_rates, source_rates.get(0, 0.0))
+
+    combined = (
+        SCORE_WEIGHTS['recency'] * recency +
+        SCORE_WEIGHTS['activity'] * activity +
+        SCORE_WEIGHTS['budget'] * budget +
+        SCORE_WEIGHTS['temperature'] * temperature +
+        SCORE_WEIGHTS['source'] * source
+    )
+    return np.rint(combined * 100).clip(0, 100).astype(np.int64)
+
+
+def write_scores(lead_ids, scores, batch_size=UPDATE_BATCH_SIZE):
+    """
+    Persist new scores with one UPDATE per (score value, id batch).
+
+    Scores only take 101 values, so grouping by value keeps the number of statements
+    small and the statements themselves simple; no save() signals are fired, so the
+    change events are appended with each statement.
+    """
+    by_score = defaultdict(list)
+    for lead_id, score in zip(lead_ids, scores.tolist()):
+        by_score[score].append(lead_id)
+
+    updated = 0
+    for score, ids in by_score.items():
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            with transaction.atomic():
+                updated += Lead.objects.filter(id__in=chunk).update(score=score)
+                record_changes(Lead, chunk, ['score'])
+    return updated
+
+
+def score_leads(dry_run=False, now=None):
+    """Recompute all lead scores; returns (leads scored, scores changed)"""
+    features = load_features(now=now)
+    scores = compute_scores(features, temperature_lookup(), source_conversion_lookup())
+
+    changed = np.flatnonzero(scores != features.current_scores)
+    if not dry_run and len(changed):
+        write_scores([features.lead_ids[position] for position in changed], scores[changed])
+    return len(features), len(changed)
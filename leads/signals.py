@@ -1,10 +1,17 @@
 import json
+import logging
+from datetime import timedelta
+from functools import partial
+from django.db import connection, transaction, IntegrityError
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from threading import local
-from .models import Lead, LeadAudit, LeadNote, LeadActivity, LeadDocument
+from .assignment import track_lead_change
+from .models import Lead, LeadAudit, LeadNote, LeadActivity, LeadDocument, LeadEvent, LeadEventTombstone, LeadStatus
+
+logger = logging.getLogger(__name__)
 
 # Thread-local storage for request context
 _thread_locals = local()
@@ -30,55 +37,195 @@ def get_request_info():
     """Extract useful info from current request"""
     request = get_current_request()
     if request:
-        return {
-            'user': getattr(request, 'user', None),
-            'ip_address': request.META.get('REMOTE_ADDR'),
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-            'session_key': request.session.session_key if hasattr(request, 'session') else '',
-        }
+        # Computed once per request rather than once per audit row
+        if not hasattr(request, '_audit_info'):
+            user = getattr(request, 'user', None)
+            if user is not None and not user.is_authenticated:
+                user = None
+            request._audit_info = {
+                'user': user,
+                'user_name': user.get_full_name() if user else '',
+                'ip_address': request.META.get('REMOTE_ADDR'),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'session_key': request.session.session_key if hasattr(request, 'session') else '',
+            }
+        return request._audit_info
     return {
         'user': None,
+        'user_name': '',
         'ip_address': None,
         'user_agent': '',
         'session_key': '',
     }
 
 
-@receiver(pre_save, sender=Lead)
-def capture_lead_changes(sender, instance, **kwargs):
-    """Capture changes before saving lead"""
-    if instance.pk:  # Only for updates, not creates
+class AuditBuffer:
+    """Collects LeadAudit records and writes them with one bulk_create"""
+    
+    def __init__(self):
+        self.records = []
+    
+    def add(self, audit):
+        self.records.append(audit)
+    
+    def discard_lead(self, lead_id):
+        """Drop pending records of a deleted lead, as the FK cascade would have"""
+        self.records = [audit for audit in self.records if audit.lead_id != lead_id]
+    
+    def flush(self):
+        records, self.records = self.records, []
+        if not records:
+            return
         try:
-            # Get the old instance
-            old_instance = Lead.objects.get(pk=instance.pk)
-            
-            # Store old values for comparison
-            instance._old_values = {
-                'first_name': old_instance.first_name,
-                'last_name': old_instance.last_name,
-                'mobile': old_instance.mobile,
-                'email': old_instance.email,
-                'status': old_instance.status,
-                'priority': old_instance.priority,
-                'temperature': old_instance.temperature,
-                'assigned_to': old_instance.assigned_to,
-                'score': old_instance.score,
-                'budget_min': old_instance.budget_min,
-                'budget_max': old_instance.budget_max,
-                'lead_type': old_instance.lead_type,
-                'source': old_instance.source,
-                'company': old_instance.company,
-                'title': old_instance.title,
-                'preferred_contact_method': old_instance.preferred_contact_method,
-                'is_qualified': old_instance.is_qualified,
-                'notes': old_instance.notes,
-                'tags': old_instance.tags,
-            }
-        except Lead.DoesNotExist:
-            # Lead doesn't exist yet (creation)
-            instance._old_values = {}
+            LeadAudit.objects.bulk_create(records)
+        except IntegrityError:
+            # One bad row (e.g. its lead vanished) must not cost the whole batch
+            logger.exception("Bulk audit write failed, retrying %d records one by one", len(records))
+            for audit in records:
+                try:
+                    audit.pk = None
+                    audit.save()
+                except IntegrityError:
+                    logger.exception("Dropping audit record: %s", audit.description)
+
+
+def start_audit_buffer():
+    """Buffer audit records on this thread until flush_audit_buffer()"""
+    _thread_locals.audit_buffer = AuditBuffer()
+
+
+def get_audit_buffer():
+    return getattr(_thread_locals, 'audit_buffer', None)
+
+
+def flush_audit_buffer():
+    """Write and stop buffering the records collected on this thread"""
+    buffer = get_audit_buffer()
+    if buffer is not None:
+        del _thread_locals.audit_buffer
+        buffer.flush()
+
+
+class audit_buffer:
+    """
+    Context manager that batches audit writes outside of requests, e.g.
+    
+        with audit_buffer():
+            for lead in leads:
+                lead.save()
+    """
+    
+    def __enter__(self):
+        self.outer = get_audit_buffer()
+        if self.outer is None:
+            start_audit_buffer()
+        return get_audit_buffer()
+    
+    def __exit__(self, *exc_info):
+        if self.outer is None:
+            flush_audit_buffer()
+
+
+def _store_audit(audit):
+    buffer = get_audit_buffer()
+    if buffer is not None:
+        buffer.add(audit)
     else:
-        instance._old_values = {}
+        # No request or audit_buffer() in scope (shell, scripts): write straight away
+        audit.save()
+
+
+def record_audit(lead, action, **kwargs):
+    """
+    Queue an audit record for the current request (or write it now if nothing is buffering)
+    
+    Records made inside a transaction are only queued once it commits, so rolled-back
+    changes leave no audit trail.
+    """
+    request_info = get_request_info()
+    kwargs.setdefault('ip_address', request_info['ip_address'])
+    kwargs.setdefault('user_agent', request_info['user_agent'])
+    if kwargs.get('user') is not None and kwargs['user'] is request_info['user']:
+        kwargs.setdefault('user_name_backup', request_info['user_name'])
+    
+    audit = LeadAudit.build(lead, action, **kwargs)
+    if connection.in_atomic_block:
+        transaction.on_commit(partial(_store_audit, audit))
+    else:
+        _store_audit(audit)
+    return audit
+
+
+# Display names for audited Lead fields, in the order changes are reported
+LEAD_AUDIT_FIELD_LABELS = {
+    'first_name': 'First Name',
+    'last_name': 'Last Name',
+    'mobile': 'Mobile',
+    'email': 'Email',
+    'status': 'Status',
+    'priority': 'Priority',
+    'temperature': 'Temperature',
+    'assigned_to': 'Assigned To',
+    'score': 'Score',
+    'budget_min': 'Minimum Budget',
+    'budget_max': 'Maximum Budget',
+    'lead_type': 'Lead Type',
+    'source': 'Source',
+    'company': 'Company',
+    'title': 'Title',
+    'preferred_contact_method': 'Preferred Contact Method',
+    'is_qualified': 'Qualified Status',
+    'notes': 'Notes',
+    'tags': 'Tags',
+}
+
+LEAD_AUDIT_ACTIONS = {
+    'status': ('status_change', 'high'),
+    'assigned_to': ('assignment_change', 'high'),
+    'priority': ('priority_change', 'medium'),
+    'temperature': ('temperature_change', 'medium'),
+    'score': ('score_change', 'medium'),
+}
+
+
+def describe_lead_changes(instance, changes):
+    """
+    Turn raw {field: (old, new)} values into display strings
+    
+    Related names are loaded with one in_bulk() per related model, and only for ids the
+    instance does not already hold as a cached related object.
+    """
+    wanted = {}
+    for name, values in changes.items():
+        field = Lead._meta.get_field(name)
+        if field.is_relation:
+            wanted.setdefault(field.related_model, set()).update(v for v in values if v is not None)
+    
+    names = {}
+    for model, ids in wanted.items():
+        for name, values in changes.items():
+            field = Lead._meta.get_field(name)
+            if field.related_model is model and field.is_cached(instance):
+                related = field.get_cached_value(instance)
+                if related is not None and related.pk in ids:
+                    names[(model, related.pk)] = str(related)
+                    ids.discard(related.pk)
+        if ids:
+            for pk, obj in model._default_manager.in_bulk(ids).items():
+                names[(model, pk)] = str(obj)
+    
+    def display(field, value):
+        if value is None:
+            return "None"
+        if field.is_relation:
+            return names.get((field.related_model, value), str(value))
+        return str(value)
+    
+    described = {}
+    for name, (old_value, new_value) in changes.items():
+        field = Lead._meta.get_field(name)
+        described[name] = (display(field, old_value), display(field, new_value))
+    return described
 
 
 @receiver(post_save, sender=Lead)
@@ -88,7 +235,7 @@ def log_lead_changes(sender, instance, created, **kwargs):
     
     if created:
         # Log lead creation
-        LeadAudit.log_action(
+        record_audit(
             lead=instance,
             action='create',
             user=request_info['user'],
@@ -97,90 +244,46 @@ def log_lead_changes(sender, instance, created, **kwargs):
             user_agent=request_info['user_agent'],
             severity='medium'
         )
-    else:
-        # Log field changes
-        old_values = getattr(instance, '_old_values', {})
-        if old_values:
-            changes = []
-            
-            # Check each field for changes
-            fields_to_check = {
-                'first_name': 'First Name',
-                'last_name': 'Last Name',
-                'mobile': 'Mobile',
-                'email': 'Email',
-                'status': 'Status',
-                'priority': 'Priority',
-                'temperature': 'Temperature',
-                'assigned_to': 'Assigned To',
-                'score': 'Score',
-                'budget_min': 'Minimum Budget',
-                'budget_max': 'Maximum Budget',
-                'lead_type': 'Lead Type',
-                'source': 'Source',
-                'company': 'Company',
-                'title': 'Title',
-                'preferred_contact_method': 'Preferred Contact Method',
-                'is_qualified': 'Qualified Status',
-                'notes': 'Notes',
-                'tags': 'Tags',
-            }
-            
-            for field_name, display_name in fields_to_check.items():
-                old_value = old_values.get(field_name)
-                new_value = getattr(instance, field_name)
-                
-                if old_value != new_value:
-                    # Format values for display
-                    old_display = str(old_value) if old_value is not None else "None"
-                    new_display = str(new_value) if new_value is not None else "None"
-                    
-                    changes.append(f"{display_name}: {old_display} → {new_display}")
-                    
-                    # Log specific action types for important changes
-                    action_type = 'update'
-                    severity = 'medium'
-                    
-                    if field_name == 'status':
-                        action_type = 'status_change'
-                        severity = 'high'
-                    elif field_name == 'assigned_to':
-                        action_type = 'assignment_change'
-                        severity = 'high'
-                    elif field_name == 'priority':
-                        action_type = 'priority_change'
-                        severity = 'medium'
-                    elif field_name == 'temperature':
-                        action_type = 'temperature_change'
-                        severity = 'medium'
-                    elif field_name == 'score':
-                        action_type = 'score_change'
-                        severity = 'medium'
-                    
-                    LeadAudit.log_action(
-                        lead=instance,
-                        action=action_type,
-                        user=request_info['user'],
-                        description=f"{display_name} changed: {old_display} → {new_display}",
-                        field_name=field_name,
-                        old_value=old_display,
-                        new_value=new_display,
-                        ip_address=request_info['ip_address'],
-                        user_agent=request_info['user_agent'],
-                        severity=severity
-                    )
-            
-            # Log general update if there were changes
-            if changes:
-                LeadAudit.log_action(
-                    lead=instance,
-                    action='update',
-                    user=request_info['user'],
-                    description=f"Lead updated: {'; '.join(changes)}",
-                    ip_address=request_info['ip_address'],
-                    user_agent=request_info['user_agent'],
-                    severity='medium'
-                )
+        return
+    
+    # Compare against the snapshot taken when the lead was loaded (ChangeStreamMixin)
+    changes = instance.get_audit_changes()
+    if not changes:
+        return
+    
+    described = describe_lead_changes(instance, changes)
+    summary = []
+    for field_name, display_name in LEAD_AUDIT_FIELD_LABELS.items():
+        if field_name not in described:
+            continue
+        old_display, new_display = described[field_name]
+        summary.append(f"{display_name}: {old_display} → {new_display}")
+        
+        # Log specific action types for important changes
+        action_type, severity = LEAD_AUDIT_ACTIONS.get(field_name, ('update', 'medium'))
+        record_audit(
+            lead=instance,
+            action=action_type,
+            user=request_info['user'],
+            description=f"{display_name} changed: {old_display} → {new_display}",
+            field_name=field_name,
+            old_value=old_display,
+            new_value=new_display,
+            ip_address=request_info['ip_address'],
+            user_agent=request_info['user_agent'],
+            severity=severity
+        )
+    
+    # Log general update
+    record_audit(
+        lead=instance,
+        action='update',
+        user=request_info['user'],
+        description=f"Lead updated: {'; '.join(summary)}",
+        ip_address=request_info['ip_address'],
+        user_agent=request_info['user_agent'],
+        severity='medium'
+    )
 
 
 @receiver(post_delete, sender=Lead)
@@ -188,7 +291,11 @@ def log_lead_deletion(sender, instance, **kwargs):
     """Log lead deletion"""
     request_info = get_request_info()
     
-    LeadAudit.log_action(
+    buffer = get_audit_buffer()
+    if buffer is not None:
+        buffer.discard_lead(instance.pk)
+    
+    record_audit(
         lead=None,  # Lead is deleted
         action='delete',
         user=request_info['user'],
@@ -207,7 +314,7 @@ def log_note_addition(sender, instance, created, **kwargs):
     if created:
         request_info = get_request_info()
         
-        LeadAudit.log_action(
+        record_audit(
             lead=instance.lead,
             action='note_added',
             user=request_info['user'] or instance.user,
@@ -232,7 +339,7 @@ def log_activity_addition(sender, instance, created, **kwargs):
         elif instance.activity_type == 'status_change':
             severity = 'high'
         
-        LeadAudit.log_action(
+        record_audit(
             lead=instance.lead,
             action='activity_added',
             user=request_info['user'] or instance.user,
@@ -251,7 +358,7 @@ def log_document_addition(sender, instance, created, **kwargs):
     if created:
         request_info = get_request_info()
         
-        LeadAudit.log_action(
+        record_audit(
             lead=instance.lead,
             action='document_added',
             user=request_info['user'] or instance.uploaded_by,
@@ -269,7 +376,7 @@ def log_lead_contact(lead, contact_method, user=None, notes=""):
     """Manually log contact with a lead"""
     request_info = get_request_info()
     
-    LeadAudit.log_action(
+    record_audit(
         lead=lead,
         action='contact',
         user=user or request_info['user'],
@@ -295,7 +402,7 @@ def log_lead_conversion(lead, conversion_value=None, user=None, notes=""):
     if notes:
         description += f". {notes}"
     
-    LeadAudit.log_action(
+    record_audit(
         lead=lead,
         action='conversion',
         user=user or request_info['user'],
@@ -313,7 +420,7 @@ def log_bulk_action(leads, action, user=None, description=""):
     request_info = get_request_info()
     
     for lead in leads:
-        LeadAudit.log_action(
+        record_audit(
             lead=lead,
             action=action,
             user=user or request_info['user'],
@@ -322,4 +429,76 @@ def log_bulk_action(leads, action, user=None, description=""):
             user_agent=request_info['user_agent'],
             severity='medium',
             source='bulk_action'
-        )
\ No newline at end of file
+        )
+
+
+def record_event_tombstone(event, user_id):
+    """Tell the user's calendar sync that the event is gone, dropping tombstones past retention"""
+    if user_id is None:
+        return
+    LeadEventTombstone.objects.create(
+        event_id=event.pk,
+        user_id=user_id,
+        start_datetime=event.start_datetime,
+        end_datetime=event.end_datetime,
+    )
+    LeadEventTombstone.objects.filter(
+        user_id=user_id,
+        removed_at__lt=timezone.now() - timedelta(days=LeadEventTombstone.RETENTION_DAYS),
+    ).delete()
+
+
+@receiver(pre_save, sender=LeadEvent)
+def remember_event_assignee(sender, instance, raw=False, **kwargs):
+    """Keep the stored assignee so a reassignment can be reported to the previous one"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_assignee_id = LeadEvent.objects.filter(pk=instance.pk).values_list(
+        'assigned_to_id', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=LeadEvent)
+def tombstone_reassigned_event(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_assignee_id', None)
+    if not raw and not created and previous is not None and previous != instance.assigned_to_id:
+        record_event_tombstone(instance, previous)
+
+
+@receiver(post_delete, sender=LeadEvent)
+def tombstone_deleted_event(sender, instance, **kwargs):
+    record_event_tombstone(instance, instance.assigned_to_id)
+
+
+def _is_open(status_id, converted_at, final_status_ids):
+    return converted_at is None and status_id not in final_status_ids
+
+
+@receiver(post_save, sender=Lead)
+def track_assigned_lead_save(sender, instance, created, raw=False, **kwargs):
+    """Keep the auto-assignment open-lead counts in step with assignee and status changes"""
+    if raw:
+        return
+    snapshot = {} if created else instance.get_loaded_values()
+    if snapshot is None or not {'assigned_to', 'status', 'converted_at'} <= snapshot.keys() and not created:
+        return  # saved without being (fully) loaded: the counts catch up when they expire
+    old = (snapshot.get('assigned_to'), snapshot.get('status'), snapshot.get('converted_at'))
+    new = (instance.assigned_to_id, instance.status_id, instance.converted_at)
+    if old == new or not (old[0] or new[0]):
+        return
+
+    final_status_ids = set(LeadStatus.objects.filter(is_final=True).values_list('id', flat=True))
+    # Runs inside the save's transaction, so the count rolls back with the lead
+    track_lead_change(
+        old[0], bool(old[0]) and _is_open(old[1], old[2], final_status_ids),
+        new[0], bool(new[0]) and _is_open(new[1], new[2], final_status_ids),
+    )
+
+
+@receiver(post_delete, sender=Lead)
+def track_assigned_lead_delete(sender, instance, **kwargs):
+    if not instance.assigned_to_id:
+        return
+    is_final = instance.status_id and LeadStatus.objects.filter(id=instance.status_id, is_final=True).exists()
+    if instance.converted_at is None and not is_final:
+        track_lead_change(instance.assigned_to_id, True, None, False)
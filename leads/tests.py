@@ -0,0 +1,99 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import Module, Permission, Profile, UserProfile
+from authentication.permission_cache import get_permission_cache
+
+from .models import Lead, LeadAudit, LeadEvent
+from .timeline import get_lead_timeline
+from .views import user_events_feed_api
+
+
+class EventsFeedSyncTokenTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw')
+
+    def get_feed(self, **params):
+        request = self.factory.get('/leads/api/events/user/feed/', params)
+        request.user = self.user
+        return user_events_feed_api(request)
+
+    def get_json(self, response):
+        return json.loads(response.content)
+
+    def assert_token_syncs(self):
+        response = self.get_feed()
+        self.assertEqual(response.status_code, 200)
+        token = self.get_json(response)['sync_token']
+
+        response = self.get_feed(sync_token=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_json(response)['count'], 0)
+
+    def test_token_for_user_without_events_is_usable(self):
+        self.assert_token_syncs()
+
+    def test_token_for_user_with_only_old_events_is_usable(self):
+        now = timezone.now()
+        event = LeadEvent.objects.create(
+            title='Old meeting', start_datetime=now, end_datetime=now + timedelta(hours=1), assigned_to=self.user,
+        )
+        LeadEvent.objects.filter(id=event.id).update(updated_at=now - timedelta(days=200))
+        self.assert_token_syncs()
+
+    def test_token_synced_before_retention_expires(self):
+        old = (timezone.now() - timedelta(days=200)).timestamp()
+        response = self.get_feed(sync_token=str(int(old * 1000000)))
+        self.assertEqual(response.status_code, 410)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'permissions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-permissions'},
+})
+class LeadTimelineAuditTests(TestCase):
+    def setUp(self):
+        # Version bumps run on commit, which never happens inside a test case
+        get_permission_cache().clear()
+        module, _ = Module.objects.get_or_create(
+            name='audit', defaults={'display_name': 'Audit', 'icon': 'bi-shield', 'url_name': 'audit'}
+        )
+        self.view, _ = Permission.objects.get_or_create(
+            module=module, code='view', defaults={'name': 'View audits', 'level': 1}
+        )
+        self.view_all, _ = Permission.objects.get_or_create(
+            module=module, code='view_all', defaults={'name': 'View all audits', 'level': 1}
+        )
+        self.lead = Lead.objects.create(first_name='Sam', last_name='Lee', mobile='01001234567')
+
+    def make_user(self, username, *permissions):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pw')
+        profile = Profile.objects.create(name=f'{username} profile')
+        profile.permissions.add(*permissions)
+        UserProfile.objects.create(user=user, profile=profile)
+        return user
+
+    def audit_users(self, viewer):
+        entries, _ = get_lead_timeline(self.lead, viewer, types=['audit'])
+        return {LeadAudit.objects.get(id=entry['id']).user for entry in entries}
+
+    def test_audit_viewer_only_sees_own_actions(self):
+        alice = self.make_user('alice', self.view)
+        bob = self.make_user('bob', self.view)
+        for user in (alice, bob):
+            LeadAudit.objects.create(lead=self.lead, user=user, action='update', description='Changed')
+
+        self.assertEqual(self.audit_users(alice), {alice})
+        self.assertEqual(self.audit_users(bob), {bob})
+
+    def test_view_all_sees_every_users_actions(self):
+        alice = self.make_user('alice', self.view)
+        auditor = self.make_user('auditor', self.view, self.view_all)
+        LeadAudit.objects.create(lead=self.lead, user=alice, action='update', description='Changed')
+
+        self.assertIn(alice, self.audit_users(auditor))
@@ -0,0 +1,211 @@
+"""
+Unified lead timeline.
+
+Notes, activities, documents, events and audit entries are each read with a keyset
+query over a (lead, timestamp) index and k-way merged into one newest-first stream.
+Pages are addressed with an opaque `before` cursor, so deep pages cost the same as
+the first one. Audit entries are only part of the stream for users holding the
+audit view permission and, without view-all, only their own, like the audit log itself.
+"""
+import base64
+import heapq
+
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+
+from authentication.permissions import get_permission_snapshot
+
+from .audit_paging import EPOCH, MICROSECOND
+from .models import LeadActivity, LeadAudit, LeadDocument, LeadEvent, LeadNote
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def _user_name(user):
+    if not user:
+        return None
+    return user.get_full_name() or user.username
+
+
+def _note_entry(note):
+    return {
+        'title': 'Important note' if note.is_important else 'Note',
+        'body': note.note,
+        'user': _user_name(note.user),
+        'is_important': note.is_important,
+    }
+
+
+def _activity_entry(activity):
+    return {
+        'title': activity.title,
+        'body': activity.description,
+        'user': _user_name(activity.user),
+        'activity_type': activity.activity_type,
+        'activity_type_display': activity.get_activity_type_display(),
+        'outcome': activity.outcome,
+        'is_completed': activity.is_completed,
+    }
+
+
+def _document_entry(document):
+    return {
+        'title': document.title,
+        'body': document.description,
+        'user': _user_name(document.uploaded_by),
+        'file_type': document.file_type,
+    }
+
+
+def _event_entry(event):
+    return {
+        'title': event.title,
+        'body': event.description,
+        'user': _user_name(event.assigned_to),
+        'event_type': event.event_type,
+        'status': event.status,
+        'end_datetime': event.end_datetime.isoformat(),
+        'location': event.location,
+    }
+
+
+def _audit_entry(audit):
+    return {
+        'title': audit.get_action_display(),
+        'body': audit.description,
+        'user': _user_name(audit.user) or audit.user_name_backup or None,
+        'action': audit.action,
+        'field_name': audit.field_name,
+        'severity': audit.severity,
+    }
+
+
+class TimelineSource:
+    """One model feeding the timeline, ordered by (time_field, id) within a lead"""
+    # (module, code) the user must hold to see this source; None for everyone
+    permission = None
+
+    def __init__(self, name, model, time_field, select_related, serialize):
+        self.name = name
+        self.model = model
+        self.time_field = time_field
+        self.select_related = select_related
+        self.serialize = serialize
+
+    def is_visible_to(self, user):
+        return self.permission is None or self.permission in get_permission_snapshot(user).codes
+
+    def queryset(self, lead, user):
+        return self.model.objects.filter(lead=lead).select_related(*self.select_related)
+
+    def page(self, lead, user, cursor, limit):
+        """Fetch the next `limit` rows of this source strictly after the cursor"""
+        queryset = self.queryset(lead, user)
+        if cursor:
+            timestamp, source_rank, row_id = cursor
+            rank = SOURCE_RANKS[self.name]
+            before = Q(**{f'{self.time_field}__lt': timestamp})
+            if rank < source_rank:
+                before |= Q(**{self.time_field: timestamp})
+            elif rank == source_rank:
+                before |= Q(**{self.time_field: timestamp, 'id__lt': row_id})
+            queryset = queryset.filter(before)
+        rows = queryset.order_by(f'-{self.time_field}', '-id')[:limit]
+        return [
+            (getattr(row, self.time_field), SOURCE_RANKS[self.name], row.id, row)
+            for row in rows
+        ]
+
+
+class AuditTimelineSource(TimelineSource):
+    """
+    Audit entries for audit viewers, hiding sensitive ones from everyone but superusers
+
+    As in the audit log, viewers without the view-all permission only see their own actions.
+    """
+    permission = ('audit', 'view')
+
+    def queryset(self, lead, user):
+        queryset = super().queryset(lead, user)
+        if ('audit', 'view_all') not in get_permission_snapshot(user).codes:
+            queryset = queryset.filter(user=user)
+        if not user.is_superuser:
+            queryset = queryset.filter(is_sensitive=False)
+        return queryset
+
+
+TIMELINE_SOURCES = [
+    TimelineSource('note', LeadNote, 'created_at', ['user'], _note_entry),
+    TimelineSource('activity', LeadActivity, 'created_at', ['user'], _activity_entry),
+    TimelineSource('document', LeadDocument, 'created_at', ['uploaded_by'], _document_entry),
+    TimelineSource('event', LeadEvent, 'start_datetime', ['assigned_to'], _event_entry),
+    AuditTimelineSource('audit', LeadAudit, 'timestamp', ['user'], _audit_entry),
+]
+SOURCE_RANKS = {source.name: rank for rank, source in enumerate(TIMELINE_SOURCES)}
+SOURCES_BY_NAME = {source.name: source for source in TIMELINE_SOURCES}
+
+
+def encode_cursor(timestamp, source_rank, row_id):
+    # Integer arithmetic keeps the cursor exact to the microsecond
+    micros = (timestamp - EPOCH) // MICROSECOND
+    raw = f'{micros}:{source_rank}:{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Parse a `before` cursor; raises ValueError when it is malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        micros, source_rank, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        timestamp = EPOCH + int(micros) * MICROSECOND
+        return timestamp, int(source_rank), int(row_id)
+    except (ValueError, UnicodeDecodeError, OverflowError, OSError):
+        raise ValueError('Invalid timeline cursor')
+
+
+def get_lead_timeline(lead, user, before=None, limit=DEFAULT_PAGE_SIZE, types=None):
+    """
+    Return one page of the lead's timeline, newest first.
+
+    Each selected source contributes at most limit + 1 rows, so a page costs one
+    indexed query per source regardless of how far back the cursor points.
+    Sources the user may not see are left out; asking for one by type raises
+    PermissionDenied. Returns (entries, next_cursor); next_cursor is None on the
+    last page. Raises ValueError for a bad cursor, limit or source type.
+    """
+    try:
+        limit = min(max(int(limit or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    unknown = [name for name in types or [] if name not in SOURCES_BY_NAME]
+    if unknown:
+        raise ValueError(f"Unknown timeline types: {', '.join(unknown)}")
+
+    cursor = decode_cursor(before) if before else None
+    if types:
+        sources = [SOURCES_BY_NAME[name] for name in types]
+        denied = [source.name for source in sources if not source.is_visible_to(user)]
+        if denied:
+            raise PermissionDenied(f"No permission to view timeline types: {', '.join(denied)}")
+    else:
+        sources = [source for source in TIMELINE_SOURCES if source.is_visible_to(user)]
+
+    streams = [source.page(lead, user, cursor, limit + 1) for source in sources]
+    merged = heapq.merge(*streams, key=lambda item: item[:3], reverse=True)
+
+    entries = []
+    last = None
+    for timestamp, source_rank, row_id, row in merged:
+        if len(entries) == limit:
+            return entries, encode_cursor(*last)
+        source = TIMELINE_SOURCES[source_rank]
+        entry = {
+            'type': source.name,
+            'id': row_id,
+            'timestamp': timestamp.isoformat(),
+        }
+        entry.update(source.serialize(row))
+        entries.append(entry)
+        last = (timestamp, source_rank, row_id)
+    return entries, None
@@ -0,0 +1,128 @@
+"""
+Lead typeahead search.
+
+Queries are matched as prefixes of the normalized search keys kept on Lead (name,
+reversed name, mobile and phone digits, email, company), which are indexed. Result sets are cached
+briefly per (user scope, prefix); when a cached shorter prefix already holds every
+match, longer prefixes are answered from it without touching the database.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import normalize_phone, normalize_search_text
+
+MIN_QUERY_LENGTH = 2
+RESULT_LIMIT = 10
+
+# Matches kept per cached prefix; a complete set (not truncated) can serve longer prefixes
+SUPERSET_LIMIT = 200
+CACHE_TIMEOUT = 60  # seconds
+
+
+class TypeaheadQuery:
+    """Normalized keys for one typeahead input"""
+
+    def __init__(self, raw):
+        self.text = normalize_search_text(raw)
+        self.email = raw.strip().lower()
+        # Only treat input as a phone number when it has no letters
+        digits = normalize_phone(raw)
+        has_letters = any(ch.isalpha() for ch in raw)
+        self.phone = digits if len(digits) >= MIN_QUERY_LENGTH and not has_letters else ''
+
+    def __bool__(self):
+        return len(self.text) >= MIN_QUERY_LENGTH
+
+    def as_q(self):
+        # Keys are stored lowercased (phones as digits only), so istartswith compiles to a
+        # plain LIKE 'prefix%' that the key indexes can serve on MySQL's case-insensitive
+        # collations; startswith would be LIKE BINARY, which they cannot
+        condition = (
+            Q(search_name__istartswith=self.text) |
+            Q(search_name_reversed__istartswith=self.text) |
+            Q(search_email__istartswith=self.email) |
+            Q(search_company__istartswith=self.text)
+        )
+        if self.phone:
+            condition |= Q(search_phone__istartswith=self.phone) | Q(search_alt_phone__istartswith=self.phone)
+        return condition
+
+    def matches(self, row):
+        return (
+            row['keys'][0].startswith(self.text) or
+            row['keys'][1].startswith(self.text) or
+            row['keys'][3].startswith(self.email) or
+            row['keys'][5].startswith(self.text) or
+            bool(self.phone and (row['keys'][2].startswith(self.phone) or row['keys'][4].startswith(self.phone)))
+        )
+
+
+def _cache_key(scope, prefix):
+    digest = hashlib.md5(prefix.encode('utf-8')).hexdigest()
+    return f'leads:typeahead:v2:{scope}:{digest}'
+
+
+def _fetch(queryset, query):
+    """Load up to SUPERSET_LIMIT matches; returns (rows, complete)"""
+    leads = queryset.filter(query.as_q()).select_related('status').only(
+        'id', 'first_name', 'last_name', 'mobile', 'phone', 'email', 'status__name', 'status__color',
+        'search_name', 'search_name_reversed', 'search_phone', 'search_email', 'search_alt_phone', 'search_company',
+    ).order_by('search_name', 'id')[:SUPERSET_LIMIT + 1]
+
+    rows = [
+        {
+            'id': str(lead.id),
+            'name': lead.full_name,
+            'email': lead.email,
+            'phone': lead.phone or lead.mobile,
+            'status': lead.status.name if lead.status else None,
+            'status_color': lead.status.color if lead.status else None,
+            'keys': (
+                lead.search_name, lead.search_name_reversed, lead.search_phone, lead.search_email,
+                lead.search_alt_phone, lead.search_company,
+            ),
+        }
+        for lead in leads
+    ]
+    return rows[:SUPERSET_LIMIT], len(rows) <= SUPERSET_LIMIT
+
+
+def search_leads(queryset, scope, raw_query, limit=RESULT_LIMIT):
+    """
+    Return up to `limit` typeahead results for `raw_query`.
+
+    `queryset` must already be restricted to what the user may see and `scope`
+    must identify that restriction, since cached results are shared per scope.
+    """
+    query = TypeaheadQuery(raw_query)
+    if not query:
+        return []
+    prefix = query.email
+
+    # One cache round trip covers this prefix and every shorter one
+    keys = {_cache_key(scope, prefix[:length]): length for length in range(MIN_QUERY_LENGTH, len(prefix) + 1)}
+    cached = cache.get_many(list(keys))
+
+    entry = cached.get(_cache_key(scope, prefix))
+    if entry is None:
+        superset = None
+        for key in sorted(cached, key=keys.get, reverse=True):
+            # A shorter prefix without the phone predicate may have missed phone matches
+            if cached[key]['complete'] and (cached[key]['phone'] or not query.phone):
+                superset = cached[key]
+                break
+
+        if superset is not None:
+            rows = [row for row in superset['rows'] if query.matches(row)]
+            entry = {'rows': rows, 'complete': True, 'phone': bool(query.phone)}
+        else:
+            rows, complete = _fetch(queryset, query)
+            entry = {'rows': rows, 'complete': complete, 'phone': bool(query.phone)}
+        cache.set(_cache_key(scope, prefix), entry, CACHE_TIMEOUT)
+
+    return [
+        {field: value for field, value in row.items() if field != 'keys'}
+        for row in entry['rows'][:limit]
+    ]
@@ -25,6 +25,7 @@ urlpatterns = [
     path('notes/<int:note_id>/delete/', views.delete_lead_note_view, name='delete_note'),
     
     # Activities
+    path('<uuid:lead_id>/timeline/', views.lead_timeline_api, name='lead_timeline_api'),
     path('<uuid:lead_id>/activities/', views.lead_activities_view, name='lead_activities'),
     path('<uuid:lead_id>/activities/add/', views.add_lead_activity_view, name='add_activity'),
     path('activities/<int:activity_id>/complete/', views.complete_activity_view, name='complete_activity'),
@@ -41,6 +42,9 @@ urlpatterns = [
     path('api/quick-note/', views.add_quick_note_api, name='quick_note_api'),
     path('api/archive/', views.archive_lead_api, name='archive_lead_api'),
     path('api/search/', views.leads_search_api, name='search_api'),
+    path('api/pipeline/', views.pipeline_board_api, name='pipeline_board_api'),
+    path('api/pipeline/move/', views.pipeline_move_api, name='pipeline_move_api'),
+    path('api/pipeline/<str:column>/', views.pipeline_column_api, name='pipeline_column_api'),
     path('api/save-column-preferences/', views.save_column_preferences, name='save_column_preferences'),
     
     # Events API
@@ -48,6 +52,7 @@ urlpatterns = [
     path('api/events/create/', views.create_event_api, name='create_event_api'),
     path('api/events/<int:event_id>/update-status/', views.update_event_status_api, name='update_event_status_api'),
     path('api/events/user/upcoming/', views.get_user_upcoming_events_api, name='get_user_upcoming_events_api'),
+    path('api/events/user/feed/', views.user_events_feed_api, name='user_events_feed_api'),
     
     # Source and status management
     path('sources/', views.lead_sources_view, name='sources'),
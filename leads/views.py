@@ -1,155 +1,86 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Avg, Sum
+from django.db import transaction
+from django.db.models import Q, Count, Avg, Sum, Max
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
+import heapq
+import itertools
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from .models import (
     Lead, LeadSource, LeadStatus, LeadNote, 
     LeadActivity, LeadDocument, LeadTag,
     LeadType, LeadPriority, LeadTemperature,
-    UserLeadPreferences, LeadEvent
+    UserLeadPreferences, LeadEvent, LeadEventTombstone, LeadAudit
 )
-from authentication.models import Module, Permission, DataFilter
+from authentication.utils import SortRegistry, InvalidSortError
+from authentication.change_stream import record_changes
+from authentication.permissions import get_permission_snapshot
+from .timeline import get_lead_timeline
+from .typeahead import search_leads
+from . import pipeline
+from .assignment import LeadAssignmentEngine, get_assignment_config, track_lead_change
 
 
-def apply_user_data_filters(user, queryset, model_name):
-    """Apply user profile data filters to a queryset"""
-    if not hasattr(user, 'user_profile') or not user.user_profile.profile:
-        return queryset
-    
-    profile = user.user_profile.profile
-    
-    # Get data filters for this profile and model
-    try:
-        module = Module.objects.get(name='leads')
-        filters = DataFilter.objects.filter(
-            profile=profile,
-            module=module,
-            model_name=model_name,
-            is_active=True
-        )
-        
-        if filters.exists():
-            # If there are multiple filters, we need to combine them properly
-            # For data access filters, we typically want to show records that match ANY of the filters (OR logic)
-            from django.db.models import Q
-            combined_filter = Q()
-            
-            for data_filter in filters:
-                if data_filter.filter_conditions:
-                    try:
-                        # Add each filter with OR logic
-                        combined_filter |= Q(**data_filter.filter_conditions)
-                    except Exception as e:
-                        # Log the error but don't break the view
-                        print(f"Error processing filter {data_filter.name}: {e}")
-                        continue
-            
-            # Apply the combined filter
-            if combined_filter:
-                queryset = queryset.filter(combined_filter)
-                    
-    except Module.DoesNotExist:
-        pass
-    
-    return queryset
-
-
-def has_lead_permission(user, permission_level):
-    """Check if user has specific permission level for leads module"""
-    if user.is_superuser:
-        return True
-    
-    try:
-        user_profile = user.user_profile
-        leads_module = Module.objects.get(name='leads')
-        
-        # Get user permissions for leads module
-        permissions = user_profile.profile.permissions.filter(
-            module=leads_module,
-            level__gte=permission_level,
-            is_active=True
-        )
-        return permissions.exists()
-    except:
-        return False
-
-
-def permission_required(level):
-    """Decorator to check lead permissions"""
-    def decorator(view_func):
-        def wrapper(request, *args, **kwargs):
-            if not request.user.is_authenticated:
-                return redirect('authentication:login')
-            
-            if not has_lead_permission(request.user, level):
-                messages.error(request, 'Access denied. Insufficient permissions.')
-                return redirect('authentication:dashboard')
-            
-            return view_func(request, *args, **kwargs)
-        return wrapper
-    return decorator
-
-
-@login_required
-@permission_required(1)  # View permission
-def leads_list_view(request):
-    """Display paginated list of leads with filtering and search"""
-    # Get base leads queryset
-    leads = Lead.objects.select_related('status', 'source', 'assigned_to', 'lead_type', 'priority', 'temperature').all()
-    
+def apply_lead_access_scope(user, queryset):
+    """Restrict a lead queryset to the records the user is allowed to see"""
     # Apply user profile data filters first
-    leads = apply_user_data_filters(request.user, leads, 'Lead')
+    queryset = queryset.for_user(user)
     
     # Restrict leads based on user permissions (if not superuser)
-    if not request.user.is_superuser:
+    if not user.is_superuser:
         # Check if user has manager-level access through profile
-        if hasattr(request.user, 'user_profile') and request.user.user_profile.profile:
-            profile = request.user.user_profile.profile
+        if hasattr(user, 'user_profile') and user.user_profile.profile:
+            profile = user.user_profile.profile
             # If profile name contains 'manager' or 'supervisor', allow seeing all filtered leads
             if 'manager' not in profile.name.lower() and 'supervisor' not in profile.name.lower():
                 # Regular users can only see leads assigned to them
-                leads = leads.filter(assigned_to=request.user)
+                queryset = queryset.filter(assigned_to=user)
         else:
             # No profile - restrict to assigned leads only
-            leads = leads.filter(assigned_to=request.user)
+            queryset = queryset.filter(assigned_to=user)
     
+    return queryset
+
+
+def apply_lead_list_filters(request, queryset):
+    """Apply the leads list GET filters and search, returning the queryset and the active filter values"""
     # Apply filters
     status_filter = request.GET.get('status')
     if status_filter:
-        leads = leads.filter(status_id=status_filter)
+        queryset = queryset.filter(status_id=status_filter)
     
     source_filter = request.GET.get('source')
     if source_filter:
-        leads = leads.filter(source_id=source_filter)
+        queryset = queryset.filter(source_id=source_filter)
     
     assigned_filter = request.GET.get('assigned')
     if assigned_filter == 'me':
-        leads = leads.filter(assigned_to=request.user)
+        queryset = queryset.filter(assigned_to=request.user)
     elif assigned_filter == 'unassigned':
-        leads = leads.filter(assigned_to__isnull=True)
+        queryset = queryset.filter(assigned_to__isnull=True)
     elif assigned_filter and assigned_filter.isdigit():
-        leads = leads.filter(assigned_to_id=assigned_filter)
+        queryset = queryset.filter(assigned_to_id=assigned_filter)
     
     priority_filter = request.GET.get('priority')
     if priority_filter:
-        leads = leads.filter(priority_id=priority_filter)
+        queryset = queryset.filter(priority_id=priority_filter)
     
     lead_type_filter = request.GET.get('lead_type')
     if lead_type_filter:
-        leads = leads.filter(lead_type_id=lead_type_filter)
+        queryset = queryset.filter(lead_type_id=lead_type_filter)
     
     temperature_filter = request.GET.get('temperature')
     if temperature_filter:
-        leads = leads.filter(temperature_id=temperature_filter)
+        queryset = queryset.filter(temperature_id=temperature_filter)
     
     # Search functionality - Enhanced for better partial matching
     search_query = request.GET.get('search', '').strip()
@@ -190,11 +121,71 @@ def leads_list_view(request):
         )
         
         # Combine both filters with OR
-        leads = leads.filter(search_filter | complete_filter)
+        queryset = queryset.filter(search_filter | complete_filter)
+    
+    filters = {
+        'status': status_filter,
+        'source': source_filter,
+        'assigned': assigned_filter,
+        'priority': priority_filter,
+        'lead_type': lead_type_filter,
+        'temperature': temperature_filter,
+        'search': search_query,
+    }
+    return queryset, filters
+
+
+def has_lead_permission(user, permission_level):
+    """Check if user has specific permission level for leads module"""
+    return get_permission_snapshot(user).has_level('leads', permission_level)
+
+
+def permission_required(level):
+    """Decorator to check lead permissions"""
+    def decorator(view_func):
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect('authentication:login')
+            
+            if not has_lead_permission(request.user, level):
+                messages.error(request, 'Access denied. Insufficient permissions.')
+                return redirect('authentication:dashboard')
+            
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# User-facing sort keys for the leads list, each backed by an index on Lead
+LEAD_SORTS = SortRegistry({
+    'created_at': ['created_at'],                      # (created_at)
+    'score': ['score'],                                # (score)
+    'name': ['search_name'],                           # (search_name)
+    'status': ['status_id', 'score'],                  # (status, score)
+    'assigned_to': ['assigned_to_id', 'created_at'],   # (assigned_to, created_at)
+    'next_follow_up': ['next_follow_up'],              # (next_follow_up)
+}, default='-created_at')
+
+
+@login_required
+@permission_required(1)  # View permission
+def leads_list_view(request):
+    """Display paginated list of leads with filtering and search"""
+    # Get base leads queryset
+    leads = Lead.objects.select_related('status', 'source', 'assigned_to', 'lead_type', 'priority', 'temperature').all()
+    
+    # Apply user profile data filters and manager/supervisor scope first
+    leads = apply_lead_access_scope(request.user, leads)
+    
+    # Apply filters and search
+    leads, filters = apply_lead_list_filters(request, leads)
     
     # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    leads = leads.order_by(sort_by)
+    sort_by = request.GET.get('sort') or LEAD_SORTS.default
+    try:
+        leads = LEAD_SORTS.apply(leads, sort_by)
+    except InvalidSortError as e:
+        return HttpResponseBadRequest(str(e))
     
     # Pagination - handle per_page parameter
     per_page = request.GET.get('per_page', 25)
@@ -252,16 +243,7 @@ def leads_list_view(request):
         'unassigned_leads': unassigned_leads,
         'user_preferences': user_preferences,
         'visible_columns': user_preferences.get_visible_columns(),
-        'filters': {
-            'status': status_filter,
-            'source': source_filter,
-            'assigned': assigned_filter,
-            'priority': priority_filter,
-            'lead_type': lead_type_filter,
-            'temperature': temperature_filter,
-            'search': search_query,
-            'sort': sort_by,
-        },
+        'filters': dict(filters, sort=sort_by),
         'can_create': has_lead_permission(request.user, 3),
         'can_edit': has_lead_permission(request.user, 2),
         'can_delete': has_lead_permission(request.user, 4),
@@ -456,6 +438,13 @@ def lead_create_view(request):
                 completed_at=timezone.now()
             )
             
+            # Hand leads created without an owner to the assignment engine
+            if not lead.assigned_to_id and get_assignment_config()['ON_CREATE']:
+                try:
+                    LeadAssignmentEngine(actor=request.user).assign([lead])
+                except Exception as e:
+                    messages.warning(request, f'Lead could not be auto-assigned: {str(e)}')
+            
             messages.success(request, f'Lead "{lead.full_name}" created successfully!')
             return redirect('leads:lead_detail', lead_id=lead.id)
             
@@ -590,21 +579,8 @@ def lead_edit_view(request, lead_id):
     # Get navigation leads (previous/next) with same filters as list view
     leads_queryset = Lead.objects.select_related('status', 'source', 'assigned_to', 'lead_type', 'priority', 'temperature').all()
     
-    # Apply user profile data filters
-    leads_queryset = apply_user_data_filters(request.user, leads_queryset, 'Lead')
-    
-    # Restrict leads based on user permissions (if not superuser)
-    if not request.user.is_superuser:
-        # Check if user has manager-level access through profile
-        if hasattr(request.user, 'user_profile') and request.user.user_profile.profile:
-            profile = request.user.user_profile.profile
-            # If profile name contains 'manager' or 'supervisor', allow seeing all filtered leads
-            if 'manager' not in profile.name.lower() and 'supervisor' not in profile.name.lower():
-                # Regular users can only see leads assigned to them
-                leads_queryset = leads_queryset.filter(assigned_to=request.user)
-        else:
-            # No profile - restrict to assigned leads only
-            leads_queryset = leads_queryset.filter(assigned_to=request.user)
+    # Apply user profile data filters and manager/supervisor scope
+    leads_queryset = apply_lead_access_scope(request.user, leads_queryset)
     
     # Order by creation date (same as list view)
     leads_queryset = leads_queryset.order_by('-created_at')
@@ -913,30 +889,12 @@ def archive_lead_api(request):
 @login_required
 @permission_required(1)  # View permission
 def leads_search_api(request):
-    """Search leads via AJAX"""
+    """Typeahead search over leads the user can see"""
     query = request.GET.get('q', '')
     
-    if len(query) < 2:
-        return JsonResponse({'results': []})
-    
-    leads = Lead.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query) |
-        Q(phone__icontains=query) |
-        Q(company__icontains=query)
-    ).select_related('status')[:10]
-    
-    results = []
-    for lead in leads:
-        results.append({
-            'id': str(lead.id),
-            'name': lead.full_name,
-            'email': lead.email,
-            'phone': lead.phone,
-            'status': lead.status.name,
-            'status_color': lead.status.color,
-        })
+    leads = apply_lead_access_scope(request.user, Lead.objects.all())
+    scope = 'all' if request.user.is_superuser else f'user:{request.user.id}'
+    results = search_leads(leads, scope, query)
     
     return JsonResponse({'results': results})
 
@@ -1186,54 +1144,89 @@ def bulk_delete_leads_view(request):
     return redirect('leads:leads_list')
 
 
+class _Echo:
+    """Pseudo-buffer for csv.writer that hands each row straight back to the caller"""
+    def write(self, value):
+        return value
+
+
+# Columns pulled for the CSV export, joined names included so no row touches a related object
+EXPORT_LEAD_COLUMNS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'company',
+    'status__name', 'source__name', 'priority__name', 'score', 'created_at',
+    'assigned_to_id', 'assigned_to__first_name', 'assigned_to__last_name',
+)
+
+
+def iter_leads_for_export(queryset, chunk_size=2000):
+    """
+    Yield export rows in (created_at, id) keyset chunks so memory stays constant
+    no matter how many leads are exported
+    """
+    queryset = queryset.order_by('-created_at', '-id').values_list(*EXPORT_LEAD_COLUMNS)
+    last_created_at = last_id = None
+    
+    while True:
+        chunk = queryset
+        if last_id is not None:
+            chunk = chunk.filter(
+                Q(created_at__lt=last_created_at) |
+                Q(created_at=last_created_at, id__lt=last_id)
+            )
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        
+        yield from rows
+        
+        if len(rows) < chunk_size:
+            return
+        last_id, last_created_at = rows[-1][0], rows[-1][10]
+
+
 @login_required
 @permission_required(1)
 def export_leads_view(request):
-    """Export leads to CSV"""
+    """Stream leads to CSV using the same data filters and scope as the leads list"""
     import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="leads_export.csv"'
+    from django.http import StreamingHttpResponse
     
-    writer = csv.writer(response)
-    writer.writerow([
-        'Name', 'Email', 'Phone', 'Company', 'Status', 'Source', 
-        'Priority', 'Score', 'Created', 'Assigned To'
-    ])
+    leads = apply_lead_access_scope(request.user, Lead.objects.all())
     
-    # Check if specific leads are selected for export
-    if request.method == 'POST':
-        lead_ids = request.POST.getlist('lead_ids')
-        if lead_ids:
-            leads = Lead.objects.select_related('status', 'source', 'assigned_to').filter(id__in=lead_ids)
-        else:
-            # Fallback to all accessible leads
-            if request.user.is_superuser:
-                leads = Lead.objects.select_related('status', 'source', 'assigned_to').all()
-            else:
-                leads = Lead.objects.select_related('status', 'source', 'assigned_to').filter(assigned_to=request.user)
+    # Export the selected leads, otherwise everything matching the list filters
+    lead_ids = request.POST.getlist('lead_ids') if request.method == 'POST' else []
+    if lead_ids:
+        leads = leads.filter(id__in=lead_ids)
     else:
-        # GET request - export all accessible leads
-        if request.user.is_superuser:
-            leads = Lead.objects.select_related('status', 'source', 'assigned_to').all()
-        else:
-            leads = Lead.objects.select_related('status', 'source', 'assigned_to').filter(assigned_to=request.user)
-    
-    for lead in leads:
-        writer.writerow([
-            lead.full_name,
-            lead.email,
-            lead.phone,
-            lead.company,
-            lead.status.name if lead.status else '',
-            lead.source.name if lead.source else '',
-            lead.priority.name if lead.priority else '',
-            lead.score,
-            lead.created_at.strftime('%Y-%m-%d'),
-            lead.assigned_to.get_full_name() if lead.assigned_to else 'Unassigned'
-        ])
+        leads, _ = apply_lead_list_filters(request, leads)
     
+    def rows():
+        writer = csv.writer(_Echo())
+        yield writer.writerow([
+            'Name', 'Email', 'Phone', 'Company', 'Status', 'Source', 
+            'Priority', 'Score', 'Created', 'Assigned To'
+        ])
+        for (_, first_name, last_name, email, phone, company, status, source,
+             priority, score, created_at, assigned_to_id, assigned_first, assigned_last) in iter_leads_for_export(leads):
+            if assigned_to_id:
+                assigned_name = f"{assigned_first} {assigned_last}".strip()
+            else:
+                assigned_name = 'Unassigned'
+            yield writer.writerow([
+                f"{first_name} {last_name}",
+                email,
+                phone,
+                company,
+                status or '',
+                source or '',
+                priority or '',
+                score,
+                created_at.strftime('%Y-%m-%d'),
+                assigned_name,
+            ])
+    
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="leads_export.csv"'
     return response
 
 
@@ -1358,6 +1351,8 @@ def import_leads_view(request):
             
             imported_count = 0
             error_count = 0
+            auto_assign = bool(request.POST.get('auto_assign'))
+            imported_leads = []
             
             for row_num, row in enumerate(csv_data, start=2):
                 try:
@@ -1388,10 +1383,11 @@ def import_leads_view(request):
                         company=company,
                         source=default_source,
                         status=default_status,
-                        assigned_to=request.user,
+                        assigned_to=None if auto_assign else request.user,
                         created_by=request.user
                     )
                     
+                    imported_leads.append(lead)
                     imported_count += 1
                     
                 except Exception as e:
@@ -1401,6 +1397,13 @@ def import_leads_view(request):
             if imported_count > 0:
                 messages.success(request, f'Successfully imported {imported_count} leads.')
             
+            if auto_assign and imported_leads:
+                assigned = LeadAssignmentEngine(actor=request.user).assign(imported_leads)
+                assigned_count = sum(assigned.values())
+                messages.info(request, f'{assigned_count} imported leads auto-assigned to {len(assigned)} users.')
+                if assigned_count < len(imported_leads):
+                    messages.warning(request, f'{len(imported_leads) - assigned_count} leads left unassigned: all eligible users are at capacity.')
+            
             if error_count > 0:
                 messages.warning(request, f'{error_count} rows had errors and were skipped.')
             
@@ -1456,6 +1459,166 @@ def save_column_preferences(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
 
+# ==================== PIPELINE API ====================
+
+def get_pipeline_queryset(request):
+    """Leads visible to the user, narrowed by the same GET filters as the leads list"""
+    leads = apply_lead_access_scope(request.user, Lead.objects.all())
+    leads, _ = apply_lead_list_filters(request, leads)
+    return leads
+
+
+@login_required
+@permission_required(1)  # View permission
+def pipeline_board_api(request):
+    """Kanban board: every status column with its total and first page of cards"""
+    try:
+        limit = pipeline.column_limit(request.GET.get('limit'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    leads = get_pipeline_queryset(request)
+    counts = pipeline.column_counts(leads)
+    
+    status_columns = [
+        {'key': pipeline.column_key(status.id), 'status_id': status.id, 'name': status.name,
+         'color': status.color, 'is_final': status.is_final}
+        for status in LeadStatus.objects.filter(is_active=True)
+    ]
+    # Leads without a status, or in a status that has since been deactivated, still need a column
+    shown = {column['key'] for column in status_columns}
+    if counts.get(pipeline.NO_STATUS):
+        status_columns.append({'key': pipeline.NO_STATUS, 'status_id': None, 'name': 'No Status',
+                               'color': '#9ca3af', 'is_final': False})
+    
+    columns = []
+    for column in status_columns:
+        count = counts.get(column['key'], 0)
+        cards, next_cursor = pipeline.column_page(leads, column['status_id'], limit=limit) if count else ([], None)
+        columns.append(dict(column, count=count, cards=cards, next_cursor=next_cursor))
+    
+    return JsonResponse({
+        'success': True,
+        'columns': columns,
+        'hidden_count': sum(count for key, count in counts.items() if key not in shown and key != pipeline.NO_STATUS),
+    })
+
+
+@login_required
+@permission_required(1)  # View permission
+def pipeline_column_api(request, column):
+    """Next page of cards for one kanban column"""
+    try:
+        status_id = pipeline.parse_column_key(column)
+        cards, next_cursor = pipeline.column_page(
+            get_pipeline_queryset(request), status_id,
+            after=request.GET.get('after'),
+            limit=pipeline.column_limit(request.GET.get('limit')),
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'key': column,
+        'cards': cards,
+        'next_cursor': next_cursor,
+    })
+
+
+@csrf_exempt
+@login_required
+@permission_required(2)  # Edit permission
+@require_http_methods(["POST"])
+def pipeline_move_api(request):
+    """Move a lead card to another column with a single-column UPDATE and return both columns' totals"""
+    try:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            raise ValueError('Invalid JSON body')
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        lead_id = pipeline.parse_lead_id(data.get('lead_id'))
+        to_status_id = pipeline.parse_column_key(str(data.get('status_id') or pipeline.NO_STATUS))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    leads = apply_lead_access_scope(request.user, Lead.objects.all())
+    lead = get_object_or_404(
+        leads.select_related('status').only(
+            'id', 'first_name', 'last_name', 'assigned_to', 'converted_at', 'status__name', 'status__is_final'
+        ),
+        id=lead_id,
+    )
+    to_status = get_object_or_404(LeadStatus, id=to_status_id) if to_status_id is not None else None
+    from_status = lead.status
+    
+    if lead.status_id != to_status_id:
+        # Queryset update skips save() and its per-field signal diffing; the status change is audited here
+        with transaction.atomic():
+            Lead.objects.filter(id=lead.id).update(status_id=to_status_id, updated_at=timezone.now())
+            record_changes(Lead, [lead.id], ['status', 'updated_at'])
+            if lead.assigned_to_id and lead.converted_at is None:
+                track_lead_change(
+                    lead.assigned_to_id, not (from_status and from_status.is_final),
+                    lead.assigned_to_id, not (to_status and to_status.is_final),
+                )
+        old_display = from_status.name if from_status else 'None'
+        new_display = to_status.name if to_status else 'None'
+        LeadAudit.log_action(
+            lead=lead,
+            action='status_change',
+            user=request.user,
+            description=f"Status changed: {old_display} → {new_display}",
+            field_name='status',
+            old_value=old_display,
+            new_value=new_display,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            severity='high',
+        )
+    
+    affected = {lead.status_id, to_status_id}
+    counts = pipeline.column_counts(get_pipeline_queryset(request), affected)
+    
+    return JsonResponse({
+        'success': True,
+        'lead_id': str(lead.id),
+        'counts': {pipeline.column_key(status_id): counts.get(pipeline.column_key(status_id), 0)
+                   for status_id in affected},
+    })
+
+
+# ==================== TIMELINE API ====================
+
+@login_required
+@permission_required(1)  # View permission
+def lead_timeline_api(request, lead_id):
+    """One page of a lead's merged notes/activities/documents/events/audit history, newest first"""
+    lead = get_object_or_404(apply_lead_access_scope(request.user, Lead.objects.all()), id=lead_id)
+    
+    types = [t for t in request.GET.get('types', '').split(',') if t]
+    try:
+        entries, next_cursor = get_lead_timeline(
+            lead, request.user,
+            before=request.GET.get('before'),
+            limit=request.GET.get('limit'),
+            types=types,
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except PermissionDenied as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+    
+    return JsonResponse({
+        'success': True,
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
+
 # ==================== EVENTS API ====================
 
 @login_required
@@ -1465,15 +1628,14 @@ def get_lead_events_api(request, lead_id):
         lead = get_object_or_404(Lead, id=lead_id)
         
         # Check permissions
-        if not request.user.is_superuser:
-            user_profile = request.user.user_profile
-            if lead.assigned_to != request.user and not user_profile.profile.permissions.filter(
-                module__name='leads', code='view'
-            ).exists():
+        if lead.assigned_to_id != request.user.id:
+            if not get_permission_snapshot(request.user).has_permission('leads', 'view'):
                 return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
         
-        # Get events
-        events = LeadEvent.objects.filter(lead_id=lead_id).order_by('-start_datetime')
+        # Get events, joining the people shown on each row
+        events = LeadEvent.objects.filter(lead=lead).select_related(
+            'assigned_to', 'created_by'
+        ).order_by('-start_datetime')
         
         events_data = []
         for event in events:
@@ -1512,25 +1674,25 @@ def create_event_api(request):
             lead = get_object_or_404(Lead, id=lead_id)
             
             # Check permissions
-            if not request.user.is_superuser:
-                user_profile = request.user.user_profile
-                if lead.assigned_to != request.user and not user_profile.profile.permissions.filter(
-                    module__name='leads', code='edit'
-                ).exists():
+            if lead.assigned_to_id != request.user.id:
+                if not get_permission_snapshot(request.user).has_permission('leads', 'edit'):
                     return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
             
             from django.utils.dateparse import parse_datetime
             
+            reminder_minutes_before = int(data.get('reminder_minutes_before', 30))
+            
             # Create event
             event = LeadEvent.objects.create(
-                lead_id=lead_id,
+                lead=lead,
                 title=data.get('title'),
                 event_type=data.get('event_type', 'meeting'),
                 description=data.get('description', ''),
                 start_datetime=parse_datetime(data.get('start_datetime')),
                 end_datetime=parse_datetime(data.get('end_datetime')),
                 location=data.get('location', ''),
-                reminder_minutes_before=data.get('reminder_minutes_before', 30),
+                send_reminder=reminder_minutes_before > 0,
+                reminder_minutes_before=reminder_minutes_before,
                 assigned_to=request.user,
                 created_by=request.user
             )
@@ -1563,7 +1725,7 @@ def update_event_status_api(request, event_id):
                     return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
             
             event.status = data.get('status')
-            event.save(update_fields=['status'])
+            event.save(update_fields=['status', 'updated_at'])
             
             return JsonResponse({
                 'success': True,
@@ -1592,15 +1754,11 @@ def get_user_upcoming_events_api(request):
             start_datetime__gte=today,
             start_datetime__lte=next_month,
             status='scheduled'
-        ).order_by('start_datetime')[:20]  # Limit to 20 events
+        ).select_related('lead').order_by('start_datetime')[:20]  # Limit to 20 events
         
         events_data = []
         for event in events:
-            try:
-                lead = Lead.objects.get(id=event.lead_id)
-                lead_name = lead.full_name
-            except Lead.DoesNotExist:
-                lead_name = "Unknown Lead"
+            lead_name = event.lead.full_name if event.lead else "Unknown Lead"
             
             events_data.append({
                 'id': event.id,
@@ -1609,7 +1767,7 @@ def get_user_upcoming_events_api(request):
                 'start_datetime': event.start_datetime.isoformat(),
                 'end_datetime': event.end_datetime.isoformat(),
                 'location': event.location,
-                'lead_id': event.lead_id,
+                'lead_id': str(event.lead_id) if event.lead_id else None,
                 'lead_name': lead_name,
                 'duration_minutes': event.duration_minutes,
             })
@@ -1623,3 +1781,312 @@ def get_user_upcoming_events_api(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+
+
+# ==================== EVENTS FEED ====================
+
+FEED_DEFAULT_DAYS = 30
+FEED_MAX_DAYS = 366
+FEED_MAX_CHANGES = 500
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+FEED_EVENT_FIELDS = (
+    'id', 'title', 'event_type', 'description', 'start_datetime', 'end_datetime',
+    'location', 'status', 'updated_at', 'lead_id', 'lead__first_name', 'lead__last_name',
+)
+
+
+# Rank of each feed stream in sync tokens, breaking ties between rows changed at the same time
+FEED_EVENT_RANK = 0
+FEED_TOMBSTONE_RANK = 1
+
+
+class SyncTokenExpired(ValueError):
+    """The client last synced before the kept tombstones; it must resync from scratch"""
+
+
+def _epoch_micros(value):
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def encode_sync_token(value, rank=FEED_EVENT_RANK, row_id=0, synced_at=None):
+    """
+    Encode a sync token: the position of the last change seen, (timestamp, stream rank,
+    row id), and the time up to which the client has every change (default: the position)
+    """
+    return f'{_epoch_micros(value)}:{rank}:{row_id}:{_epoch_micros(synced_at or value)}'
+
+
+def decode_sync_token(token):
+    """Decode a sync token into (timestamp, rank, row id, synced at); raises ValueError when malformed"""
+    try:
+        parts = [int(part) for part in token.split(':')]
+        if len(parts) == 1:
+            # Tokens issued before the compound format: repeat any ties at that instant
+            parts += [FEED_EVENT_RANK, 0]
+        if len(parts) == 3:
+            # Tokens issued before the sync time was stamped: synced up to the position
+            parts.append(parts[0])
+        micros, rank, row_id, synced = parts
+        return (
+            _EPOCH + timedelta(microseconds=micros), rank, row_id, _EPOCH + timedelta(microseconds=synced),
+        )
+    except (ValueError, OverflowError):
+        raise ValueError('Invalid sync token')
+
+
+def _after_sync_token(time_field, rank, token):
+    """Rows of the stream with this rank that come strictly after the token position"""
+    timestamp, token_rank, row_id = token[:3]
+    condition = Q(**{f'{time_field}__gt': timestamp})
+    if rank > token_rank:
+        condition |= Q(**{time_field: timestamp})
+    elif rank == token_rank:
+        condition |= Q(**{time_field: timestamp, 'id__gt': row_id})
+    return condition
+
+
+def _get_sync_token(request):
+    """
+    The request's decoded sync token, or None; raises ValueError or SyncTokenExpired
+
+    A token expires once the time it was synced up to falls behind the tombstone
+    retention, since removals after that may already have been pruned. The position
+    itself may be older: a user whose events all changed long ago keeps syncing.
+    """
+    sync_token = request.GET.get('sync_token')
+    if not sync_token:
+        return None
+    token = decode_sync_token(sync_token)
+    if token[3] < timezone.now() - timedelta(days=LeadEventTombstone.RETENTION_DAYS):
+        raise SyncTokenExpired('Sync token expired; fetch the full feed again')
+    return token
+
+
+def _parse_feed_datetime(value):
+    from django.utils.dateparse import parse_date, parse_datetime
+    
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_events_feed_queryset(request):
+    """
+    Build the feed queryset for the current user.
+    
+    With a sync_token only events changed after the token are returned, walking the
+    (assigned_to, updated_at) index in (updated_at, id) order; otherwise the start/end
+    window is read through the (assigned_to, start_datetime) index.
+    """
+    events = LeadEvent.objects.filter(assigned_to=request.user)
+    
+    token = _get_sync_token(request)
+    if token:
+        return events.filter(_after_sync_token('updated_at', FEED_EVENT_RANK, token)).order_by('updated_at', 'id')
+    
+    start = request.GET.get('start')
+    start = _parse_feed_datetime(start) if start else timezone.now()
+    end = request.GET.get('end')
+    end = _parse_feed_datetime(end) if end else start + timedelta(days=FEED_DEFAULT_DAYS)
+    if end < start or end - start > timedelta(days=FEED_MAX_DAYS):
+        raise ValueError(f'Date range must be between 0 and {FEED_MAX_DAYS} days')
+    
+    return events.filter(start_datetime__gte=start, start_datetime__lt=end).order_by('start_datetime', 'id')
+
+
+def get_feed_tombstones(request):
+    """Events removed from the user's feed after the sync token, or None without a token"""
+    token = _get_sync_token(request)
+    if not token:
+        return None
+    return LeadEventTombstone.objects.filter(
+        _after_sync_token('removed_at', FEED_TOMBSTONE_RANK, token), user=request.user
+    ).order_by('removed_at', 'id')
+
+
+def events_feed_etag(request):
+    """ETag over the feed window so unchanged calendars are answered with a 304"""
+    try:
+        events = get_events_feed_queryset(request)
+        tombstones = get_feed_tombstones(request)
+    except ValueError:
+        return None
+    
+    summary = events.order_by().aggregate(last_update=Max('updated_at'), total=Count('id'))
+    last_update = summary['last_update']
+    removed = 0
+    if tombstones is not None:
+        removed = tombstones.order_by().aggregate(last=Max('id'))['last'] or 0
+    # The day is part of the tag so an idle client still gets a freshly stamped sync
+    # token daily instead of keeping one until it expires
+    return '"{}-{}-{}-{}-{}-{}"'.format(
+        request.user.id,
+        request.GET.urlencode(),
+        encode_sync_token(last_update) if last_update else 0,
+        summary['total'],
+        removed,
+        timezone.now().date().isoformat(),
+    )
+
+
+def _ics_text(value):
+    """Escape a TEXT value for iCalendar"""
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_fold(line):
+    """Fold content lines longer than 75 characters as required by RFC 5545"""
+    chunks = [line[:75]]
+    line = line[75:]
+    while line:
+        chunks.append(' ' + line[:74])
+        line = line[74:]
+    return '\r\n'.join(chunks)
+
+
+ICS_STATUS = {
+    'scheduled': 'CONFIRMED',
+    'rescheduled': 'TENTATIVE',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+    'no_show': 'CANCELLED',
+}
+
+
+def render_events_ics(events, host, removed=()):
+    """Render feed rows, and removed events as cancelled ones, as an iCalendar document"""
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Glomart CRM//Lead Events//EN',
+        'CALSCALE:GREGORIAN',
+    ]
+    for event in events:
+        lead_name = f"{event['lead__first_name'] or ''} {event['lead__last_name'] or ''}".strip()
+        description = event['description']
+        if lead_name:
+            description = f"Lead: {lead_name}\n{description}" if description else f"Lead: {lead_name}"
+        lines.extend([
+            'BEGIN:VEVENT',
+            f"UID:leadevent-{event['id']}@{host}",
+            f"DTSTAMP:{_ics_datetime(event['updated_at'])}",
+            f"LAST-MODIFIED:{_ics_datetime(event['updated_at'])}",
+            f"DTSTART:{_ics_datetime(event['start_datetime'])}",
+            f"DTEND:{_ics_datetime(event['end_datetime'])}",
+            f"SUMMARY:{_ics_text(event['title'])}",
+            f"LOCATION:{_ics_text(event['location'])}",
+            f"DESCRIPTION:{_ics_text(description)}",
+            f"CATEGORIES:{_ics_text(event['event_type'])}",
+            f"STATUS:{ICS_STATUS.get(event['status'], 'CONFIRMED')}",
+            'END:VEVENT',
+        ])
+    for tombstone in removed:
+        lines.extend([
+            'BEGIN:VEVENT',
+            f"UID:leadevent-{tombstone['event_id']}@{host}",
+            f"DTSTAMP:{_ics_datetime(tombstone['removed_at'])}",
+            f"DTSTART:{_ics_datetime(tombstone['start_datetime'])}",
+            f"DTEND:{_ics_datetime(tombstone['end_datetime'])}",
+            'STATUS:CANCELLED',
+            'END:VEVENT',
+        ])
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_ics_fold(line) for line in lines) + '\r\n'
+
+
+@login_required
+@condition(etag_func=events_feed_etag)
+def user_events_feed_api(request):
+    """
+    Calendar feed of the user's lead events as JSON or iCalendar (?format=ics).
+    
+    Pass start/end for a date window, or the sync_token from a previous response to
+    receive only events changed since then.
+    """
+    # Everything committed before this point is in the response (unless a page runs over)
+    issued_at = timezone.now()
+    try:
+        events = get_events_feed_queryset(request)
+        tombstones = get_feed_tombstones(request)
+    except SyncTokenExpired as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=410)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    rows = events.values(*FEED_EVENT_FIELDS)
+    removed = []
+    has_more = False
+    if tombstones is not None:
+        # Changes and removals are merged in (time, rank, id) order and paged together;
+        # clients keep syncing with the new token while has_more is set
+        changes = heapq.merge(
+            ((row['updated_at'], FEED_EVENT_RANK, row['id'], row) for row in rows[:FEED_MAX_CHANGES + 1]),
+            ((row['removed_at'], FEED_TOMBSTONE_RANK, row['id'], row) for row in tombstones.values(
+                'id', 'event_id', 'start_datetime', 'end_datetime', 'removed_at'
+            )[:FEED_MAX_CHANGES + 1]),
+            key=lambda change: change[:3],
+        )
+        page = list(itertools.islice(changes, FEED_MAX_CHANGES + 1))
+        has_more = len(page) > FEED_MAX_CHANGES
+        page = page[:FEED_MAX_CHANGES]
+        rows = [row for _, rank, _, row in page if rank == FEED_EVENT_RANK]
+        removed = [row for _, rank, _, row in page if rank == FEED_TOMBSTONE_RANK]
+        # The next token continues right after the last change on this page; a cut-off
+        # page is only complete up to that change
+        token = _get_sync_token(request)
+        position = page[-1][:3] if page else token[:3]
+        sync_token = encode_sync_token(*position, synced_at=max(position[0], token[3]) if has_more else issued_at)
+    else:
+        rows = list(rows)
+        newest = max(rows, key=lambda row: (row['updated_at'], row['id']), default=None)
+        if newest is None:
+            newest = LeadEvent.objects.filter(assigned_to=request.user).order_by(
+                '-updated_at', '-id'
+            ).values('updated_at', 'id').first()
+        if newest:
+            sync_token = encode_sync_token(newest['updated_at'], FEED_EVENT_RANK, newest['id'], issued_at)
+        else:
+            sync_token = encode_sync_token(_EPOCH, synced_at=issued_at)
+    
+    if request.GET.get('format') == 'ics':
+        response = HttpResponse(render_events_ics(rows, request.get_host(), removed), content_type='text/calendar; charset=utf-8')
+        response['X-Sync-Token'] = sync_token
+        return response
+    
+    events_data = []
+    for row in rows:
+        lead_name = f"{row['lead__first_name']} {row['lead__last_name']}" if row['lead_id'] else "Unknown Lead"
+        events_data.append({
+            'id': row['id'],
+            'title': row['title'],
+            'event_type': row['event_type'],
+            'start_datetime': row['start_datetime'].isoformat(),
+            'end_datetime': row['end_datetime'].isoformat(),
+            'location': row['location'],
+            'status': row['status'],
+            'lead_id': str(row['lead_id']) if row['lead_id'] else None,
+            'lead_name': lead_name,
+            'updated_at': row['updated_at'].isoformat(),
+            'duration_minutes': int((row['end_datetime'] - row['start_datetime']).total_seconds() / 60),
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'events': events_data,
+        'count': len(events_data),
+        'deleted': [row['event_id'] for row in removed],
+        'sync_token': sync_token,
+        'has_more': has_more,
+    })
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['is_active', 'created_at'], name='projects_pr_is_acti_cea4a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['is_active', 'name'], name='projects_pr_is_acti_2807bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', 'created_at'], name='projects_pr_status__afdb70_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_list_sort_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name'], name='projects_pr_name_11d782_idx'),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.urls import reverse
 import uuid
 from datetime import datetime
 
+from authentication.change_stream import ChangeStreamMixin
+from authentication.data_filters import DataFilterQuerySet
+
 
 class ProjectStatus(models.Model):
     """Project status lookup table"""
@@ -99,7 +102,11 @@ class Currency(models.Model):
         return f"{self.code} - {self.name}"
 
 
-class Project(models.Model):
+class ProjectQuerySet(DataFilterQuerySet):
+    data_filter_module = 'projects'
+
+
+class Project(ChangeStreamMixin, models.Model):
     """Main project model"""
     # Primary identification
     project_id = models.CharField(max_length=191, primary_key=True, unique=True)
@@ -145,6 +152,8 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Project'
@@ -156,6 +165,10 @@ class Project(models.Model):
             models.Index(fields=['created_by']),
             models.Index(fields=['is_active']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['is_active', 'created_at']),
+            models.Index(fields=['name']),
+            models.Index(fields=['is_active', 'name']),
+            models.Index(fields=['status', 'created_at']),
         ]
 
     def __str__(self):
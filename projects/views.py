@@ -1,7 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum, Avg
 from django.db import transaction
@@ -19,51 +19,16 @@ from .models import (
     ProjectPriority, Currency, ProjectHistory, ProjectAssignment
 )
 from authentication.decorators import permission_required
-from authentication.models import UserActivity, DataFilter, Module
-from authentication.utils import log_user_activity
+from authentication.models import UserActivity
+from authentication.utils import log_user_activity, SortRegistry, InvalidSortError
 
 
-def apply_user_data_filters(user, queryset, model_name):
-    """Apply user profile data filters to a queryset"""
-    if not hasattr(user, 'user_profile') or not user.user_profile.profile:
-        return queryset
-    
-    profile = user.user_profile.profile
-    
-    # Get data filters for this profile and model
-    try:
-        module = Module.objects.get(name='project')
-        filters = DataFilter.objects.filter(
-            profile=profile,
-            module=module,
-            model_name=model_name,
-            is_active=True
-        )
-        
-        if filters.exists():
-            # If there are multiple filters, we need to combine them properly
-            # For data access filters, we typically want to show records that match ANY of the filters (OR logic)
-            from django.db.models import Q
-            combined_filter = Q()
-            
-            for data_filter in filters:
-                if data_filter.filter_conditions:
-                    try:
-                        # Add each filter with OR logic
-                        combined_filter |= Q(**data_filter.filter_conditions)
-                    except Exception as e:
-                        # Log the error but don't break the view
-                        print(f"Error processing filter {data_filter.name}: {e}")
-                        continue
-            
-            # Apply the combined filter
-            if combined_filter:
-                queryset = queryset.filter(combined_filter)
-                    
-    except Module.DoesNotExist:
-        pass
-    
-    return queryset
+# User-facing sort keys for the project list, each backed by an index on Project
+PROJECT_SORTS = SortRegistry({
+    'created_at': ['created_at'],               # (is_active, created_at)
+    'name': ['name'],                           # (is_active, name)
+    'status': ['status_id', 'created_at'],      # (status, created_at)
+}, default='-created_at')
 
 
 @login_required
@@ -76,7 +41,7 @@ def project_list(request):
     ).filter(is_active=True)
     
     # Apply user profile data filters first
-    projects_query = apply_user_data_filters(request.user, projects_query, 'Project')
+    projects_query = projects_query.for_user(request.user)
     
     # Apply filters
     search = request.GET.get('search')
@@ -120,7 +85,10 @@ def project_list(request):
     if sort_order == 'desc':
         sort_by = f'-{sort_by}'
     
-    projects_query = projects_query.order_by(sort_by)
+    try:
+        projects_query = PROJECT_SORTS.apply(projects_query, sort_by)
+    except InvalidSortError as e:
+        return HttpResponseBadRequest(str(e))
     
     # Pagination
     paginator = Paginator(projects_query, 20)
@@ -435,7 +403,7 @@ def project_export(request):
         projects_query = Project.objects.select_related(
             'status', 'project_type', 'category', 'priority', 
             'currency', 'assigned_to', 'created_by'
-        ).filter(is_active=True)
+        ).filter(is_active=True).for_user(request.user)
         
         # Apply same filters as list view
         search = request.GET.get('search')
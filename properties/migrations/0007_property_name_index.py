@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_alter_property_primary_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['name'], name='properties__name_47b1ec_idx'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from authentication.change_stream import ChangeStreamMixin
+from authentication.data_filters import DataFilterQuerySet
+
 
 # Lookup Tables (Normalized)
 
@@ -152,7 +155,11 @@ class Currency(models.Model):
 
 # Main Property Model
 
-class Property(models.Model):
+class PropertyQuerySet(DataFilterQuerySet):
+    data_filter_module = 'property'
+
+
+class Property(ChangeStreamMixin, models.Model):
     """Main Property model with all normalized relationships"""
     
     # Primary identification
@@ -407,10 +414,15 @@ class Property(models.Model):
         """Calculate total area"""
         return self.total_space or self.sales_area or 0
     
+    objects = PropertyQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
+        indexes = [
+            models.Index(fields=['name']),
+        ]
 
 
 # Property History for tracking changes
@@ -17,53 +17,9 @@ from .models import (
     PropertyHistory, UserPropertyPreferences
 )
 from .forms import PropertyCreateForm
-from authentication.models import DataFilter, Module
 from projects.models import Project, Currency
 
 
-def apply_user_data_filters(user, queryset, model_name):
-    """Apply user profile data filters to a queryset"""
-    if not hasattr(user, 'user_profile') or not user.user_profile.profile:
-        return queryset
-    
-    profile = user.user_profile.profile
-    
-    # Get data filters for this profile and model
-    try:
-        module = Module.objects.get(name='property')
-        filters = DataFilter.objects.filter(
-            profile=profile,
-            module=module,
-            model_name=model_name,
-            is_active=True
-        )
-        
-        if filters.exists():
-            # If there are multiple filters, we need to combine them properly
-            # For data access filters, we typically want to show records that match ANY of the filters (OR logic)
-            from django.db.models import Q
-            combined_filter = Q()
-            
-            for data_filter in filters:
-                if data_filter.filter_conditions:
-                    try:
-                        # Add each filter with OR logic
-                        combined_filter |= Q(**data_filter.filter_conditions)
-                    except Exception as e:
-                        # Log the error but don't break the view
-                        print(f"Error processing filter {data_filter.name}: {e}")
-                        continue
-            
-            # Apply the combined filter
-            if combined_filter:
-                queryset = queryset.filter(combined_filter)
-                    
-    except Module.DoesNotExist:
-        pass
-    
-    return queryset
-
-
 @login_required
 def property_list(request):
     """Display list of properties with search and filtering"""
@@ -75,7 +31,7 @@ def property_list(request):
     ).prefetch_related('assigned_users')
     
     # Apply user profile data filters first
-    properties = apply_user_data_filters(request.user, properties, 'Property')
+    properties = properties.for_user(request.user)
     
     # Apply search filters
     search_query = request.GET.get('search', '').strip()
@@ -196,7 +152,7 @@ def property_search(request):
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    properties = Property.objects.filter(
+    properties = Property.objects.for_user(request.user).filter(
         Q(property_id__icontains=query) |
         Q(property_number__icontains=query) |
         Q(name__icontains=query)
@@ -272,7 +228,7 @@ def property_edit(request, property_id):
     ).prefetch_related('assigned_users')
     
     # Apply user profile data filters
-    properties_queryset = apply_user_data_filters(request.user, properties_queryset, 'Property')
+    properties_queryset = properties_queryset.for_user(request.user)
     
     # Order by creation date (same as list view)
     properties_queryset = properties_queryset.order_by('-created_at')
@@ -424,7 +380,7 @@ def property_export(request):
     properties = Property.objects.select_related(
         'region', 'property_type', 'category', 'status', 'activity',
         'compound', 'handler', 'sales_person'
-    )
+    ).for_user(request.user)
     
     # Apply same filters as list view
     search_query = request.GET.get('search', '').strip()
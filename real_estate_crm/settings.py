@@ -50,6 +50,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'authentication.middleware.PermissionSnapshotMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'leads.middleware.AuditMiddleware',  # Add audit middleware
@@ -94,6 +95,37 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Compiled RBAC data; must be shared by all workers so version bumps reach every one
+    'permissions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'permissions',
+        # One entry per user plus a few per profile and RBAC version; culling drops a
+        # quarter of the files once full
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Small cross-worker state, such as the lead auto-assignment round-robin pointer
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'shared',
+    },
+}
+
+PERMISSION_CACHE_ALIAS = 'permissions'
+
+# Cached lookup domains of the data filter builder; shared so a change reaches every worker
+FIELD_CHOICES_CACHE_ALIAS = 'shared'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 